@@ -0,0 +1,259 @@
+"""Cached point-alignment plans for transforms between different Tex
+
+Transform.begin aligns the source and target families: submobject counts
+are matched, then every pair of glyph outlines gets curves inserted until
+both have the same number of points (VMobject.align_points, which splits
+every curve with partial_bezier_points and grows arrays one np.append at a
+time). For ReplacementTransform(old_title, new_title) in Scene04 that runs
+on every render, although the Tex geometry never changes.
+
+Every point the alignment produces is a fixed combination of the 4 control
+points of one source curve. So the plan for a glyph pair is an index array
+(points, 4) and a weight array (points, 4). They are computed by a
+vectorized mirror of align_points (same subpath splitting, trimming and
+split factors, weights from partial_bezier_points on the identity), stored
+under media/alignplans/ per (source, target) geometry hash, and applied as
+``(points[index] * weight[..., None]).sum(1)``. Submobject matching is left
+to manim, it only adds faded copies. install() routes Mobject.align_data
+through the cache; transforms whose families already have matching point
+counts (most .animate and FadeTransform calls) skip it.
+
+    python alignplan.py             # Scene04's title and parameter label swaps: stock, cold, cached
+"""
+
+import argparse
+import functools
+import hashlib
+import time
+
+import numpy as np
+from manim import DOWN, UP, Mobject, VMobject
+from manim.utils.bezier import partial_bezier_points
+from manim.utils.file_ops import guarantee_existence
+
+import finalvideo
+import runner
+
+PLAN_DIR = runner.ROOT / "media" / "alignplans"
+
+_original_align_data = Mobject.align_data
+_plans = {}
+stats = dict(hits=0, misses=0, fallbacks=0)
+
+
+def geometry_key(*mobjects):
+    """Hash of the family structure and exact points of every mobject"""
+    digest = hashlib.blake2b(digest_size=16)
+    for mobject in mobjects:
+        for member in mobject.get_family():
+            digest.update(f"{type(member).__name__}:{len(member.submobjects)}:{len(member.points)};".encode())
+            digest.update(np.ascontiguousarray(member.points, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def split_weights(pieces, nppcc=4):
+    """(pieces * nppcc, nppcc) weights of one curve cut into ``pieces`` equal-parameter parts"""
+    alphas = np.linspace(0, 1, pieces + 1)
+    return np.concatenate([partial_bezier_points(np.identity(nppcc), a, b) for a, b in zip(alphas, alphas[1:])])
+
+
+def subpath_ranges(mobject):
+    """(start, stop) of every subpath, as VMobject.get_subpaths splits them"""
+    points, nppcc = mobject.points, mobject.n_points_per_cubic_curve
+    candidates = np.arange(nppcc, len(points), nppcc)
+    before, after = points[candidates - 1, :2], points[candidates, :2]
+    # consider_points_equals_2d: np.isclose on x and y
+    apart = (np.abs(before - after) > mobject.tolerance_for_point_equality + 1e-5 * np.abs(after)).any(axis=1)
+    bounds = [0, *candidates[apart], len(points)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop - start >= nppcc]
+
+
+def nth_subpath(mobject, ranges, n, reference):
+    """Point indices of subpath n, or a null subpath at the last point when there are fewer"""
+    nppcc = reference.n_points_per_cubic_curve
+    if n >= len(ranges):
+        return np.full(nppcc, ranges[-1][1] - 1)
+    start, stop = ranges[n]
+    # Drop trailing curves collapsed onto the preceding point (manim issue #1959)
+    while stop - start > nppcc and reference.consider_points_equals(
+            mobject.points[stop - nppcc:stop], mobject.points[stop - nppcc - 1]):
+        stop -= nppcc
+    return np.arange(start, stop)
+
+
+def insert_curves(indices, n, nppcc):
+    """Index and weight rows of insert_n_curves_to_point_list(n, points[indices])"""
+    quads = indices[:len(indices) - len(indices) % nppcc].reshape(-1, nppcc)
+    target = len(quads) + n
+    pieces = np.bincount(np.arange(target) * len(quads) // target, minlength=len(quads))
+    index = np.repeat(quads, pieces * nppcc, axis=0)
+    weight = np.concatenate([split_weights(int(count), nppcc) for count in pieces])
+    return index, weight
+
+
+def point_plan(first, second):
+    """(index, weight) for both VMobjects, or None where align_points would have to edit them first"""
+    for mobject in first, second:
+        if mobject.has_no_points() or mobject.has_new_path_started():
+            return None
+    nppcc = first.n_points_per_cubic_curve
+    ranges = subpath_ranges(first), subpath_ranges(second)
+    if not all(ranges):
+        return None
+    rows = ([], [], [], [])
+    for n in range(max(map(len, ranges))):
+        path1 = nth_subpath(first, ranges[0], n, first)
+        path2 = nth_subpath(second, ranges[1], n, first)
+        for path, other, index_rows, weight_rows in ((path1, path2, *rows[:2]), (path2, path1, *rows[2:])):
+            index, weight = insert_curves(path, max(0, (len(other) - len(path)) // nppcc), nppcc)
+            index_rows.append(index)
+            weight_rows.append(weight)
+    return tuple(np.concatenate(part) for part in rows)
+
+
+def reindex(points, index, weight):
+    return np.einsum("nk,nkd->nd", weight, points[index])
+
+
+class Alignment:
+    """One align_data call: plan entries replayed from the cache, and the entries it ends up using"""
+
+    def __init__(self, entries):
+        self.replay = iter(entries or ())
+        self.entries = []
+        self.fresh = entries is None
+
+
+def align_points(first, second, alignment):
+    if not (isinstance(first, VMobject) and isinstance(second, VMobject)):
+        first.align_points(second)
+        return
+    first.align_rgbas(second)
+    if first.get_num_points() == second.get_num_points():
+        return
+    sizes = (first.get_num_points(), second.get_num_points())
+    entry = next(alignment.replay, None)
+    if entry is None or entry[0] != sizes:
+        entry = (sizes, point_plan(first, second))
+        alignment.fresh = True
+    alignment.entries.append(entry)
+    plan = entry[1]
+    if plan is None:
+        stats["fallbacks"] += 1
+        first.align_points(second)
+        return
+    first.set_points(reindex(first.points, *plan[:2]))
+    second.set_points(reindex(second.points, *plan[2:]))
+
+
+def align_family(first, second, alignment):
+    """Mobject.align_data, with point alignment from the plan"""
+    first.null_point_align(second)
+    first.align_submobjects(second)
+    align_points(first, second, alignment)
+    for sub1, sub2 in zip(first.submobjects, second.submobjects):
+        align_family(sub1, sub2, alignment)
+
+
+def load_plan(key):
+    if key not in _plans:
+        path = PLAN_DIR / f"{key}.npz"
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            entries = []
+            for i, sizes in enumerate(data["sizes"]):
+                plan = tuple(data[f"{i}_{part}"] for part in range(4)) if f"{i}_0" in data else None
+                entries.append(((int(sizes[0]), int(sizes[1])), plan))
+        _plans[key] = entries
+    return _plans[key]
+
+
+def save_plan(key, entries):
+    _plans[key] = entries
+    arrays = dict(sizes=np.array([sizes for sizes, _ in entries], dtype=np.int64).reshape(-1, 2))
+    for i, (_, plan) in enumerate(entries):
+        if plan is not None:
+            arrays.update({f"{i}_{part}": array for part, array in enumerate(plan)})
+    np.savez(guarantee_existence(PLAN_DIR) / f"{key}.npz", **arrays)
+
+
+def point_counts(mobject):
+    return [member.get_num_points() for member in mobject.get_family()]
+
+
+def align_data(self, mobject, skip_point_alignment=False):
+    """Drop-in Mobject.align_data that takes point alignment from the plan cache"""
+    if skip_point_alignment or point_counts(self) == point_counts(mobject):
+        return _original_align_data(self, mobject, skip_point_alignment)
+    key = geometry_key(self, mobject)
+    entries = load_plan(key)
+    stats["hits" if entries is not None else "misses"] += 1
+    alignment = Alignment(entries)
+    align_family(self, mobject, alignment)
+    if alignment.fresh and any(plan is not None for _, plan in alignment.entries):
+        save_plan(key, alignment.entries)
+
+
+def install():
+    Mobject.align_data = align_data
+
+
+def uninstall():
+    Mobject.align_data = _original_align_data
+
+
+def title_pairs():
+    """The two Tex-to-Tex ReplacementTransforms of Scene04, positioned as in the scene"""
+    branding = finalvideo.NdLinearBranding
+    old_title = branding.title_text("Traditional CNN Architecture with Linear Layers", font_size=32).to_edge(UP, buff=0.3)
+    new_title = branding.title_text("CNN Architecture with NdLinear", font_size=32).to_edge(UP, buff=0.3)
+    param_title = branding.body_text(r"Traditional Parameters", font_size=24).move_to(DOWN * 1.8)
+    new_param_title = branding.body_text(r"NdLinear Parameters", font_size=24).move_to(param_title)
+    return [("old_title -> new_title", old_title, new_title),
+            ("param_title -> new_param_title", param_title, new_param_title)]
+
+
+def time_alignment(source, target, repeat):
+    """Best time of align_data on fresh copies, and the aligned points of the last run"""
+    best = float("inf")
+    for _ in range(repeat):
+        first, second = source.copy(), target.copy()
+        started = time.perf_counter()
+        first.align_data(second)
+        best = min(best, time.perf_counter() - started)
+    points = [np.concatenate([member.points for member in mob.family_members_with_points()]) for mob in (first, second)]
+    return best, points
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="alignments timed per mode")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile("draft")
+    print(f"{'transform':<32} {'stock ms':>9} {'cold ms':>9} {'cached ms':>10} {'max error':>10}")
+    for name, source, target in title_pairs():
+        stock, expected = time_alignment(source, target, args.repeat)
+        install()
+        try:
+            # Cold: no plan in memory or on disk yet
+            key = geometry_key(source, target)
+            _plans.pop(key, None)
+            (PLAN_DIR / f"{key}.npz").unlink(missing_ok=True)
+            cold, _ = time_alignment(source, target, 1)
+            # From disk, as on the next render
+            _plans.clear()
+            cached, points = time_alignment(source, target, args.repeat)
+        finally:
+            uninstall()
+        error = max(np.abs(a - b).max() for a, b in zip(expected, points))
+        print(f"{name:<32} {stock * 1e3:>9.2f} {cold * 1e3:>9.2f} {cached * 1e3:>10.2f} {error:>10.1e}")
+    print(f"plans in {PLAN_DIR.relative_to(runner.ROOT)}: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['fallbacks']} glyph pairs left to manim")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,377 @@
+"""Copy-on-write .animate targets: affine and style changes as parameter deltas
+
+``mob.animate.scale(0.5).move_to(p)`` normally deep-copies the whole family
+three times: the target (generate_target), the target copy Transform aligns
+and the starting mobject. For the data cube or a faded-in group of texts
+that is hundreds of point arrays and Python objects, only to move or restyle
+them. install() swaps Mobject.animate for a builder that records the chained
+calls instead. If they are all affine (shift, scale, rotate, move_to, center,
+to_edge, to_corner) and/or style-only (set_opacity, set_fill, set_stroke,
+set_background_stroke, set_color, fade on a VMobject family), the animation
+is built from a delta:
+
+- affine calls fold into one 3x3 matrix plus offset, with the critical
+  points of move_to/to_edge/about_edge taken from the boundary points pushed
+  through the calls so far (the same points Mobject.get_critical_point uses);
+- style calls run on a ghost family that shares every point array and only
+  copies the small rgba arrays, which gives the target colours per member.
+
+Each frame applies the straight-path transform step in place on one
+contiguous point buffer (the members' points become views into it) and
+writes lerped rgbas into one buffer per style array. Any other method,
+overridden animations, path_arc/lag_ratio arguments or image members fall
+back to the regular deep-copying builder. Targets are evaluated when the
+animation begins rather than when .animate is called.
+
+    python animdelta.py                      # setup time, memory and frame time, copy vs delta
+    python animdelta.py --count 5000 --frames 60
+"""
+
+import argparse
+import copy
+import inspect
+import time
+import tracemalloc
+
+import numpy as np
+from manim import (ORIGIN, UP, Animation, Mobject, Square, VGroup, VMobject, config)
+from manim.mobject.mobject import _AnimationBuilder
+from manim.utils.iterables import stretch_array_to_length
+from manim.utils.space_ops import rotation_matrix
+
+import finalvideo
+
+AFFINE_METHODS = ("shift", "scale", "rotate", "move_to", "center", "to_edge", "to_corner")
+STYLE_METHODS = ("set_opacity", "set_fill", "set_stroke", "set_background_stroke", "set_color", "fade")
+STYLE_ARRAYS = ("fill_rgbas", "stroke_rgbas", "background_stroke_rgbas")
+STYLE_SCALARS = ("stroke_width", "background_stroke_width", "sheen_factor")
+# Animation arguments the delta honours; anything else (path_arc, lag_ratio...) needs a real Transform
+DELTA_ARGS = {"run_time", "rate_func", "reverse_rate_function", "name", "remover", "suspend_mobject_updating"}
+
+_original_animate = Mobject.__dict__["animate"]
+
+
+def critical_point(boundary, direction):
+    """Mobject.get_critical_point on an already transformed array of boundary points"""
+    result = np.zeros(3)
+    if not len(boundary):
+        return result
+    for dim in range(3):
+        values = boundary[:, dim]
+        if direction[dim] < 0:
+            result[dim] = values.min()
+        elif direction[dim] > 0:
+            result[dim] = values.max()
+        else:
+            result[dim] = (values.min() + values.max()) / 2
+    return result
+
+
+def affine_step(mobject, name, args, kwargs, boundary):
+    """(matrix, offset) of one affine call, given the boundary points at that point of the chain"""
+    bound = inspect.signature(getattr(mobject, name)).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.update(arguments.pop("kwargs", {}))
+    identity = np.identity(3)
+
+    def about(matrix):
+        point = arguments.get("about_point")
+        if point is None:
+            edge = arguments.get("about_edge")
+            point = critical_point(boundary, ORIGIN if edge is None else edge)
+        point = np.asarray(point, dtype=float)
+        return matrix, point - matrix @ point
+
+    if name == "scale":
+        return about(np.diag(np.broadcast_to(np.asarray(arguments["scale_factor"], dtype=float), (3,))))
+    if name == "rotate":
+        return about(rotation_matrix(arguments["angle"], arguments["axis"]))
+    if name == "shift":
+        return identity, np.sum([np.asarray(vector, dtype=float) for vector in arguments["vectors"]], axis=0)
+    if name == "center":
+        return identity, -critical_point(boundary, ORIGIN)
+    if name == "move_to":
+        edge = arguments["aligned_edge"]
+        target = arguments["point_or_mobject"]
+        if isinstance(target, Mobject):
+            target = target.get_critical_point(edge)
+        offset = (np.asarray(target, dtype=float) - critical_point(boundary, edge)) * arguments["coor_mask"]
+        return identity, offset
+    # to_edge / to_corner, as in Mobject.align_on_border
+    direction = np.asarray(arguments.get("edge", arguments.get("corner")), dtype=float)
+    target = np.sign(direction) * (config["frame_x_radius"], config["frame_y_radius"], 0)
+    offset = target - critical_point(boundary, direction) - arguments["buff"] * direction
+    return identity, offset * np.abs(np.sign(direction))
+
+
+def style_ghost(mobject):
+    """Shallow copy of a family sharing its points; only the rgba arrays are copied, set_* edits them in place"""
+    ghost = copy.copy(mobject)
+    for name in STYLE_ARRAYS:
+        if name in mobject.__dict__:
+            setattr(ghost, name, getattr(mobject, name).copy())
+    ghost.submobjects = [style_ghost(submobject) for submobject in mobject.submobjects]
+    return ghost
+
+
+def consolidate(members, name, arrays):
+    """Give every member a view into one contiguous buffer holding ``arrays``; returns the buffer"""
+    buffer = np.concatenate(arrays) if arrays else np.zeros((0, 3))
+    start = 0
+    for member, array in zip(members, arrays):
+        setattr(member, name, buffer[start:start + len(array)])
+        start += len(array)
+    return buffer
+
+
+class DeltaAnimation(Animation):
+    """Animates ``calls`` on ``mobject`` as an affine path and a style lerp, without copying the family"""
+
+    def __init__(self, mobject, calls, **kwargs):
+        self.calls = calls
+        super().__init__(mobject, **kwargs)
+
+    def begin(self):
+        if self.run_time <= 0:
+            raise ValueError(f"{self} has a run_time of <= 0 seconds, this cannot be rendered correctly.")
+        if self.suspend_mobject_updating:
+            self.mobject.suspend_updating()
+        self.members = self.mobject.family_members_with_points()
+        self.begin_affine([call for call in self.calls if call[0] in AFFINE_METHODS])
+        self.begin_style([call for call in self.calls if call[0] in STYLE_METHODS])
+        self.interpolate(0)
+
+    def begin_affine(self, calls):
+        self.linear, self.offset = np.identity(3), np.zeros(3)
+        self.points = None
+        if not calls:
+            return
+        boundary = self.mobject.get_points_defining_boundary()
+        for name, args, kwargs in calls:
+            matrix, offset = affine_step(self.mobject, name, args, kwargs, boundary)
+            boundary = boundary @ matrix.T + offset
+            self.linear, self.offset = matrix @ self.linear, matrix @ self.offset + offset
+        self.points = consolidate(self.members, "points", [member.points for member in self.members])
+        self.path = (np.identity(3), np.zeros(3))
+        self.snapshot = None
+        if not np.array_equal(self.linear, np.identity(3)):
+            # det((1 - s) I + s L) is a cubic in s; a root inside the played
+            # range (scale(0), a half turn) would make the in-place steps
+            # irreversible, so those keep one snapshot of the starting points
+            samples = np.linspace(0, 1, 4)
+            roots = np.roots(np.polyfit(samples, [np.linalg.det(self.path_at(s)[0]) for s in samples], 3))
+            real = roots[np.abs(roots.imag) < 1e-9].real
+            if ((real > -0.25) & (real < 1.25)).any():
+                self.snapshot = self.points.copy()
+
+    def begin_style(self, calls):
+        self.style_arrays, self.style_scalars = [], []
+        if not calls:
+            return
+        ghost = style_ghost(self.mobject)
+        for name, args, kwargs in calls:
+            getattr(ghost, name)(*args, **kwargs)
+        targets = ghost.family_members_with_points()
+        for name in STYLE_ARRAYS:
+            starts, ends = [], []
+            for member, target in zip(self.members, targets):
+                start, end = getattr(member, name), getattr(target, name)
+                length = max(len(start), len(end))
+                starts.append(stretch_array_to_length(start, length))
+                ends.append(stretch_array_to_length(end, length))
+            start, end = np.concatenate(starts), np.concatenate(ends)
+            if not np.array_equal(start, end):
+                buffer = consolidate(self.members, name, starts)
+                self.style_arrays.append((buffer, start, end - start))
+        for name in STYLE_SCALARS:
+            start = np.array([getattr(member, name) for member in self.members], dtype=float)
+            end = np.array([getattr(target, name) for target in targets], dtype=float)
+            if not np.array_equal(start, end):
+                self.style_scalars.append((name, start, end - start))
+
+    def path_at(self, s):
+        """Straight path from the identity to the delta: (1 - s) I + s L, s * offset"""
+        return (1 - s) * np.identity(3) + s * self.linear, s * self.offset
+
+    def interpolate_mobject(self, alpha):
+        s = self.rate_func(1 - alpha if self.reverse_rate_function else alpha)
+        if self.points is not None:
+            matrix, offset = self.path_at(s)
+            if self.snapshot is not None:
+                np.matmul(self.snapshot, matrix.T, out=self.points)
+                self.points += offset
+            else:
+                # One step from the previous frame's transform to this one
+                previous_matrix, previous_offset = self.path
+                step = matrix @ np.linalg.inv(previous_matrix)
+                np.matmul(self.points, step.T, out=self.points)
+                self.points += offset - step @ previous_offset
+            self.path = (matrix, offset)
+        for buffer, start, delta in self.style_arrays:
+            np.multiply(delta, s, out=buffer)
+            buffer += start
+        for name, start, delta in self.style_scalars:
+            for member, value in zip(self.members, start + s * delta):
+                setattr(member, name, float(value))
+
+    def finish(self):
+        # Like _MethodAnimation: replay the style calls so opacity/colour
+        # attributes are set too, then land on the final frame. Affine calls
+        # are not replayed, the points already carry them
+        for name, args, kwargs in self.calls:
+            if name in STYLE_METHODS:
+                getattr(self.mobject, name)(*args, **kwargs)
+            elif name == "rotate" and isinstance(self.mobject, VMobject):
+                bound = inspect.signature(self.mobject.rotate).bind(*args, **kwargs)
+                bound.apply_defaults()
+                self.mobject.rotate_sheen_direction(bound.arguments["angle"], bound.arguments["axis"])
+        super().finish()
+        self.snapshot = None
+
+    def get_all_mobjects(self):
+        return [self.mobject]
+
+
+class DeltaAnimationBuilder(_AnimationBuilder):
+    """.animate builder that records calls and only generates a target if it has to"""
+
+    def __init__(self, mobject):
+        # _AnimationBuilder.__init__ would generate_target() right away
+        self.mobject = mobject
+        self.overridden_animation = None
+        self.is_chaining = False
+        self.methods = []
+        self.cannot_pass_args = False
+        self.anim_args = {}
+        self.calls = []
+
+    def __getattr__(self, method_name):
+        if self.calls is not None and method_name in AFFINE_METHODS + STYLE_METHODS:
+            def record(*method_args, **method_kwargs):
+                self.calls.append((method_name, method_args, method_kwargs))
+                return self
+
+            self.is_chaining = True
+            self.cannot_pass_args = True
+            return record
+        self.materialize()
+        return super().__getattr__(method_name)
+
+    def materialize(self):
+        """Switch to the regular deep-copied target, replaying what was recorded"""
+        if self.calls is None:
+            return
+        calls, self.calls = self.calls, None
+        self.mobject.generate_target()
+        for name, args, kwargs in calls:
+            _AnimationBuilder.__getattr__(self, name)(*args, **kwargs)
+
+    def delta_possible(self):
+        if not set(self.anim_args) <= DELTA_ARGS:
+            return False
+        family = self.mobject.get_family()
+        for name, args, kwargs in self.calls:
+            method = getattr(type(self.mobject), name)
+            # Only the stock implementations are mirrored by the delta
+            if method not in (getattr(Mobject, name, None), getattr(VMobject, name, None)):
+                return False
+            if hasattr(method, "_override_animate"):
+                return False
+            # VMobject.rotate also turns the sheen, which only shows with a sheen factor
+            if name == "rotate" and any(getattr(member, "sheen_factor", 0) for member in family):
+                return False
+            # VMobject.scale(..., scale_stroke=True) also scales stroke widths, which the delta does not
+            if name == "scale" and inspect.signature(getattr(self.mobject, name)).bind(
+                    *args, **kwargs).arguments.get("scale_stroke"):
+                return False
+        if any(name in STYLE_METHODS for name, _, _ in self.calls):
+            return all(isinstance(member, VMobject) for member in family)
+        return True
+
+    def build(self):
+        if self.calls is not None and self.delta_possible():
+            anim = DeltaAnimation(self.mobject, self.calls)
+            for attr, value in self.anim_args.items():
+                setattr(anim, attr, value)
+            return anim
+        self.materialize()
+        return super().build()
+
+
+def install():
+    """Make every mob.animate build delta animations where it can"""
+    Mobject.animate = property(DeltaAnimationBuilder, doc=_original_animate.__doc__)
+
+
+def uninstall():
+    Mobject.animate = _original_animate
+
+
+def large_grid(count):
+    side = int(np.ceil(np.sqrt(count)))
+    squares = [Square(side_length=0.1, fill_opacity=0.5, stroke_width=1).move_to([(i % side) * 0.12, (i // side) * 0.12, 0])
+               for i in range(count)]
+    return VGroup(*squares).center().set_opacity(0)
+
+
+def cases(count):
+    """(name, build the mobject, chain the .animate calls), after the .animate lines in finalvideo.py"""
+    return [
+        ("data_cube scale.move_to", lambda: finalvideo.Scene01_Introduction.create_data_cube(None),
+         lambda animate: animate.scale(0.5).move_to([-.4, -0.4, 1])),
+        (f"{count} squares set_opacity", lambda: large_grid(count),
+         lambda animate: animate.set_opacity(1)),
+        (f"{count} squares scale.to_edge.set_fill", lambda: large_grid(count),
+         lambda animate: animate.scale(0.7).to_edge(UP, buff=0.3).set_fill(opacity=0.8)),
+    ]
+
+
+def final_state(mobject):
+    members = mobject.family_members_with_points()
+    return [np.concatenate([getattr(member, name) for member in members]) for name in ("points", *STYLE_ARRAYS)]
+
+
+def measure(build_mobject, chain, frames, delta):
+    (install if delta else uninstall)()
+    try:
+        mobject = build_mobject()
+        tracemalloc.start()
+        started = time.perf_counter()
+        anim = chain(mobject.animate).build()
+        anim.begin()
+        setup = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        started = time.perf_counter()
+        for frame in range(1, frames + 1):
+            anim.interpolate(frame / frames)
+        per_frame = (time.perf_counter() - started) / frames
+        anim.finish()
+        return dict(setup_ms=setup * 1e3, peak_mb=peak / 2**20, frame_ms=per_frame * 1e3,
+                    delta=isinstance(anim, DeltaAnimation), state=final_state(mobject))
+    finally:
+        uninstall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="squares in the large-group cases")
+    parser.add_argument("--frames", type=int, default=30, help="interpolated frames per animation")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<40} {'':>6} {'setup ms':>10} {'peak MB':>9} {'frame ms':>9}")
+    for name, build_mobject, chain in cases(args.count):
+        before = measure(build_mobject, chain, args.frames, delta=False)
+        after = measure(build_mobject, chain, args.frames, delta=True)
+        for label, result in (("copy", before), ("delta" if after["delta"] else "copy*", after)):
+            print(f"{name:<40} {label:>6} {result['setup_ms']:>10.1f} {result['peak_mb']:>9.2f} {result['frame_ms']:>9.2f}")
+        error = max(np.abs(a - b).max() if a.shape == b.shape else np.inf
+                    for a, b in zip(before["state"], after["state"]))
+        print(f"{'':<40} {'':>6} setup {before['setup_ms'] / after['setup_ms']:.1f}x faster, "
+              f"{before['peak_mb'] / max(after['peak_mb'], 1e-9):.1f}x less memory, final state error {error:.1e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
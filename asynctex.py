@@ -0,0 +1,215 @@
+"""Asynchronous Tex and image creation during construct()
+
+install() swaps finalvideo's Tex, MathTex and ImageMobject for lazy
+subclasses. Creating one only submits the real constructor to a thread pool
+and returns a placeholder right away, so LaTeX (a subprocess, which releases
+the GIL) and PNG decoding overlap with the rest of construct(). The first
+attribute the placeholder does not have yet (points, submobjects, anything
+a geometry query or play() touches) waits for the future and adopts the real
+mobject's state. Scene code is unchanged.
+
+Identical Tex strings write the same tex_dir/<hash>.tex/.dvi/.svg files, so
+builds with the same arguments are serialized: the second one waits and
+reads the SVG the first one left. A failed build is re-raised with the
+construct() line that created the mobject, also when a helper such as
+NdLinearBranding.title_text made the call.
+
+Placeholders still building when first touched are counted, with the time
+spent waiting for them: only the others actually overlapped with
+construct().
+
+    python asynctex.py Scene03      # time to first frame, cold Tex cache, sync vs async
+    python asynctex.py --check      # a failing build reports its construct() line
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from manim import ImageMobject, MathTex, Tex, config
+from manim.renderer.cairo_renderer import CairoRenderer
+
+import finalvideo
+import runner
+
+_pool = None
+# One lock per Tex argument tuple, taken around the build
+_build_locks = {}
+# Placeholders created, those still building when first touched, and the seconds waited for them
+stats = dict(placeholders=0, pending=0, waited=0.0)
+
+
+def build(cls, lock, args, kwargs):
+    if lock is None:
+        return cls(*args, **kwargs)
+    with lock:
+        return cls(*args, **kwargs)
+
+
+def creation_site():
+    """file:line of the construct() frame creating a placeholder, else of the direct caller"""
+    caller = sys._getframe(2)
+    frame = caller
+    while frame is not None:
+        if frame.f_code.co_name == "construct":
+            break
+        frame = frame.f_back
+    frame = frame or caller
+    return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+
+class LazyMobjectMixin:
+    """Placeholder whose real state is built by ``_lazy_future``"""
+
+    _serialize_builds = False
+
+    def __init__(self, *args, **kwargs):
+        # Mobject.__init__ is deliberately not run here, the future runs it
+        lock = _build_locks.setdefault(repr(args), threading.Lock()) if self._serialize_builds else None
+        self.__dict__["_lazy_site"] = creation_site()
+        stats["placeholders"] += 1
+        self.__dict__["_lazy_future"] = _pool.submit(build, self._real_cls, lock, args, kwargs)
+
+    def _resolve(self):
+        future = self.__dict__.get("_lazy_future")
+        if future is None:
+            return
+        if not future.done():
+            started = time.perf_counter()
+            wait([future])
+            stats["pending"] += 1
+            stats["waited"] += time.perf_counter() - started
+        try:
+            built = future.result()
+        except Exception as error:
+            raise RuntimeError(f"{self._real_cls.__name__} created at {self.__dict__['_lazy_site']} "
+                               f"failed to build: {error}") from error
+        del self.__dict__["_lazy_future"], self.__dict__["_lazy_site"]
+        # Attributes set on the placeholder meanwhile win over the built ones
+        assigned = dict(self.__dict__)
+        self.__dict__.update(built.__dict__)
+        self.__dict__.update(assigned)
+
+    def __getattr__(self, attr):
+        # Only called for attributes the instance does not have yet
+        if "_lazy_future" in self.__dict__:
+            self._resolve()
+            return getattr(self, attr)
+        return super().__getattr__(attr)
+
+    def __deepcopy__(self, memo):
+        self._resolve()
+        return super().__deepcopy__(memo)
+
+
+def lazy_class(cls, serialize_builds=False):
+    return type(f"Lazy{cls.__name__}", (LazyMobjectMixin, cls),
+                {"_real_cls": cls, "_serialize_builds": serialize_builds})
+
+
+LazyTex = lazy_class(Tex, serialize_builds=True)
+LazyMathTex = lazy_class(MathTex, serialize_builds=True)
+LazyImageMobject = lazy_class(ImageMobject)
+
+PATCHED = dict(Tex=LazyTex, MathTex=LazyMathTex, ImageMobject=LazyImageMobject)
+
+
+def install(workers=8):
+    """Make finalvideo create Tex, MathTex and ImageMobject lazily"""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asynctex")
+    for name, cls in PATCHED.items():
+        setattr(finalvideo, name, cls)
+
+
+def uninstall():
+    for name, cls in PATCHED.items():
+        setattr(finalvideo, name, cls._real_cls)
+
+
+class FirstFrame(Exception):
+    pass
+
+
+class FirstFrameRenderer(CairoRenderer):
+    """Stops the scene as soon as its first frame has been rasterized"""
+
+    def add_frame(self, frame, num_frames=1):
+        self.first_frame = time.perf_counter()
+        raise FirstFrame
+
+
+def time_to_first_frame(scene_name, profile, lazy, workers=8):
+    """Seconds from scene creation to the first frame, with a cold Tex cache (run in a fresh process)"""
+    runner.apply_profile(profile)
+    config.disable_caching = True
+    config.write_to_movie = False
+    config.progress_bar = "none"
+    if lazy:
+        install(workers)
+    with tempfile.TemporaryDirectory(prefix="asynctex-") as media_dir:
+        config.media_dir = media_dir
+        started = time.perf_counter()
+        scene = runner.make_scene(runner.get_scenes([scene_name])[0], FirstFrameRenderer)
+        try:
+            scene.render()
+        except FirstFrame:
+            pass
+        return scene.renderer.first_frame - started, dict(stats)
+
+
+def compare(scene_name, profile, workers):
+    results = {}
+    for lazy in (False, True):
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            results[lazy] = pool.submit(time_to_first_frame, scene_name, profile, lazy, workers).result()
+    return results[False][0], *results[True]
+
+
+def check_error_site():
+    """True if a build failing behind a helper is reported at the construct() line that called the helper"""
+    install(1)
+
+    def title_text(text):
+        # Stands in for NdLinearBranding.title_text; a None string fails before LaTeX runs
+        return LazyTex(text)
+
+    def construct():
+        return title_text(None), sys._getframe().f_lineno
+
+    placeholder, line = construct()
+    try:
+        placeholder.get_center()
+    except RuntimeError as error:
+        print(error)
+        return f"{__file__}:{line} " in str(error)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    parser.add_argument("--workers", type=int, default=8, help="threads creating Tex and images")
+    parser.add_argument("--check", action="store_true", help="check that build errors name their construct() line")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        ok = check_error_site()
+        print("build errors report the construct() line" if ok else "build errors do NOT report the construct() line")
+        return 0 if ok else 1
+    for scene_cls in runner.get_scenes(args.scenes):
+        sync, lazy, counts = compare(scene_cls.__name__, args.profile, args.workers)
+        print(f"{scene_cls.__name__}: first frame after {sync:.2f}s sync, {lazy:.2f}s async "
+              f"({sync / lazy if lazy else 0:.2f}x); {counts['pending']} of {counts['placeholders']} placeholders "
+              f"still building when first touched, {counts['waited']:.2f}s waited for them")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,453 @@
+"""Benchmark suite with committed baselines and regression gating
+
+    python bench.py render                          # all render benchmarks, compared with the baseline
+    python bench.py render Scene02 collapse --save  # re-record part of the baseline
+    python bench.py ndlinear --threads 1 4          # Flatten+Linear vs NdLinear heads
+    python bench.py train                           # CNN training throughput per head (needs torch)
+
+Render benchmarks cover the five scenes plus micro-benchmarks lifted from
+finalvideo.py: NdLinearBranding.body_text, Scene01's create_data_cube, the
+Scene02 dot collapse and the Scene03 parameter counter. Each one runs in a
+fresh process at a fixed profile with an empty media directory (so LaTeX is
+always compiled and timed) and records construct time, frames per second,
+LaTeX time and peak memory. Results are compared with benchmarks/baseline.json
+and the run fails with a table of the metrics that regressed beyond the
+threshold. They live in benchscenes.py, the only part of the suite that
+needs manim.
+
+The ndlinear benchmarks compare a Flatten + Linear head with an NdLinear head
+(ndlinear.py) per input/output shape: parameters, FLOPs, latency per batch
+size and BLAS thread count, and the peak memory of one forward pass. With
+--save they also write benchmarks/ndlinear.json, whose (4,4,256) -> 10 head
+counts replace the typed-in parameter counters in Scene03/Scene04.
+
+The train benchmarks train the same small CNN (32x32x3 in, 4x4x256 feature
+maps out, as in Scene03) with either head on synthetic CIFAR-shaped data,
+fixed seed, no downloads: samples per second, per-step latency, optimizer
+state memory and the training time needed to reach a target accuracy.
+PyTorch is only imported by this subcommand, and manim not at all.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+
+import ndlinear
+
+ROOT = Path(__file__).resolve().parent
+BENCH_DIR = ROOT / "benchmarks"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+BENCH_PROFILE = "preview"
+
+# metric: (better direction, absolute slack below which changes are noise)
+METRICS = {
+    "construct_seconds": ("lower", 0.05),
+    "fps": ("higher", 0.5),
+    "latex_seconds": ("lower", 0.1),
+    "peak_rss_mb": ("lower", 8.0),
+}
+
+NDLINEAR_RESULTS = BENCH_DIR / "ndlinear.json"
+# (input dims, NdLinear output dims); the Flatten + Linear head maps to their product
+SCENE_HEAD = ((4, 4, 256), (1, 1, 10))
+NDLINEAR_SHAPES = [SCENE_HEAD, ((32, 32, 3), (1, 1, 10)), ((8, 16, 16, 16), (2, 4, 4, 8))]
+NDLINEAR_METRICS = {
+    "dense_params": ("lower", 0),
+    "ndlinear_params": ("lower", 0),
+    "dense_ms": ("lower", 0.01),
+    "ndlinear_ms": ("lower", 0.01),
+    "dense_peak_mb": ("lower", 0.5),
+    "ndlinear_peak_mb": ("lower", 0.5),
+}
+BLAS_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+TRAIN_HEADS = ("dense", "ndlinear")
+TRAIN_METRICS = {
+    "samples_per_s": ("higher", 20.0),
+    "step_ms": ("lower", 1.0),
+    "optimizer_state_mb": ("lower", 0.1),
+    "time_to_accuracy_s": ("lower", 1.0),
+}
+
+
+def run_isolated(name, profile, repeat=1):
+    """Median of ``repeat`` runs, each in a new interpreter so caches and peak RSS start clean"""
+    import benchscenes
+
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            runs.append(pool.submit(benchscenes.run_benchmark, name, profile).result())
+    result = dict(runs[0])
+    for metric in METRICS:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = statistics.median(values) if values else None
+    return result
+
+
+def shape_key(input_dims, hidden_dims):
+    return f"{','.join(map(str, input_dims))}->{','.join(map(str, hidden_dims))}"
+
+
+class DenseHead:
+    """nn.Flatten() + nn.Linear(prod(input_dims), prod(hidden_dims)) in NumPy"""
+
+    def __init__(self, input_dims, hidden_dims, seed=0, dtype=np.float32):
+        size_in, size_out = math.prod(input_dims), math.prod(hidden_dims)
+        rng = np.random.default_rng(seed)
+        bound = 1 / math.sqrt(size_in)
+        self.weight = rng.uniform(-bound, bound, (size_out, size_in)).astype(dtype)
+        self.bias = rng.uniform(-bound, bound, size_out).astype(dtype)
+        self.parameters = self.weight.size + self.bias.size
+        self.flops_per_sample = 2 * size_in * size_out
+
+    def __call__(self, x, out):
+        flat = out.reshape(len(x), -1)
+        np.matmul(x.reshape(len(x), -1), self.weight.T, out=flat)
+        flat += self.bias
+        return out
+
+
+def time_forward(head, x, out, repeat):
+    """Median milliseconds per forward pass over five rounds of ``repeat`` calls"""
+    head(x, out)
+    rounds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            head(x, out)
+        rounds.append((time.perf_counter() - started) / repeat)
+    return round(statistics.median(rounds) * 1e3, 4)
+
+
+def peak_forward_mb(head, x, out):
+    """Weights plus the peak NumPy allocates during a first forward pass (including lazily built buffers)"""
+    tracemalloc.start()
+    try:
+        head(x, out)
+        working = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round((head.parameters * x.itemsize + working) / 2**20, 3)
+
+
+def run_heads(shapes, batches, repeat):
+    """Benchmark both heads for every shape and batch size in this process (BLAS threads fixed at spawn)"""
+    rng = np.random.default_rng(1)
+    results = {}
+    for input_dims, hidden_dims in shapes:
+        kinds = dict(dense=DenseHead, ndlinear=ndlinear.NdLinear)
+        heads = {kind: cls(input_dims, hidden_dims) for kind, cls in kinds.items()}
+        summary, latency = {}, {}
+        for kind, head in heads.items():
+            summary[f"{kind}_params"] = head.parameters
+            summary[f"{kind}_flops"] = head.flops_per_sample
+        for batch in batches:
+            x = rng.standard_normal((batch, *input_dims), dtype=np.float32)
+            out = np.empty((batch, *hidden_dims), np.float32)
+            latency[batch] = {f"{kind}_ms": time_forward(head, x, out, repeat) for kind, head in heads.items()}
+            if batch == max(batches):
+                for kind, cls in kinds.items():
+                    summary[f"{kind}_peak_mb"] = peak_forward_mb(cls(input_dims, hidden_dims), x, out)
+        results[shape_key(input_dims, hidden_dims)] = (summary, latency)
+    return results
+
+
+def run_heads_isolated(shapes, batches, threads, repeat):
+    """run_heads in a fresh interpreter whose BLAS uses ``threads`` threads"""
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARIABLES}
+    os.environ.update(dict.fromkeys(BLAS_THREAD_VARIABLES, str(threads)))
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            return pool.submit(run_heads, shapes, batches, repeat).result()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def synthetic_cifar(torch, count, seed):
+    """CIFAR-shaped (count, 3, 32, 32) images of ten learnable classes: smooth class patterns plus noise"""
+    generator = torch.Generator().manual_seed(seed)
+    patterns = torch.nn.functional.interpolate(torch.randn(10, 3, 4, 4, generator=generator), size=32,
+                                               mode="bilinear", align_corners=False)
+    labels = torch.randint(0, 10, (count,), generator=generator)
+    images = patterns[labels] + 1.5 * torch.randn(count, 3, 32, 32, generator=generator)
+    return images, labels
+
+
+def train_model(torch, head):
+    """Scene03's pipeline: a small CNN to 256 feature maps of 4x4, then the head to 10 classes"""
+    nn = torch.nn
+
+    class ChannelsLast(nn.Module):
+        def forward(self, x):
+            return x.permute(0, 2, 3, 1)
+
+    class TorchNdLinear(nn.Module):
+        """NdLinear: one nn.Linear per axis of (batch, *input_dims)"""
+
+        def __init__(self, input_dims, hidden_dims):
+            super().__init__()
+            self.layers = nn.ModuleList(nn.Linear(size_in, size_out)
+                                        for size_in, size_out in zip(input_dims, hidden_dims))
+
+        def forward(self, x):
+            for axis, layer in enumerate(self.layers, start=1):
+                x = layer(x.transpose(axis, -1)).transpose(axis, -1)
+            return x
+
+    backbone = [
+        nn.Conv2d(3, 64, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(64, 128, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+        nn.Conv2d(128, 256, 3, padding=1), nn.ReLU(), nn.MaxPool2d(2),
+    ]
+    if head == "dense":
+        return nn.Sequential(*backbone, nn.Flatten(), nn.Linear(4096, 10))
+    # Channels last, so the head is Scene04's NdLinear((4, 4, 256), (1, 1, 10))
+    return nn.Sequential(*backbone, ChannelsLast(), TorchNdLinear(*SCENE_HEAD), nn.Flatten())
+
+
+def run_training(head, steps, batch, threads, target, seed):
+    """Train one head in this (fresh) process and return its metrics"""
+    try:
+        import torch
+    except ImportError:
+        raise SystemExit("bench.py train needs PyTorch (pip install torch)")
+    torch.set_num_threads(threads)
+    torch.manual_seed(seed)
+    images, labels = synthetic_cifar(torch, 8192, seed)
+    eval_images, eval_labels = images[-1024:], labels[-1024:]
+    images, labels = images[:-1024], labels[:-1024]
+    model = train_model(torch, head)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    loss_fn = torch.nn.CrossEntropyLoss()
+    order = torch.randperm(len(images), generator=torch.Generator().manual_seed(seed))
+
+    step_seconds, trained, reached = [], 0.0, None
+    for step in range(steps):
+        index = order[(step * batch) % len(images):][:batch]
+        if len(index) < batch:
+            index = order[:batch]
+        started = time.perf_counter()
+        optimizer.zero_grad(set_to_none=True)
+        loss_fn(model(images[index]), labels[index]).backward()
+        optimizer.step()
+        step_seconds.append(time.perf_counter() - started)
+        trained += step_seconds[-1]
+        if reached is None and (step + 1) % 25 == 0:
+            # Evaluation is not training time
+            with torch.no_grad():
+                accuracy = (model(eval_images).argmax(1) == eval_labels).float().mean().item()
+            if accuracy >= target:
+                reached = trained
+    state_bytes = sum(value.numel() * value.element_size() for state in optimizer.state.values()
+                      for value in state.values() if torch.is_tensor(value))
+    # The first steps include allocator warm-up
+    steady = step_seconds[min(5, len(step_seconds) - 1):]
+    return dict(
+        params=sum(parameter.numel() for parameter in model.parameters()),
+        samples_per_s=round(batch * len(steady) / sum(steady), 1),
+        step_ms=round(statistics.median(steady) * 1e3, 2),
+        optimizer_state_mb=round(state_bytes / 2**20, 3),
+        time_to_accuracy_s=round(reached, 2) if reached is not None else None,
+    )
+
+
+def run_training_isolated(head, steps, batch, threads, target, seed):
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(run_training, head, steps, batch, threads, target, seed).result()
+
+
+def package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment(profile):
+    return dict(profile=profile, manim=package_version("manim"), python=platform.python_version(),
+                numpy=np.__version__, machine=platform.machine(), processor=platform.processor() or None)
+
+
+def compare(baseline, current, threshold, metrics=METRICS):
+    """Rows (name, metric, baseline, current, relative change, regressed) for every shared metric"""
+    rows = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        for metric, (better, slack) in metrics.items():
+            old, new = baseline[name].get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = new - old if better == "lower" else old - new
+            regressed = worse > slack and worse > threshold * abs(old)
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'benchmark':<32} {'metric':<18} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, metric, old, new, change, regressed in rows:
+        marker = "  REGRESSED" if regressed else ""
+        print(f"{name:<32} {metric:<18} {old:>10} {new:>10} {change:>+8.1%}{marker}")
+
+
+def load_baseline(path):
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def save_results(path, section, env, results):
+    """Merge ``results`` into one section of the baseline file"""
+    data = load_baseline(path) or {}
+    stored = data.setdefault(section, dict(environment=env, results={}))
+    stored["environment"] = env
+    stored["results"].update(results)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def gate(args, section, results, env, metrics=METRICS):
+    """Save or compare one section of the baseline; returns the exit status"""
+    path = args.baseline
+    if args.save:
+        save_results(path, section, env, results)
+        print(f"saved {len(results)} results to {path}")
+        return 0
+    stored = (load_baseline(path) or {}).get(section)
+    if stored is None:
+        print(f"no {section} baseline in {path}, run with --save to record one")
+        return 0
+    if stored["environment"].get("profile") != env.get("profile"):
+        print(f"baseline was recorded at profile {stored['environment'].get('profile')!r}, not {env.get('profile')!r}")
+        return 2
+    changed = {key: (stored["environment"].get(key), value) for key, value in env.items()
+               if stored["environment"].get(key) != value}
+    for key, (old, new) in changed.items():
+        print(f"note: {key} changed from {old} to {new}")
+    rows = compare(stored["results"], results, args.threshold, metrics)
+    print_comparison(rows)
+    regressed = [row for row in rows if row[-1]]
+    if regressed:
+        print(f"{len(regressed)} metrics regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+def render_command(args):
+    import benchscenes
+    import runner
+
+    if args.profile not in runner.PROFILES:
+        raise SystemExit(f"Unknown profile {args.profile!r} (known: {', '.join(sorted(runner.PROFILES))})")
+    names = []
+    for wanted in args.names or benchscenes.BENCHMARKS:
+        matches = [name for name in benchscenes.BENCHMARKS if name == wanted or name.startswith(wanted)]
+        if not matches:
+            raise SystemExit(f"Unknown benchmark {wanted!r} (known: {', '.join(benchscenes.BENCHMARKS)})")
+        names.extend(matches)
+    results = {}
+    for name in names:
+        results[name] = run_isolated(name, args.profile, args.repeat)
+        print(f"{name:<32} " + "  ".join(f"{key}={value}" for key, value in results[name].items()), flush=True)
+    return gate(args, "render", results, environment(args.profile))
+
+
+def ndlinear_command(args):
+    shapes = [SCENE_HEAD] if args.scene_only else NDLINEAR_SHAPES
+    results = {}
+    for threads in args.threads:
+        measured = run_heads_isolated(shapes, args.batches, threads, args.repeat)
+        for key, (summary, latency) in measured.items():
+            if key not in results:
+                results[key] = summary
+                print(f"{key:<32} " + "  ".join(f"{name}={value:,}" for name, value in summary.items()))
+            for batch, timings in latency.items():
+                name = f"{key} b{batch} t{threads}"
+                results[name] = timings
+                print(f"{name:<32} " + "  ".join(f"{metric}={value}" for metric, value in results[name].items()),
+                      flush=True)
+    env = environment(None)
+    if args.save:
+        # finalvideo.py reads the scene head's counts from here, so only --save changes them
+        scene = results[shape_key(*SCENE_HEAD)]
+        NDLINEAR_RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        NDLINEAR_RESULTS.write_text(json.dumps(dict(
+            environment=dict(env, batches=args.batches, threads=args.threads),
+            scene={name: scene[name] for name in ("dense_params", "ndlinear_params", "dense_flops", "ndlinear_flops")},
+            results=results,
+        ), indent=2) + "\n")
+        print(f"wrote {NDLINEAR_RESULTS}")
+    return gate(args, "ndlinear", results, env, NDLINEAR_METRICS)
+
+
+def train_command(args):
+    unknown = set(args.heads) - set(TRAIN_HEADS)
+    if unknown:
+        raise SystemExit(f"Unknown head {sorted(unknown)[0]!r} (known: {', '.join(TRAIN_HEADS)})")
+    results = {}
+    for head in args.heads or TRAIN_HEADS:
+        results[head] = run_training_isolated(head, args.steps, args.batch, args.threads, args.target, args.seed)
+        print(f"{head:<32} " + "  ".join(f"{key}={value}" for key, value in results[head].items()), flush=True)
+    env = environment(None)
+    env.update(batch=args.batch, steps=args.steps, threads=args.threads, target=args.target, seed=args.seed)
+    return gate(args, "train", results, env, TRAIN_METRICS)
+
+
+def add_gate_arguments(parser):
+    parser.add_argument("--save", action="store_true", help="write the results into the baseline instead of comparing")
+    parser.add_argument("--baseline", type=lambda path: ROOT / path, default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative regression that fails the run")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="scene and micro render benchmarks")
+    render.add_argument("names", nargs="*", help="benchmark names or prefixes (default: all)")
+    render.add_argument("--profile", default=BENCH_PROFILE, help="runner.py profile")
+    render.add_argument("--repeat", type=int, default=1, help="runs per benchmark, the median is kept")
+    add_gate_arguments(render)
+    render.set_defaults(func=render_command)
+
+    heads = commands.add_parser("ndlinear", help="Flatten+Linear vs NdLinear heads on the CPU")
+    heads.add_argument("--batches", type=int, nargs="+", default=[1, 32, 256])
+    heads.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                       help="BLAS thread counts, each run in its own process")
+    heads.add_argument("--repeat", type=int, default=20, help="forward passes per timing round")
+    heads.add_argument("--scene-only", action="store_true", help=f"only the {shape_key(*SCENE_HEAD)} head")
+    add_gate_arguments(heads)
+    heads.set_defaults(func=ndlinear_command)
+
+    train = commands.add_parser("train", help="CNN training throughput with a Flatten+Linear or NdLinear head")
+    train.add_argument("heads", nargs="*", help=f"heads to train (default: {' and '.join(TRAIN_HEADS)})")
+    train.add_argument("--steps", type=int, default=300)
+    train.add_argument("--batch", type=int, default=64)
+    train.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="torch intra-op threads")
+    train.add_argument("--target", type=float, default=0.9, help="held-out accuracy for time_to_accuracy_s")
+    train.add_argument("--seed", type=int, default=0)
+    add_gate_arguments(train)
+    train.set_defaults(func=train_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""Render benchmarks for bench.py
+
+Kept out of bench.py so that `bench.py ndlinear` and `bench.py train` run
+without manim: only `bench.py render` imports this module.
+"""
+
+import tempfile
+import time
+
+import manim
+from manim import (DOWN, LEFT, PI, UP, WHITE, DecimalNumber, Dot, Rectangle, Rotate, Scene, ThreeDScene,
+                   ValueTracker, VGroup, config)
+from manim.renderer.cairo_renderer import CairoRenderer
+
+import finalvideo
+import metrics
+import runner
+from finalvideo import NdLinearBranding, Scene01_Introduction
+
+
+class CollapseBench(Scene):
+    """Scene02: sixteen grid dots collapsing onto the flattened vector"""
+
+    def construct(self):
+        dots = VGroup(*[Dot(point=[(col - 1.5) * 0.6, (1.5 - row) * 0.6 + 0.7, 0],
+                            color=NdLinearBranding.SECONDARY, radius=0.08)
+                        for row in range(4) for col in range(4)])
+        self.add(dots)
+        spacing = 8 * 0.95 / (len(dots) - 1)
+        self.play(*[dot.animate.move_to([-4 + i * spacing, -0.8, 0]) for i, dot in enumerate(dots)], run_time=1.5)
+
+
+class CounterBench(Scene):
+    """Scene03: DecimalNumber following a ValueTracker up to the CNN parameter count"""
+
+    def construct(self):
+        tracker = ValueTracker(0)
+        number = DecimalNumber(0, num_decimal_places=0, group_with_commas=True, font_size=24, color=WHITE)
+        number.add_updater(lambda mob: mob.set_value(tracker.get_value()))
+        title = NdLinearBranding.body_text("Parameter Count", font_size=24)
+        container = VGroup(title, number).arrange(DOWN, aligned_edge=LEFT, buff=0.1)
+        background = Rectangle(width=container.width + 0.4, height=container.height + 0.4).move_to(container)
+        self.add(background, container)
+        self.play(tracker.animate.set_value(finalvideo.PARAM_COUNTS["cnn"]), run_time=1.0)
+
+
+class DataCubeBench(ThreeDScene):
+    """Scene01: the 64-cell data cube, built and turned once at the scene's camera angle"""
+
+    def construct(self):
+        self.set_camera_orientation(phi=70 * manim.DEGREES, theta=45 * manim.DEGREES)
+        cube = Scene01_Introduction.create_data_cube(self)
+        self.add(cube)
+        self.play(Rotate(cube, angle=PI / 2, axis=UP), run_time=1.0)
+
+
+BODY_TEXTS = [
+    "256",
+    "Feature maps: $4\\times 4$ spatial grid\\\\with 256 channels at each location",
+    "Flattened Vector ($4 \\times 4 \\times 256 = 4096$ values)",
+    "Parameter Count",
+]
+
+
+def bench_body_text(repeat=20):
+    """Cold then warm NdLinearBranding.body_text calls; no frames"""
+    for text in BODY_TEXTS * repeat:
+        NdLinearBranding.body_text(text, font_size=20)
+    return dict(frames=0)
+
+
+SCENE_BENCHMARKS = {cls.__name__: cls for cls in runner.SCENES}
+SCENE_BENCHMARKS.update(data_cube=DataCubeBench, collapse=CollapseBench, counter=CounterBench)
+BENCHMARKS = [*SCENE_BENCHMARKS, "body_text"]
+
+
+class BenchRenderer(CairoRenderer):
+    """Cairo renderer that counts frames and the time spent inside play()"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frames = 0
+        self.play_seconds = 0.0
+
+    def play(self, scene, *args, **kwargs):
+        started = time.perf_counter()
+        super().play(scene, *args, **kwargs)
+        self.play_seconds += time.perf_counter() - started
+
+    def render(self, scene, time, moving_mobjects):
+        super().render(scene, time, moving_mobjects)
+        if not self.skip_animations:
+            self.frames += 1
+
+    def freeze_current_frame(self, duration):
+        super().freeze_current_frame(duration)
+        if not self.skip_animations:
+            self.frames += int(duration / (1 / self.camera.frame_rate))
+
+
+def run_benchmark(name, profile):
+    """Run one benchmark in this (fresh) process and return its metrics"""
+    runner.apply_profile(profile)
+    config.disable_caching = True
+    config.progress_bar = "none"
+    config.verbosity = "WARNING"
+    render_metrics = metrics.RenderMetrics()
+    with tempfile.TemporaryDirectory(prefix="bench-") as media_dir:
+        config.media_dir = media_dir
+        runner.reset_peak_rss()
+        started = time.perf_counter()
+        with metrics.tex_metrics(render_metrics):
+            if name == "body_text":
+                frames, play_seconds = bench_body_text()["frames"], 0.0
+            else:
+                scene = runner.run_scene(SCENE_BENCHMARKS[name], BenchRenderer)
+                frames, play_seconds = scene.renderer.frames, scene.renderer.play_seconds
+        total = time.perf_counter() - started
+    return dict(
+        construct_seconds=round(total - play_seconds, 3),
+        fps=round(frames / play_seconds, 2) if play_seconds else None,
+        latex_seconds=round(render_metrics.latex_sum, 3),
+        peak_rss_mb=round(runner.peak_rss_mb(), 1),
+        frames=frames,
+    )
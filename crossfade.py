@@ -0,0 +1,230 @@
+"""Join the scenes with crossfades, re-encoding only the transitions
+
+Every scene is rendered into the lossless mezzanine format of delivery.py,
+with forced keyframes at the cuts: one at the end of the fade-in (scene
+frame F, for a fade of F frames) and a grid every ``--gop`` seconds of scene
+time, so the fade-out always starts at most one grid step before its last
+keyframe. Frames are counted across plays, so the grid follows the scene's
+clock and not each partial movie's.
+
+Joining then never decodes a scene body:
+
+- bodies (head keyframe to tail keyframe) are stream-copied;
+- each transition window (the tail of one scene from its last keyframe
+  before the fade, the head of the next up to its keyframe at F) is decoded,
+  blended with xfade and re-encoded with the same x264 settings;
+- delivery.concat stream-copies bodies and windows into one file.
+
+Re-encoded frames per transition are at most 2F + gop, so assembly time
+grows with the number of transitions, not the length of the video.
+
+    python crossfade.py                       # render at draft, join with 0.5s fades
+    python crossfade.py --skip-render --fade 1 --full   # rejoin, and time a full re-encode for comparison
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+from manim import config
+from manim.utils.file_ops import guarantee_existence
+
+import delivery
+import runner
+
+CROSSFADE_DIR = runner.ROOT / "media" / "crossfade"
+
+
+class KeyframeFileWriter(delivery.MezzanineFileWriter):
+    """Mezzanine writer with keyframes at frame ``fade_frames`` and every ``gop`` frames of the scene"""
+
+    fade_frames = 8
+    gop = 15
+
+    def init_output_directories(self, scene_name):
+        super().init_output_directories(scene_name)
+        self.scene_frames = 0
+        if hasattr(self, "partial_movie_directory"):
+            # Same encoder as the master, different keyframes: keep the partial movies apart
+            self.partial_movie_directory = guarantee_existence(self.partial_movie_directory.parent / "crossfade")
+            self.movie_file_path = guarantee_existence(CROSSFADE_DIR / "scenes") / f"{scene_name}.mp4"
+
+    def write_frame(self, frame_or_renderer):
+        super().write_frame(frame_or_renderer)
+        self.scene_frames += 1
+
+    def encoder_args(self):
+        # n counts frames of this partial movie; scene_frames is where it starts in the scene
+        frame = f"(n+{self.scene_frames})"
+        return [*super().encoder_args(), "-forced-idr", "1",
+                "-force_key_frames", f"expr:eq({frame},{self.fade_frames})+not(mod({frame},{self.gop}))"]
+
+
+class Clip:
+    """Frame rate, frame count and keyframe positions of one scene movie"""
+
+    def __init__(self, path, ffprobe="ffprobe"):
+        self.path = path
+        output = subprocess.run([
+            ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=r_frame_rate,time_base:packet=pts_time,flags", "-of", "json", str(path),
+        ], check=True, capture_output=True, text=True).stdout
+        data = json.loads(output)
+        stream = data["streams"][0]
+        self.rate = Fraction(stream["r_frame_rate"])
+        self.timescale = Fraction(stream["time_base"]).denominator
+        packets = sorted((float(packet["pts_time"]), "K" in packet["flags"]) for packet in data["packets"])
+        self.frames = len(packets)
+        self.keyframes = [round((pts - packets[0][0]) * self.rate) for pts, key in packets if key]
+
+    def seconds(self, frames):
+        return float(frames / self.rate)
+
+    def head_cut(self, fade_frames):
+        """First keyframe at or after the fade-in"""
+        key = min((key for key in self.keyframes if key >= fade_frames), default=None)
+        if key is None:
+            raise SystemExit(f"{self.path.name} has no keyframe at or after its {fade_frames}-frame fade-in; "
+                             f"render it with this fade (no --skip-render) or check it is longer than the fade")
+        return key
+
+    def tail_cut(self, fade_frames):
+        """Last keyframe at or before the fade-out"""
+        key = max((key for key in self.keyframes if key <= self.frames - fade_frames), default=None)
+        if key is None:
+            raise SystemExit(f"{self.path.name} ({self.frames} frames) is too short for a {fade_frames}-frame fade-out")
+        return key
+
+
+def render_scenes(scene_classes, fade, gop):
+    """Render every scene with keyframes at the cuts; returns the scene movies"""
+    KeyframeFileWriter.fade_frames = round(fade * config.frame_rate)
+    KeyframeFileWriter.gop = max(1, round(gop * config.frame_rate))
+    # Frames are counted as they are written, so no play may come from the cache
+    config.disable_caching = True
+    movies = []
+    for scene_cls in scene_classes:
+        scene = runner.run_scene(scene_cls, file_writer_class=KeyframeFileWriter)
+        movies.append(scene.renderer.file_writer.movie_file_path)
+    return movies
+
+
+def copy_body(clip, start, stop, output):
+    """Stream-copy frames [start, stop) of a clip; start is a keyframe"""
+    command = [config.ffmpeg_executable, "-y", "-loglevel", "error"]
+    if start:
+        # Seeking half a frame past the keyframe lands on it; stream copy keeps it
+        command += ["-ss", f"{clip.seconds(start + 0.5):.6f}"]
+    command += ["-i", str(clip.path), "-frames:v", str(stop - start), "-c", "copy", "-an",
+                "-avoid_negative_ts", "make_zero", "-video_track_timescale", str(clip.timescale), str(output)]
+    subprocess.run(command, check=True)
+    return output
+
+
+def encode_window(outgoing, incoming, tail, head, fade_frames, output):
+    """Frames from ``tail`` to the end of one clip, crossfaded into the first ``head`` frames of the next"""
+    length = outgoing.frames - tail
+    graph = (f"[0:v]trim=end_frame={length},setpts=PTS-STARTPTS[a];"
+             f"[1:v]trim=end_frame={head},setpts=PTS-STARTPTS[b];"
+             f"[a][b]xfade=transition=fade:duration={outgoing.seconds(fade_frames):.6f}"
+             f":offset={outgoing.seconds(length - fade_frames):.6f}[v]")
+    command = [config.ffmpeg_executable, "-y", "-loglevel", "error"]
+    if tail:
+        # Half a frame early: decoding starts at the keyframe before, frame ``tail`` is the first kept
+        command += ["-ss", f"{outgoing.seconds(tail - 0.5):.6f}"]
+    command += ["-i", str(outgoing.path), "-t", f"{incoming.seconds(head + 0.5):.6f}", "-i", str(incoming.path),
+                "-filter_complex", graph, "-map", "[v]", "-r", str(outgoing.rate), "-an",
+                *delivery.MEZZANINE_X264, "-video_track_timescale", str(outgoing.timescale), str(output)]
+    subprocess.run(command, check=True)
+    return output
+
+
+def join(clips, fade_frames, output, jobs=None):
+    """Crossfade consecutive clips into ``output``; returns seconds spent per stage and frames re-encoded"""
+    for clip in clips:
+        if clip.rate != clips[0].rate:
+            raise SystemExit(f"{clip.path.name} is at {clip.rate} fps, {clips[0].path.name} at {clips[0].rate}")
+    heads = [0] + [clip.head_cut(fade_frames) for clip in clips[1:]]
+    tails = [clip.tail_cut(fade_frames) for clip in clips[:-1]] + [clips[-1].frames]
+    for clip, head, tail in zip(clips, heads, tails):
+        if tail < head:
+            raise SystemExit(f"{clip.path.name} is too short for {fade_frames}-frame fades at both ends")
+    parts = guarantee_existence(output.parent / f"{output.stem}-parts")
+    seconds = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(clips)) as pool:
+        started = time.perf_counter()
+        bodies = [pool.submit(copy_body, clip, head, tail, parts / f"body{i}.mp4")
+                  for i, (clip, head, tail) in enumerate(zip(clips, heads, tails))]
+        bodies = [body.result() for body in bodies]
+        seconds["copy bodies"] = time.perf_counter() - started
+        started = time.perf_counter()
+        windows = [pool.submit(encode_window, clips[i], clips[i + 1], tails[i], heads[i + 1], fade_frames,
+                               parts / f"window{i}.mp4") for i in range(len(clips) - 1)]
+        windows = [window.result() for window in windows]
+        seconds["encode transitions"] = time.perf_counter() - started
+    started = time.perf_counter()
+    partial = output.with_suffix(".partial.mp4")
+    delivery.concat([part for pair in zip(bodies, windows + [None]) for part in pair if part], partial)
+    os.replace(partial, output)
+    seconds["concat"] = time.perf_counter() - started
+    encoded = sum(clip.frames - tail + head for clip, tail, head in zip(clips, tails, heads[1:]))
+    return seconds, encoded
+
+
+def full_reencode(clips, fade_frames, output):
+    """The same crossfades as one filter graph over whole scenes, for comparison"""
+    command = [config.ffmpeg_executable, "-y", "-loglevel", "error"]
+    for clip in clips:
+        command += ["-i", str(clip.path)]
+    graph, label, offset = [], "0:v", 0
+    for i, clip in enumerate(clips[1:], 1):
+        offset += clips[i - 1].frames - fade_frames
+        graph.append(f"[{label}][{i}:v]xfade=transition=fade:duration={clip.seconds(fade_frames):.6f}"
+                     f":offset={clip.seconds(offset):.6f}[x{i}]")
+        label = f"x{i}"
+    command += ["-filter_complex", ";".join(graph), "-map", f"[{label}]", "-an", *delivery.MEZZANINE_X264,
+                str(output)]
+    subprocess.run(command, check=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes, in order (default: all)")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    parser.add_argument("--fade", type=float, default=0.5, help="crossfade length in seconds")
+    parser.add_argument("--gop", type=float, default=1.0, help="seconds between forced keyframes in the scenes")
+    parser.add_argument("--skip-render", action="store_true", help="join the scene movies already rendered")
+    parser.add_argument("--full", action="store_true", help="also time a re-encode of the whole video")
+    parser.add_argument("--jobs", type=int, help="parallel ffmpeg processes (default: one per scene)")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    scene_classes = runner.get_scenes(args.scenes)
+    if args.skip_render:
+        movies = [CROSSFADE_DIR / "scenes" / f"{cls.__name__}.mp4" for cls in scene_classes]
+    else:
+        config.progress_bar = "none"
+        movies = render_scenes(scene_classes, args.fade, args.gop)
+    clips = [Clip(movie) for movie in movies]
+    fade_frames = round(args.fade * clips[0].rate)
+    output = guarantee_existence(CROSSFADE_DIR) / f"crossfade-{args.profile}.mp4"
+
+    seconds, encoded = join(clips, fade_frames, output, args.jobs)
+    total = sum(clip.frames for clip in clips) - fade_frames * (len(clips) - 1)
+    print(f"{len(clips) - 1} transitions of {fade_frames} frames, {encoded} of {total} frames re-encoded")
+    for stage, elapsed in seconds.items():
+        print(f"  {stage:<20} {elapsed:6.2f}s")
+    print(f"  {'total':<20} {sum(seconds.values()):6.2f}s -> {output.relative_to(runner.ROOT)}")
+    if args.full:
+        started = time.perf_counter()
+        full_reencode(clips, fade_frames, output.with_name(f"{output.stem}-full.mp4"))
+        print(f"  {'full re-encode':<20} {time.perf_counter() - started:6.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
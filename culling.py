@@ -0,0 +1,174 @@
+"""Culling of invisible mobjects and a leaked-mobject report
+
+The camera mixin drops fully transparent, zero-area and off-frame mobjects
+before any cairo path work. The renderer tracks, per top-level mobject, how
+long it stayed in the scene while nothing of it was drawn, and every scene ends
+with a report of those that stayed invisible for longer than a threshold
+together with what drawing them cost per frame, plus fixed-in-frame
+registrations left behind by mobjects that are no longer in the scene.
+
+    python culling.py Scene03 Scene04 --leak-seconds 2
+"""
+
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+from manim import ThreeDCamera, config, logger
+from manim.renderer.cairo_renderer import CairoRenderer
+
+import layout
+import runner
+
+# Slack around the frame, in frame units, so thick strokes at the edge survive
+FRAME_MARGIN = 0.1
+
+
+class CullingCameraMixin:
+    """Camera mixin that skips mobjects which cannot put a pixel on screen
+
+    Layer it over Camera or ThreeDCamera, see runner.camera_class_for().
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cull_counts = Counter()
+        self.drawn_count = 0
+        super().__init__(*args, **kwargs)
+
+    def cull_reason(self, mob):
+        """Why ``mob`` would not be drawn, None if it would"""
+        if mob.get_num_points() == 0:
+            return "empty"
+        if not layout.is_visible(mob):
+            return "transparent"
+        points = layout.display_points(self, mob)
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        pixels_per_unit = self.pixel_height / self.frame_height
+        if ((high - low)[:2] * pixels_per_unit < 0.5).all():
+            return "zero-area"
+        half_width = self.frame_width / 2 + FRAME_MARGIN
+        half_height = self.frame_height / 2 + FRAME_MARGIN
+        if high[0] < -half_width or low[0] > half_width or high[1] < -half_height or low[1] > half_height:
+            return "off-frame"
+        return None
+
+    def get_mobjects_to_display(self, *args, **kwargs):
+        kept = []
+        for mob in super().get_mobjects_to_display(*args, **kwargs):
+            reason = self.cull_reason(mob)
+            if reason is None:
+                kept.append(mob)
+            else:
+                self.cull_counts[reason] += 1
+        self.drawn_count += len(kept)
+        return kept
+
+    def draw_cost_us(self, mob, repeat=3):
+        """Microseconds the stock camera spends per frame drawing ``mob``'s family"""
+        scratch = np.zeros_like(self.pixel_array)
+        family = mob.family_members_with_points()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for member in family:
+                self.display_funcs_for(member)([member], scratch)
+        cost = (time.perf_counter() - started) / repeat * 1e6
+        self.pixel_array_to_cairo_context.pop(id(scratch), None)
+        return cost
+
+    def display_funcs_for(self, mob):
+        # Camera.type_or_raise is what builds display_funcs in the first place
+        return self.display_funcs[self.type_or_raise(mob)]
+
+
+class CullingRenderer(CairoRenderer):
+    """Cairo renderer that keeps track of how long top-level mobjects stay invisible"""
+
+    def __init__(self, leak_seconds=2.0, **kwargs):
+        super().__init__(**kwargs)
+        if not isinstance(self.camera, CullingCameraMixin):
+            raise TypeError("CullingRenderer needs a camera with CullingCameraMixin")
+        self.leak_seconds = leak_seconds
+        self.invisible = {}
+        self.report = []
+
+    def fully_culled(self, mob):
+        if isinstance(self.camera, ThreeDCamera):
+            self.camera.reset_rotation_matrix()
+        return all(self.camera.cull_reason(member) is not None for member in mob.family_members_with_points())
+
+    def play(self, scene, *args, **kwargs):
+        super().play(scene, *args, **kwargs)
+        present = set()
+        for mob in scene.mobjects:
+            present.add(id(mob))
+            if not self.fully_culled(mob):
+                self.invisible.pop(id(mob), None)
+                continue
+            entry = self.invisible.setdefault(id(mob), dict(mob=mob, since=self.time - scene.duration))
+            entry["seconds"] = self.time - entry["since"]
+        # Removed mobjects are no longer leaking
+        for key in list(self.invisible):
+            if key not in present:
+                del self.invisible[key]
+
+    def scene_finished(self, scene):
+        super().scene_finished(scene)
+        self.report = self.leak_report(scene)
+        counts = ", ".join(f"{count} {reason}" for reason, count in self.camera.cull_counts.most_common())
+        logger.info(f"{type(scene).__name__}: drew {self.camera.drawn_count} mobjects, culled {counts or 'none'}")
+
+    def leak_report(self, scene):
+        leaks = []
+        for entry in self.invisible.values():
+            if entry["seconds"] < self.leak_seconds:
+                continue
+            mob = entry["mob"]
+            leaks.append(dict(
+                kind="invisible",
+                mobject=layout.describe(mob),
+                seconds=round(entry["seconds"], 2),
+                points=sum(member.get_num_points() for member in mob.family_members_with_points()),
+                stock_cost_us=round(self.camera.draw_cost_us(mob), 1),
+            ))
+        fixed = getattr(self.camera, "fixed_in_frame_mobjects", ())
+        if fixed:
+            in_scene = {id(member) for member in scene.get_mobject_family_members()}
+            orphans = [mob for mob in fixed if id(mob) not in in_scene]
+            if orphans:
+                leaks.append(dict(
+                    kind="fixed-in-frame",
+                    mobject=f"{len(orphans)} registrations for removed mobjects",
+                    seconds=None,
+                    points=sum(mob.get_num_points() for mob in orphans),
+                    stock_cost_us=0.0,
+                ))
+        return sorted(leaks, key=lambda leak: -leak["stock_cost_us"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--leak-seconds", type=float, default=2.0,
+                        help="report mobjects invisible for at least this long")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    config.disable_caching = True
+    for scene_cls in runner.get_scenes(args.scenes):
+        scene = runner.run_scene(scene_cls, CullingRenderer, (CullingCameraMixin,), leak_seconds=args.leak_seconds)
+        camera = scene.renderer.camera
+        culled = sum(camera.cull_counts.values())
+        print(f"{scene_cls.__name__}: {camera.drawn_count} drawn, {culled} culled "
+              f"({dict(camera.cull_counts)})")
+        for leak in scene.renderer.report:
+            seconds = f"{leak['seconds']:6.2f}s" if leak["seconds"] is not None else "       "
+            print(f"  {leak['kind']:<15} {seconds}  {leak['points']:>6} points  "
+                  f"{leak['stock_cost_us']:8.1f} us/frame  {leak['mobject']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""Render finalvideo.py once into a lossless master and derive every delivery variant from it
+
+The master is rendered at the production profile with lossless x264 (4:4:4,
+qp 0) partial movies and joined into one file. Delivery variants are then
+downscaled and re-encoded from the master in parallel and cached per master
+fingerprint, so adding a target never runs manim again.
+
+    python delivery.py                      # master if stale, then all variants
+    python delivery.py --variants web-720p  # only one target
+    python delivery.py --list
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import manim
+from manim import config, logger
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils.file_ops import guarantee_existence
+
+import runner
+
+DELIVERY_DIR = runner.ROOT / "media" / "delivery"
+
+# name: (height, frame rate or None to keep the master's, x264 options)
+VARIANTS = {
+    "youtube-1080p": (1080, None, ["-preset", "slow", "-crf", "16"]),
+    "web-720p": (720, 30, ["-preset", "medium", "-crf", "22"]),
+    "preview-low": (360, 24, ["-preset", "veryfast", "-b:v", "400k", "-maxrate", "400k", "-bufsize", "800k"]),
+}
+
+ASSETS = ["finalvideo.py", "ensemblelogo.png", "horse_cifar.png"]
+# Read by finalvideo.py when present (the measured parameter counts)
+OPTIONAL_ASSETS = ["benchmarks/ndlinear.json"]
+
+# Lossless x264 used for the master's partial movies
+MEZZANINE_X264 = ["-vcodec", "libx264", "-preset", "ultrafast", "-qp", "0", "-pix_fmt", "yuv444p"]
+
+
+class MezzanineFileWriter(SceneFileWriter):
+    """Scene file writer that encodes lossless partial movies
+
+    They are kept apart from the regular lossy partial movies, which would
+    otherwise be picked up by manim's play() hash cache.
+    """
+
+    def init_output_directories(self, scene_name):
+        super().init_output_directories(scene_name)
+        if hasattr(self, "partial_movie_directory"):
+            self.partial_movie_directory = guarantee_existence(self.partial_movie_directory / "mezzanine")
+            self.movie_file_path = guarantee_existence(DELIVERY_DIR / "scenes") / f"{scene_name}.mp4"
+
+    def encoder_args(self):
+        return MEZZANINE_X264
+
+    def open_movie_pipe(self, file_path=None):
+        if file_path is None:
+            file_path = self.partial_movie_files[self.renderer.num_plays]
+        self.partial_movie_file_path = file_path
+        command = [
+            config.ffmpeg_executable, "-y",
+            "-f", "rawvideo",
+            "-s", f"{config.pixel_width}x{config.pixel_height}",
+            "-pix_fmt", "rgba",
+            "-r", str(config.frame_rate),
+            "-i", "-",
+            "-an",
+            "-loglevel", config.ffmpeg_loglevel.lower(),
+            *self.encoder_args(),
+            file_path,
+        ]
+        self.writing_process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(profile):
+    """Everything that can change the master's pixels"""
+    digest = hashlib.sha256(f"{manim.__version__}:{runner.PROFILES[profile]}".encode())
+    for name in ASSETS:
+        digest.update(name.encode())
+        digest.update(bytes.fromhex(file_digest(runner.ROOT / name)))
+    for name in OPTIONAL_ASSETS:
+        if (runner.ROOT / name).exists():
+            digest.update(name.encode())
+            digest.update(bytes.fromhex(file_digest(runner.ROOT / name)))
+    return digest.hexdigest()[:16]
+
+
+def concat(inputs, output):
+    list_file = output.with_suffix(".txt")
+    list_file.write_text("".join(f"file 'file:{Path(p).as_posix()}'\n" for p in inputs))
+    subprocess.run([
+        config.ffmpeg_executable, "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", str(list_file), "-c", "copy", str(output),
+    ], check=True)
+    list_file.unlink()
+
+
+def render_master(profile="production", force=False):
+    """Path of the lossless master for the current sources, rendering it if needed"""
+    master = guarantee_existence(DELIVERY_DIR) / f"master-{source_fingerprint(profile)}.mp4"
+    if master.exists() and not force:
+        logger.info(f"Master is up to date: {master}")
+        return master
+
+    runner.apply_profile(profile)
+    scene_movies = []
+    for scene_cls in runner.SCENES:
+        scene = runner.run_scene(scene_cls, file_writer_class=MezzanineFileWriter)
+        scene_movies.append(scene.renderer.file_writer.movie_file_path)
+
+    partial = master.with_suffix(".partial.mp4")
+    concat(scene_movies, partial)
+    os.replace(partial, master)
+    return master
+
+
+def transcode(master, master_fp, name):
+    """Derive one delivery variant from the master, reusing a cached one"""
+    height, fps, x264 = VARIANTS[name]
+    output = guarantee_existence(DELIVERY_DIR / master_fp) / f"{name}.mp4"
+    if output.exists():
+        return output, True
+    partial = output.with_suffix(".partial.mp4")
+    command = [
+        config.ffmpeg_executable, "-y", "-loglevel", "error", "-i", str(master),
+        "-vf", f"scale=-2:{height}:flags=lanczos",
+    ]
+    if fps is not None:
+        command += ["-r", str(fps)]
+    command += ["-c:v", "libx264", *x264, "-pix_fmt", "yuv420p", "-movflags", "+faststart", str(partial)]
+    subprocess.run(command, check=True)
+    os.replace(partial, output)
+    return output, False
+
+
+def derive_variants(master, names, jobs=None):
+    master_fp = file_digest(master)[:16]
+    with ThreadPoolExecutor(max_workers=jobs or len(names)) as pool:
+        futures = {name: pool.submit(transcode, master, master_fp, name) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=sorted(VARIANTS))
+    parser.add_argument("--master-profile", choices=sorted(runner.PROFILES), default="production")
+    parser.add_argument("--force-master", action="store_true", help="re-render the master even if it is current")
+    parser.add_argument("--jobs", type=int, help="parallel transcodes (default: one per variant)")
+    parser.add_argument("--list", action="store_true", help="list the delivery variants and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (height, fps, x264) in VARIANTS.items():
+            print(f"{name:<15} {height}p  {fps or 'master'} fps  {' '.join(x264)}")
+        return 0
+
+    config.progress_bar = "none"
+    master = render_master(args.master_profile, args.force_master)
+    for name, (path, cached) in derive_variants(master, args.variants, args.jobs).items():
+        print(f"{name:<15} {'cached ' if cached else 'encoded'} {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""Search per-axis NdLinear output shapes for a target output size
+
+Given an input shape, e.g. (4, 4, 256) or a video's (T, H, W, C), and a
+target number of outputs, enumerates every way of spreading the output size
+over the axes (the hand-picked (1, 1, 10) of Scene04 is one of them). For
+each it finds the cheapest contraction order, then scores parameters, FLOPs
+and peak intermediate size per sample. The contraction order comes from
+ndlinear.plan_order's subset search, run on all candidates at once as
+NumPy arrays. Candidates over the budget or dominated on all three costs
+are dropped, and what is printed is the Pareto front.
+
+    python factorize.py 4,4,256 10
+    python factorize.py 16,64,64,3 512 --max-params 20000 --max-flops 2e6
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+import ndlinear
+
+COSTS = ("params", "flops", "peak")
+
+
+def divisors(n):
+    small = [d for d in range(1, math.isqrt(n) + 1) if n % d == 0]
+    return sorted(set(small + [n // d for d in small]))
+
+
+def factorizations(total, rank):
+    """Every ordered tuple of ``rank`` positive integers whose product is ``total``"""
+    if rank == 1:
+        return [(total,)]
+    return [(first, *rest) for first in divisors(total) for rest in factorizations(total // first, rank - 1)]
+
+
+def score(input_dims, candidates):
+    """Per-sample params, FLOPs, peak and best axis order for an (F, rank) array of output shapes
+
+    Same recurrence and tie-breaking as ndlinear.plan_order, vectorized over
+    the candidates: one array row per subset of axes already transformed.
+    """
+    count, rank = candidates.shape
+    ins = np.asarray(input_dims, dtype=np.int64)
+    masks = np.arange(1 << rank)
+    done = (masks[:, None] >> np.arange(rank)) & 1
+    # sizes[mask, f]: elements per sample once the axes in mask are transformed
+    sizes = np.where(done[:, None, :], candidates[None], ins[None, None]).prod(axis=2)
+    unreached = np.iinfo(np.int64).max
+    flops = np.full((1 << rank, count), unreached, dtype=np.int64)
+    peak = np.full((1 << rank, count), unreached, dtype=np.int64)
+    last_axis = np.zeros((1 << rank, count), dtype=np.int8)
+    flops[0] = peak[0] = 0
+    for mask in range(1 << rank):
+        for axis in range(rank):
+            if mask >> axis & 1:
+                continue
+            after = mask | 1 << axis
+            step_flops = flops[mask] + 2 * sizes[after] * ins[axis]
+            # The output is not an intermediate, as in plan_order
+            step_peak = peak[mask] if after == (1 << rank) - 1 else np.maximum(peak[mask], sizes[after])
+            better = (step_flops < flops[after]) | ((step_flops == flops[after]) & (step_peak < peak[after]))
+            flops[after] = np.where(better, step_flops, flops[after])
+            peak[after] = np.where(better, step_peak, peak[after])
+            last_axis[after] = np.where(better, axis, last_axis[after])
+    params = (candidates * ins + candidates).sum(axis=1)
+    return np.stack([params, flops[-1], peak[-1]], axis=1), last_axis
+
+
+def axis_order(last_axis, index, rank):
+    """Walk the recorded last axes back from the full mask"""
+    order, mask = [], (1 << rank) - 1
+    while mask:
+        axis = int(last_axis[mask, index])
+        order.append(axis)
+        mask ^= 1 << axis
+    return tuple(reversed(order))
+
+
+def pareto_mask(costs, chunk=2048):
+    """Rows of ``costs`` (all minimized) that no other row dominates"""
+    keep = np.ones(len(costs), dtype=bool)
+    for start in range(0, len(costs), chunk):
+        block = costs[start:start + chunk, None, :]
+        no_worse = (costs[None] <= block).all(axis=2)
+        better = (costs[None] < block).any(axis=2)
+        keep[start:start + chunk] = ~(no_worse & better).any(axis=1)
+    return keep
+
+
+def search(input_dims, total, max_params=None, max_flops=None):
+    """Pareto-optimal output shapes, cheapest in parameters first, plus the number of candidates"""
+    rank = len(input_dims)
+    candidates = np.array(factorizations(total, rank), dtype=np.int64).reshape(-1, rank)
+    costs, last_axis = score(input_dims, candidates)
+    within = np.ones(len(candidates), dtype=bool)
+    if max_params is not None:
+        within &= costs[:, 0] <= max_params
+    if max_flops is not None:
+        within &= costs[:, 1] <= max_flops
+    indices = np.flatnonzero(within)
+    # Equal-cost duplicates would keep each other alive; keep the first of each
+    _, first = np.unique(costs[indices], axis=0, return_index=True)
+    indices = indices[np.sort(first)]
+    indices = indices[pareto_mask(costs[indices])]
+    indices = indices[np.lexsort(costs[indices].T[::-1])]
+    front = [dict(hidden_dims=tuple(int(n) for n in candidates[index]),
+                  order=axis_order(last_axis, index, rank),
+                  **{name: int(value) for name, value in zip(COSTS, costs[index])})
+             for index in indices]
+    return front, len(candidates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dims", type=ndlinear.parse_shape, help='e.g. "4,4,256" or "16,64,64,3"')
+    parser.add_argument("outputs", type=int, help="total output size, e.g. 10 classes")
+    parser.add_argument("--max-params", type=float, help="parameter budget")
+    parser.add_argument("--max-flops", type=float, help="FLOP budget per sample")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    front, searched = search(args.input_dims, args.outputs, args.max_params, args.max_flops)
+    elapsed = time.perf_counter() - started
+    print(f"{searched:,} factorizations of {args.outputs} over {args.input_dims}, "
+          f"{len(front)} on the Pareto front ({elapsed * 1e3:.1f} ms)")
+    if not front:
+        print("nothing fits the budget")
+        return 1
+    print(f"{'hidden_dims':<24} {'order':<16} {'params':>12} {'flops':>14} {'peak':>12}")
+    for row in front[:args.limit]:
+        print(f"{str(row['hidden_dims']):<24} {str(row['order']):<16} "
+              f"{row['params']:>12,} {row['flops']:>14,} {row['peak']:>12,}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,541 @@
+"""Local render farm: a coordinator handing out render jobs and a content-addressed artifact store
+
+The coordinator serves JSON over HTTP. Workers lease a job, render it, push
+the partial movies and any new Tex/Text SVGs into the artifact store and
+report back. Every play has a content hash from the dry pass (manim's own
+play-cache hash) and its partial movie is filed in the store under that hash
+and the source fingerprint; job IDs are built from the play hashes too. A
+play that already exists is never rendered again by anyone, however the
+scenes are split into sections. Leases expire if a worker stops renewing
+them and failed jobs are retried a few times.
+
+The store is a plain directory (objects/<sha256[:2]>/<sha256>, refs/...). The
+coordinator also exposes it over HTTP as an object-store stand-in for
+workers that cannot mount the directory.
+
+    python farm.py serve --sections 8             # on the machine holding the store
+    python farm.py work --coordinator http://coordinator:8787
+    python farm.py work --coordinator http://coordinator:8787 --store /mnt/farm/store
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from manim import config, logger
+from manim.utils.file_ops import guarantee_existence
+
+import delivery
+import runner
+import schedule
+
+FARM_DIR = runner.ROOT / "media" / "farm"
+
+# Tex and Text SVGs are the render caches worth sharing between nodes
+CACHE_DIRS = ("tex_dir", "text_dir")
+
+
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def bytes_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def job_id(fingerprint, scene, hashes):
+    """Stable ID of a job, from the content of its plays rather than where the section bounds fell"""
+    return hashlib.sha256(f"{fingerprint}:{scene}:{':'.join(hashes)}".encode()).hexdigest()[:24]
+
+
+def play_ref(fingerprint, play_hash):
+    """Store ref holding the digest of one play's partial movie"""
+    return f"plays/{fingerprint}/{play_hash}"
+
+
+class DirStore:
+    """Content-addressed artifact store in a plain directory"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        guarantee_existence(self.root / "objects")
+        guarantee_existence(self.root / "refs")
+
+    def object_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest
+
+    def has(self, digest):
+        return self.object_path(digest).exists()
+
+    def _write(self, path, data):
+        # Write-then-rename, so readers never see half an object
+        guarantee_existence(path.parent)
+        fd, partial = tempfile.mkstemp(dir=path.parent, prefix=".partial-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    def put_bytes(self, data, digest=None):
+        actual = bytes_digest(data)
+        if digest is not None and digest != actual:
+            raise ValueError(f"Object does not match its digest {digest}")
+        if not self.has(actual):
+            self._write(self.object_path(actual), data)
+        return actual
+
+    def put_file(self, path):
+        digest = delivery.file_digest(path)
+        if not self.has(digest):
+            self._write(self.object_path(digest), Path(path).read_bytes())
+        return digest
+
+    def get_bytes(self, digest):
+        return self.object_path(digest).read_bytes()
+
+    def get_file(self, digest, dest):
+        dest = Path(dest)
+        guarantee_existence(dest.parent)
+        shutil.copyfile(self.object_path(digest), dest)
+        return dest
+
+    def ref_path(self, name):
+        path = (self.root / "refs" / name).resolve()
+        if not path.is_relative_to((self.root / "refs").resolve()):
+            raise ValueError(f"Bad ref name {name!r}")
+        return path
+
+    def get_ref(self, name):
+        path = self.ref_path(name)
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def put_ref(self, name, value):
+        self._write(self.ref_path(name), json.dumps(value).encode())
+
+    def list_refs(self, prefix):
+        base = self.ref_path(prefix)
+        if not base.is_dir():
+            return {}
+        refs = self.root / "refs"
+        return {str(path.relative_to(refs)): json.loads(path.read_text())
+                for path in base.rglob("*") if path.is_file() and not path.name.startswith(".")}
+
+
+class HttpStore:
+    """The same interface as DirStore, talking to the coordinator's /objects and /refs"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def _request(self, method, path, data=None):
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                return response.read()
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                return None
+            raise
+
+    def has(self, digest):
+        return self._request("HEAD", f"/objects/{digest}") is not None
+
+    def put_bytes(self, data, digest=None):
+        digest = digest or bytes_digest(data)
+        if not self.has(digest):
+            self._request("PUT", f"/objects/{digest}", data)
+        return digest
+
+    def put_file(self, path):
+        digest = delivery.file_digest(path)
+        if not self.has(digest):
+            self._request("PUT", f"/objects/{digest}", Path(path).read_bytes())
+        return digest
+
+    def get_bytes(self, digest):
+        return self._request("GET", f"/objects/{digest}")
+
+    def get_file(self, digest, dest):
+        dest = Path(dest)
+        guarantee_existence(dest.parent)
+        dest.write_bytes(self.get_bytes(digest))
+        return dest
+
+    def get_ref(self, name):
+        data = self._request("GET", "/refs/" + urllib.parse.quote(name))
+        return json.loads(data) if data is not None else None
+
+    def put_ref(self, name, value):
+        self._request("PUT", "/refs/" + urllib.parse.quote(name), json.dumps(value).encode())
+
+    def list_refs(self, prefix):
+        data = self._request("GET", "/refs?prefix=" + urllib.parse.quote(prefix))
+        return json.loads(data) if data is not None else {}
+
+
+class Coordinator:
+    """Job queue with leases, retries and a done set backed by the store's job manifests"""
+
+    def __init__(self, store, jobs, lease_seconds=600, max_attempts=3):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.jobs = {job["id"]: dict(job, state="queued", attempts=0, worker=None, expires=0.0, error=None)
+                     for job in jobs}
+        for job in self.jobs.values():
+            if all(store.get_ref(play_ref(job["fingerprint"], play_hash)) is not None for play_hash in job["hashes"]):
+                job["state"] = "done"
+
+    def expire_leases(self):
+        now = time.time()
+        for job in self.jobs.values():
+            if job["state"] == "leased" and job["expires"] < now:
+                logger.warning(f"Lease on {job['scene']} {job['plays']} by {job['worker']} expired")
+                self.requeue(job, "lease expired")
+
+    def requeue(self, job, error):
+        job["error"] = error
+        job["worker"] = None
+        job["state"] = "failed" if job["attempts"] >= self.max_attempts else "queued"
+
+    def lease(self, worker):
+        with self.lock:
+            self.expire_leases()
+            queued = [job for job in self.jobs.values() if job["state"] == "queued"]
+            if not queued:
+                finished = all(job["state"] in ("done", "failed") for job in self.jobs.values())
+                return dict(job=None, finished=finished)
+            # Longest predicted job first
+            job = max(queued, key=lambda job: job["predicted"])
+            job.update(state="leased", worker=worker, expires=time.time() + self.lease_seconds)
+            job["attempts"] += 1
+            return dict(job={key: job[key] for key in ("id", "scene", "plays", "hashes", "fingerprint", "profile")},
+                        lease_seconds=self.lease_seconds, finished=False)
+
+    def renew(self, job_id, worker):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["state"] != "leased" or job["worker"] != worker:
+                return dict(ok=False)
+            job["expires"] = time.time() + self.lease_seconds
+            return dict(ok=True)
+
+    def complete(self, job_id, worker, manifest):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return dict(ok=False)
+            # Idempotent: a late duplicate just rewrites an identical manifest
+            self.store.put_ref(f"jobs/{job_id}", manifest)
+            job.update(state="done", worker=worker, error=None)
+            return dict(ok=True)
+
+    def fail(self, job_id, worker, error):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job["state"] == "leased" and job["worker"] == worker:
+                logger.warning(f"{worker} failed {job['scene']} {job['plays']}:\n{error}")
+                self.requeue(job, error)
+            return dict(ok=True)
+
+    def status(self):
+        with self.lock:
+            self.expire_leases()
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["state"]] = counts.get(job["state"], 0) + 1
+            return dict(counts=counts, jobs=[
+                {key: job[key] for key in ("id", "scene", "plays", "state", "attempts", "worker", "error")}
+                for job in self.jobs.values()
+            ])
+
+    def finished(self):
+        with self.lock:
+            return all(job["state"] in ("done", "failed") for job in self.jobs.values())
+
+    def handler(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def object_digest(self, path, head=False):
+                """The sha256 named by an /objects/ path; anything else gets a 400 and None"""
+                digest = path[len("/objects/"):]
+                if DIGEST.fullmatch(digest):
+                    return digest
+                self.reply(400, "text/plain", b"bad object digest", head=head)
+                return None
+
+            def do_HEAD(self):
+                if not self.path.startswith("/objects/"):
+                    return self.reply(404, "text/plain", b"", head=True)
+                digest = self.object_digest(self.path, head=True)
+                if digest is None:
+                    return
+                if coordinator.store.has(digest):
+                    self.reply(200, "application/octet-stream", b"", head=True)
+                else:
+                    self.reply(404, "text/plain", b"", head=True)
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                store = coordinator.store
+                if url.path == "/status":
+                    self.reply_json(coordinator.status())
+                elif url.path.startswith("/objects/"):
+                    digest = self.object_digest(url.path)
+                    if digest is None:
+                        return
+                    if store.has(digest):
+                        self.reply(200, "application/octet-stream", store.get_bytes(digest))
+                    else:
+                        self.reply(404, "text/plain", b"no such object")
+                elif url.path == "/refs":
+                    prefix = urllib.parse.parse_qs(url.query).get("prefix", [""])[0]
+                    self.reply_json(store.list_refs(prefix))
+                elif url.path.startswith("/refs/"):
+                    ref = store.get_ref(urllib.parse.unquote(url.path[len("/refs/"):]))
+                    if ref is None:
+                        self.reply(404, "text/plain", b"no such ref")
+                    else:
+                        self.reply_json(ref)
+                else:
+                    self.reply(404, "text/plain", b"not found")
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                store = coordinator.store
+                try:
+                    if self.path.startswith("/objects/"):
+                        digest = self.object_digest(self.path)
+                        if digest is None:
+                            return
+                        store.put_bytes(body, digest)
+                    elif self.path.startswith("/refs/"):
+                        store.put_ref(urllib.parse.unquote(self.path[len("/refs/"):]), json.loads(body))
+                    else:
+                        return self.reply(404, "text/plain", b"not found")
+                except ValueError as error:
+                    return self.reply(400, "text/plain", str(error).encode())
+                self.reply_json(dict(ok=True))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/lease":
+                    self.reply_json(coordinator.lease(body["worker"]))
+                elif self.path == "/renew":
+                    self.reply_json(coordinator.renew(body["job_id"], body["worker"]))
+                elif self.path == "/complete":
+                    self.reply_json(coordinator.complete(body["job_id"], body["worker"], body["manifest"]))
+                elif self.path == "/fail":
+                    self.reply_json(coordinator.fail(body["job_id"], body["worker"], body["error"]))
+                else:
+                    self.reply(404, "text/plain", b"not found")
+
+            def reply_json(self, value):
+                self.reply(200, "application/json", json.dumps(value).encode())
+
+            def reply(self, code, content_type, body, head=False):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def make_jobs(scene_classes, profile, sections=0):
+    """One job per scene, or about ``sections`` jobs in total split by the cost estimator"""
+    fingerprint = delivery.source_fingerprint(profile)
+    runner.apply_profile(profile)
+    coefficients = schedule.fit(schedule.load_calibration()["history"])
+    megapixels = config.pixel_width * config.pixel_height / 1e6
+    estimates = [schedule.dry_pass(scene_cls) for scene_cls in scene_classes]
+    planned = schedule.plan_jobs(estimates, coefficients, max(sections, 1), megapixels, split=sections > 1)
+    plays = {est["scene"]: est["plays"] for est in estimates}
+    jobs = []
+    for job in planned:
+        hashes = [play["hash"] for play in plays[job["scene"]][slice(*job["plays"])]]
+        jobs.append(dict(id=job_id(fingerprint, job["scene"], hashes), scene=job["scene"], plays=list(job["plays"]),
+                         hashes=hashes, fingerprint=fingerprint, profile=profile, predicted=job["predicted"]))
+    return jobs
+
+
+def assemble(store, jobs, output_dir=FARM_DIR):
+    """Fetch every scene's partial movies from the store and join them in play order"""
+    outputs = {}
+    for scene in dict.fromkeys(job["scene"] for job in jobs):
+        sections = sorted((job for job in jobs if job["scene"] == scene), key=lambda job: job["plays"])
+        digests = [store.get_ref(play_ref(job["fingerprint"], play_hash))
+                   for job in sections for play_hash in job["hashes"]]
+        if any(digest is None for digest in digests):
+            continue
+        work = guarantee_existence(output_dir / "partials" / scene)
+        partials = [store.get_file(digest, work / f"{digest}.mp4") for digest in digests]
+        if partials:
+            outputs[scene] = output_dir / f"{scene}.mp4"
+            delivery.concat(partials, outputs[scene])
+    return outputs
+
+
+def serve(args):
+    store = DirStore(args.store)
+    jobs = make_jobs(runner.get_scenes(args.scenes), args.profile, args.sections)
+    coordinator = Coordinator(store, jobs, args.lease_seconds, args.max_attempts)
+    server = ThreadingHTTPServer((args.host, args.port), coordinator.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    counts = coordinator.status()["counts"]
+    logger.info(f"Coordinator on http://{args.host}:{args.port}: {counts}")
+    try:
+        while not coordinator.finished():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        # Let workers see "finished" before the server goes away
+        time.sleep(2)
+        server.shutdown()
+    for scene, path in assemble(store, jobs).items():
+        print(f"{scene}: {path}")
+    failed = [job for job in coordinator.status()["jobs"] if job["state"] == "failed"]
+    for job in failed:
+        print(f"failed: {job['scene']} {job['plays']} after {job['attempts']} attempts")
+    return 1 if failed else 0
+
+
+class Worker:
+    def __init__(self, coordinator_url, store, name=None):
+        self.url = coordinator_url.rstrip("/")
+        self.store = store
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+
+    def call(self, path, **body):
+        request = urllib.request.Request(self.url + path, data=json.dumps(body).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.loads(response.read())
+
+    def pull_caches(self):
+        """Copy Tex/Text SVGs other nodes already produced into the local cache dirs"""
+        for kind in CACHE_DIRS:
+            directory = guarantee_existence(config.get_dir(kind))
+            for name, digest in self.store.list_refs(f"cache/{kind}").items():
+                path = directory / Path(name).name
+                if not path.exists():
+                    self.store.get_file(digest, path)
+
+    def push_caches(self):
+        for kind in CACHE_DIRS:
+            directory = config.get_dir(kind)
+            if not directory.exists():
+                continue
+            known = self.store.list_refs(f"cache/{kind}")
+            for path in directory.glob("*.svg"):
+                name = f"cache/{kind}/{path.name}"
+                if name not in known:
+                    self.store.put_ref(name, self.store.put_file(path))
+
+    def keep_leased(self, job_id, lease_seconds, stop):
+        while not stop.wait(lease_seconds / 3):
+            if not self.call("/renew", job_id=job_id, worker=self.name)["ok"]:
+                logger.warning(f"Lost the lease on {job_id}")
+                return
+
+    def run_job(self, job, lease_seconds):
+        refs = dict(zip(range(*job["plays"]), (play_ref(job["fingerprint"], play_hash) for play_hash in job["hashes"])))
+        # Plays rendered by anyone before, in this section or another
+        missing = [index for index, ref in refs.items() if self.store.get_ref(ref) is None]
+        seconds = 0.0
+        if missing:
+            stop = threading.Event()
+            renewer = threading.Thread(target=self.keep_leased, args=(job["id"], lease_seconds, stop), daemon=True)
+            renewer.start()
+            try:
+                self.pull_caches()
+                seconds, partials = schedule.render_job(job["scene"], job["plays"], job["profile"], only=missing)
+                if len(partials) != len(missing):
+                    raise RuntimeError(f"{len(missing)} plays rendered into {len(partials)} partial movies")
+                for index, path in zip(missing, partials):
+                    self.store.put_ref(refs[index], self.store.put_file(path))
+                self.push_caches()
+            finally:
+                stop.set()
+        return dict(job_id=job["id"], scene=job["scene"], plays=job["plays"], profile=job["profile"],
+                    partials=[self.store.get_ref(ref) for ref in refs.values()], rendered=len(missing),
+                    worker=self.name, seconds=round(seconds, 2))
+
+    def run(self, poll_interval=2.0):
+        done = 0
+        while True:
+            reply = self.call("/lease", worker=self.name)
+            job = reply["job"]
+            if job is None:
+                if reply["finished"]:
+                    return done
+                time.sleep(poll_interval)
+                continue
+            logger.info(f"{self.name}: {job['scene']} plays {job['plays'][0]}-{job['plays'][1] - 1}")
+            try:
+                manifest = self.run_job(job, reply["lease_seconds"])
+            except Exception:
+                self.call("/fail", job_id=job["id"], worker=self.name, error=traceback.format_exc())
+                continue
+            self.call("/complete", job_id=job["id"], worker=self.name, manifest=manifest)
+            done += 1
+
+
+def work(args):
+    store = DirStore(args.store) if args.store else HttpStore(args.coordinator)
+    worker = Worker(args.coordinator, store, args.name)
+    try:
+        done = worker.run()
+    except urllib.error.URLError as error:
+        # The coordinator shuts down once every job is done or failed
+        logger.info(f"Coordinator went away: {error.reason}")
+        return 0
+    print(f"{worker.name}: {done} jobs rendered")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the coordinator and the artifact store")
+    serve_parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for other nodes)")
+    serve_parser.add_argument("--port", type=int, default=8787)
+    serve_parser.add_argument("--store", default=str(FARM_DIR / "store"), help="artifact store directory")
+    serve_parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    serve_parser.add_argument("--sections", type=int, default=0, help="split into about this many jobs")
+    serve_parser.add_argument("--lease-seconds", type=float, default=600)
+    serve_parser.add_argument("--max-attempts", type=int, default=3)
+
+    work_parser = commands.add_parser("work", help="render jobs from a coordinator")
+    work_parser.add_argument("--coordinator", default="http://127.0.0.1:8787")
+    work_parser.add_argument("--store", help="mounted store directory (default: through the coordinator)")
+    work_parser.add_argument("--name", help="worker name in leases and manifests")
+
+    args = parser.parse_args(argv)
+    config.progress_bar = "none"
+    return serve(args) if args.command == "serve" else work(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,257 @@
+"""Pooled frame buffers for the Cairo render path
+
+Stock manim allocates a full frame (8 MB at 1080p) several times per frame:
+resetting to the background copies it through np.array, get_frame() copies
+the pixel array, the file writer calls tobytes() and every ImageMobject is
+composited through a frame-sized PIL image. Here the background, working frame,
+static frame and output live in preallocated, 64-byte aligned buffers that are
+reused for the whole scene, and images are blended in place.
+
+    python framepool.py Scene01 --trace              # pooled render, per-frame allocation peaks
+    python framepool.py Scene01 --trace --baseline   # same numbers for the stock renderer
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from manim import TAU, config
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils.color import color_to_int_rgba
+from manim.utils.file_ops import is_png_format, write_to_movie
+from manim.utils.space_ops import angle_of_vector
+from PIL import Image
+
+import runner
+
+
+def aligned_empty(shape, dtype=np.uint8, align=64):
+    """Uninitialized array whose data pointer is a multiple of ``align``"""
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    raw = np.empty(nbytes + align, dtype=np.uint8)
+    offset = -raw.ctypes.data % align
+    return raw[offset:offset + nbytes].view(dtype).reshape(shape)
+
+
+class FramePool:
+    """Named, preallocated frame buffers that are handed out again and again"""
+
+    def __init__(self, align=64):
+        self.align = align
+        self.buffers = {}
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.reuses = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffer = self.buffers.get(name)
+        if buffer is not None and buffer.shape == tuple(shape) and buffer.dtype == np.dtype(dtype):
+            self.reuses += 1
+            return buffer
+        buffer = self.buffers[name] = aligned_empty(shape, dtype, self.align)
+        self.allocations += 1
+        self.allocated_bytes += buffer.nbytes
+        return buffer
+
+
+def blend_rgba(pixel_array, src, x, y):
+    """Alpha-blend an RGBA array onto pixel_array with its top-left corner at (x, y)"""
+    height, width = pixel_array.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + src.shape[1], width), min(y + src.shape[0], height)
+    if x1 <= x0 or y1 <= y0:
+        return
+    src = src[y0 - y:y1 - y, x0 - x:x1 - x]
+    dst = pixel_array[y0:y1, x0:x1]
+    alpha = src[..., 3:4].astype(np.uint32)
+    dst[..., :3] = (src[..., :3] * alpha + dst[..., :3] * (255 - alpha) + 127) // 255
+    dst[..., 3:] = alpha + (dst[..., 3:] * (255 - alpha) + 127) // 255
+
+
+class PooledCameraMixin:
+    """Camera mixin that keeps background and pixel array in a FramePool
+
+    Layer it over Camera or ThreeDCamera, see runner.camera_class_for().
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.pool = FramePool()
+        super().__init__(*args, **kwargs)
+
+    def init_background(self):
+        if self.background_image is not None:
+            super().init_background()
+            return
+        shape = (self.pixel_height, self.pixel_width, self.n_channels)
+        self.background = self.pool.get("background", shape, self.pixel_array_dtype)
+        self.background[:, :] = color_to_int_rgba(self.background_color, self.background_opacity)
+
+    def set_pixel_array(self, pixel_array, convert_from_floats=False):
+        if convert_from_floats or not isinstance(pixel_array, np.ndarray):
+            pixel_array = self.convert_pixel_array(pixel_array, convert_from_floats)
+        current = getattr(self, "pixel_array", None)
+        if current is None or current.shape != pixel_array.shape:
+            current = self.pixel_array = self.pool.get("frame", pixel_array.shape, self.pixel_array_dtype)
+        if current is not pixel_array:
+            np.copyto(current, pixel_array, casting="unsafe")
+
+    def display_image_mobject(self, image_mobject, pixel_array):
+        # Same geometry as Camera.display_image_mobject, but only the image's
+        # own footprint is touched instead of a frame-sized PIL composite
+        ul_coords, ur_coords, dl_coords, _ = self.points_to_pixel_coords(image_mobject, image_mobject.points)
+        right_vect = ur_coords - ul_coords
+        down_vect = dl_coords - ul_coords
+        center_coords = ul_coords + (right_vect + down_vect) / 2
+
+        sub_image = Image.fromarray(image_mobject.get_pixel_array(), mode="RGBA")
+        pixel_width = max(int(np.hypot(*right_vect)), 1)
+        pixel_height = max(int(np.hypot(*down_vect)), 1)
+        sub_image = sub_image.resize((pixel_width, pixel_height), resample=image_mobject.resampling_algorithm)
+        adjusted_angle = -int(360 * angle_of_vector(right_vect) / TAU)
+        if adjusted_angle != 0:
+            sub_image = sub_image.rotate(adjusted_angle, resample=image_mobject.resampling_algorithm, expand=1)
+
+        x, y = (center_coords - np.array(sub_image.size) / 2).astype(int)
+        blend_rgba(pixel_array, np.asarray(sub_image), x, y)
+
+
+class PooledFileWriter(SceneFileWriter):
+    """Writes frames to the ffmpeg pipe straight from the array's buffer"""
+
+    def write_frame(self, frame_or_renderer):
+        frame = frame_or_renderer
+        if write_to_movie():
+            self.writing_process.stdin.write(frame.data)
+        if is_png_format() and not config.dry_run:
+            self.output_image_from_array(frame)
+
+
+class FrameTracer:
+    """Transient Python/NumPy allocation peak of every rendered frame (tracemalloc)"""
+
+    def __init__(self):
+        self.peaks = []
+        self.first_of_play = []
+        self.new_play = True
+        tracemalloc.start()
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self.start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        self.peaks.append(tracemalloc.get_traced_memory()[1] - self.start)
+        self.first_of_play.append(self.new_play)
+        self.new_play = False
+
+    def steady_state(self):
+        """Peaks of every frame except the first of each play"""
+        return [peak for peak, first in zip(self.peaks, self.first_of_play) if not first]
+
+    def stop(self):
+        tracemalloc.stop()
+
+
+class TracingMixin:
+    """Renderer mixin that runs a FrameTracer around each rendered frame"""
+
+    def __init__(self, trace=False, **kwargs):
+        super().__init__(**kwargs)
+        self.tracer = FrameTracer() if trace else None
+        self.frames = 0
+
+    def play(self, scene, *args, **kwargs):
+        if self.tracer:
+            self.tracer.new_play = True
+        super().play(scene, *args, **kwargs)
+
+    def render(self, scene, time, moving_mobjects):
+        if self.tracer:
+            self.tracer.begin_frame()
+        super().render(scene, time, moving_mobjects)
+        if self.tracer:
+            self.tracer.end_frame()
+        self.frames += 1
+
+
+class PooledRenderer(TracingMixin, CairoRenderer):
+    """Cairo renderer whose static frame and output frame come from the camera's pool"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("file_writer_class", PooledFileWriter)
+        super().__init__(**kwargs)
+        if not isinstance(self.camera, PooledCameraMixin):
+            raise TypeError("PooledRenderer needs a camera with PooledCameraMixin")
+
+    def get_frame(self):
+        pixel_array = self.camera.pixel_array
+        output = self.camera.pool.get("output", pixel_array.shape, pixel_array.dtype)
+        np.copyto(output, pixel_array)
+        return output
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        self.static_image = None
+        if not static_mobjects:
+            return None
+        self.update_frame(scene, mobjects=static_mobjects)
+        pixel_array = self.camera.pixel_array
+        self.static_image = self.camera.pool.get("static", pixel_array.shape, pixel_array.dtype)
+        np.copyto(self.static_image, pixel_array)
+        return self.static_image
+
+
+class TracedCairoRenderer(TracingMixin, CairoRenderer):
+    """Stock renderer with the same tracing, for comparison"""
+
+
+def memory_report(scene_cls, baseline=False, trace=False):
+    runner.reset_peak_rss()
+    started = time.perf_counter()
+    if baseline:
+        scene = runner.run_scene(scene_cls, TracedCairoRenderer, trace=trace)
+    else:
+        scene = runner.run_scene(scene_cls, PooledRenderer, (PooledCameraMixin,), trace=trace)
+    renderer = scene.renderer
+    report = dict(
+        scene=scene_cls.__name__,
+        renderer="stock" if baseline else "pooled",
+        seconds=round(time.perf_counter() - started, 2),
+        frames=renderer.frames,
+        peak_rss_mb=round(runner.peak_rss_mb(), 1),
+    )
+    pool = getattr(renderer.camera, "pool", None)
+    if pool is not None:
+        report.update(pool_allocations=pool.allocations, pool_mb=round(pool.allocated_bytes / 2**20, 1),
+                      pool_reuses=pool.reuses)
+    if renderer.tracer:
+        steady = renderer.tracer.steady_state() or [0]
+        frame_bytes = renderer.camera.pixel_array.nbytes
+        report.update(
+            steady_frame_peak_kb=round(max(steady) / 1024, 1),
+            steady_frames_allocating_a_frame=sum(peak >= frame_bytes for peak in steady),
+        )
+        renderer.tracer.stop()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    parser.add_argument("--trace", action="store_true", help="measure per-frame allocations with tracemalloc (slow)")
+    parser.add_argument("--baseline", action="store_true", help="use the stock renderer instead of the pool")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    config.disable_caching = True
+    for scene_cls in runner.get_scenes(args.scenes):
+        report = memory_report(scene_cls, args.baseline, args.trace)
+        print("  ".join(f"{key}={value}" for key, value in report.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
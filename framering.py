@@ -0,0 +1,239 @@
+"""Streaming render: the camera rasterizes straight into a ring of shared-memory
+frame buffers that a separate encoder process feeds to ffmpeg
+
+Rasterization and encoding overlap, no frame is copied on the way to the
+encoder, and backpressure is bounded by the number of slots in the ring.
+Renderer stall (waiting for a free slot) and encoder stall (waiting for a
+frame) are reported separately.
+
+    python framering.py Scene02 --slots 6 --profile preview
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import subprocess
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from manim import config, logger
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+
+import runner
+
+
+def encoder_main(shm_name, shape, slots, messages, free, replies, ffmpeg, loglevel):
+    """Encoder process: writes ring slots to one ffmpeg pipe per partial movie"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = np.ndarray((slots, *shape), dtype=np.uint8, buffer=shm.buf)
+    process = None
+    target = None
+    stall = 0.0
+    frames = 0
+    try:
+        while True:
+            waited = time.perf_counter()
+            message = messages.get()
+            if process is not None:
+                # Only waiting with an open pipe counts as starving the encoder
+                stall += time.perf_counter() - waited
+            kind = message[0]
+            if kind == "frame":
+                _, slot, count = message
+                data = views[slot].data
+                for _ in range(count):
+                    process.stdin.write(data)
+                frames += count
+                free.release()
+            elif kind == "open":
+                _, target, fps = message
+                height, width = shape[:2]
+                process = subprocess.Popen([
+                    ffmpeg, "-y", "-f", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgba",
+                    "-r", str(fps), "-i", "-", "-an", "-loglevel", loglevel,
+                    "-vcodec", "libx264", "-pix_fmt", "yuv420p", target + ".part.mp4",
+                ], stdin=subprocess.PIPE)
+            elif kind == "close":
+                process.stdin.close()
+                process.wait()
+                os.replace(target + ".part.mp4", target)
+                process = None
+            elif kind == "sync":
+                replies.put(("sync", stall, frames))
+            elif kind == "stop":
+                replies.put(("stop", stall, frames))
+                return
+    finally:
+        if process is not None:
+            process.kill()
+        del views
+        shm.close()
+
+
+class FrameStream:
+    """Shared-memory ring of frame buffers plus the encoder process reading it"""
+
+    def __init__(self, shape, slots=4):
+        self.shape = tuple(shape)
+        self.slots = slots
+        nbytes = int(np.prod(self.shape)) * slots
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        ring = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self.shm.buf)
+        # Long-lived views: the camera caches one cairo context per array id
+        self.views = list(ring)
+        self.messages = mp.Queue()
+        self.replies = mp.Queue()
+        self.free = mp.Semaphore(slots)
+        self.next_slot = 0
+        self.renderer_stall = 0.0
+        self.encoder_stall = 0.0
+        self.frames = 0
+        self.process = mp.Process(
+            target=encoder_main,
+            args=(self.shm.name, self.shape, slots, self.messages, self.free, self.replies,
+                  config.ffmpeg_executable, config.ffmpeg_loglevel.lower()),
+            daemon=True,
+        )
+        self.process.start()
+
+    def acquire(self):
+        """Next slot to draw into, blocking while the encoder still holds all of them"""
+        if not self.free.acquire(block=False):
+            waited = time.perf_counter()
+            self.free.acquire()
+            self.renderer_stall += time.perf_counter() - waited
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        return slot
+
+    def submit(self, slot, count=1):
+        self.messages.put(("frame", slot, count))
+
+    def open_segment(self, path, fps):
+        self.messages.put(("open", str(path), fps))
+
+    def close_segment(self):
+        self.messages.put(("close",))
+
+    def _wait_for(self, kind):
+        self.messages.put((kind,))
+        while True:
+            try:
+                reply, self.encoder_stall, self.frames = self.replies.get(timeout=1)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise RuntimeError("Encoder process died")
+                continue
+            if reply == kind:
+                return
+
+    def sync(self):
+        """Block until every submitted frame and segment has been encoded"""
+        self._wait_for("sync")
+
+    def close(self):
+        if self.process.is_alive():
+            self._wait_for("stop")
+            self.process.join()
+        self.views = []
+        self.shm.close()
+        self.shm.unlink()
+
+
+class RingFileWriter(SceneFileWriter):
+    """Scene file writer whose partial movies are encoded by the FrameStream process"""
+
+    def open_movie_pipe(self, file_path=None):
+        if file_path is None:
+            file_path = self.partial_movie_files[self.renderer.num_plays]
+        self.partial_movie_file_path = file_path
+        fps = config.frame_rate
+        self.renderer.stream.open_segment(file_path, int(fps) if fps == int(fps) else fps)
+
+    def close_movie_pipe(self):
+        self.renderer.stream.close_segment()
+
+    def finish(self):
+        # Partial movies must be complete before manim concatenates them
+        self.renderer.stream.sync()
+        super().finish()
+
+
+class StreamingRenderer(CairoRenderer):
+    """Cairo renderer that draws each frame directly into a ring slot
+
+    Static frames and the background still go to the camera's own buffer,
+    only the per-frame output lives in shared memory.
+    """
+
+    def __init__(self, slots=4, **kwargs):
+        kwargs.setdefault("file_writer_class", RingFileWriter)
+        super().__init__(**kwargs)
+        self.scratch = self.camera.pixel_array
+        self.stream = FrameStream(self.scratch.shape, slots)
+
+    def submit(self, slot, num_frames=1):
+        self.stream.submit(slot, num_frames)
+        self.time += num_frames / self.camera.frame_rate
+
+    def render(self, scene, time, moving_mobjects):
+        if self.skip_animations:
+            return
+        slot = self.stream.acquire()
+        self.camera.pixel_array = self.stream.views[slot]
+        try:
+            self.update_frame(scene, moving_mobjects)
+        finally:
+            self.camera.pixel_array = self.scratch
+        self.submit(slot)
+
+    def add_frame(self, frame, num_frames=1):
+        if self.skip_animations:
+            return
+        slot = self.stream.acquire()
+        self.stream.views[slot][...] = frame
+        self.submit(slot, num_frames)
+
+    def freeze_current_frame(self, duration):
+        # One copy of the frozen frame, the encoder repeats it
+        num_frames = int(duration / (1 / self.camera.frame_rate))
+        if num_frames:
+            self.add_frame(self.camera.pixel_array, num_frames)
+
+    def scene_finished(self, scene):
+        try:
+            super().scene_finished(scene)
+        finally:
+            # Cairo surfaces on the ring keep the shared memory exported
+            for view in self.stream.views:
+                self.camera.pixel_array_to_cairo_context.pop(id(view), None)
+            self.stream.close()
+        logger.info(
+            f"{type(scene).__name__}: {self.stream.frames} frames, "
+            f"renderer stall {self.stream.renderer_stall:.2f}s, encoder stall {self.stream.encoder_stall:.2f}s"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--slots", type=int, default=4, help="frame buffers in the ring")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    config.disable_caching = True
+    for scene_cls in runner.get_scenes(args.scenes):
+        started = time.perf_counter()
+        scene = runner.run_scene(scene_cls, StreamingRenderer, slots=args.slots)
+        stream = scene.renderer.stream
+        print(f"{scene_cls.__name__}: {stream.frames} frames in {time.perf_counter() - started:.1f}s, "
+              f"renderer stall {stream.renderer_stall:.2f}s, encoder stall {stream.encoder_stall:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
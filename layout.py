@@ -0,0 +1,259 @@
+"""Layout-only dry run of the scenes in finalvideo.py
+
+Executes each construct() with rasterization and encoding skipped, records the
+bounding box of every visible mobject at the end of each play/wait and reports
+overlapping text, mobjects outside the frame and text that renders too small.
+
+    python layout.py
+    python layout.py Scene01 Scene05 --min-text-px 12 --json layout.json
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from manim import DecimalNumber, MarkupText, SingleStringMathTex, Text, ThreeDCamera, VMobject, config
+from manim.mobject.types.image_mobject import AbstractImageMobject
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils.iterables import list_update
+
+import runner
+
+# Mobjects that are checked as a single piece of text instead of glyph by glyph
+TEXT_TYPES = (SingleStringMathTex, Text, MarkupText, DecimalNumber)
+
+
+@dataclass
+class Box:
+    """Pixel-space bounding box of one visible mobject (y grows downwards)"""
+    label: str
+    kind: str
+    left: float
+    top: float
+    right: float
+    bottom: float
+    glyph_px: float = 0.0
+
+    def overlap(self, other):
+        width = min(self.right, other.right) - max(self.left, other.left)
+        height = min(self.bottom, other.bottom) - max(self.top, other.top)
+        return max(width, 0) * max(height, 0), width, height
+
+
+@dataclass
+class Snapshot:
+    """Layout at the end of one play()/wait() call"""
+    index: int
+    time: float
+    line: int
+    animations: str
+    boxes: list
+
+
+def is_visible(mob):
+    """Whether the mobject itself would put any pixels on screen"""
+    if isinstance(mob, AbstractImageMobject):
+        return bool(mob.get_pixel_array()[:, :, 3].any())
+    if mob.get_num_points() == 0:
+        return False
+    if isinstance(mob, VMobject):
+        if mob.get_fill_opacities().max(initial=0) > 0:
+            return True
+        return mob.get_stroke_width() > 0 and mob.get_stroke_opacities().max(initial=0) > 0
+    return True
+
+
+def describe(mob):
+    """Short human-readable name for a mobject"""
+    if isinstance(mob, SingleStringMathTex):
+        text = mob.tex_string
+    elif isinstance(mob, (Text, MarkupText)):
+        text = mob.text
+    elif isinstance(mob, DecimalNumber):
+        text = str(mob.get_value())
+    else:
+        return type(mob).__name__
+    text = " ".join(text.split())
+    if len(text) > 48:
+        text = text[:45] + "..."
+    return f"{type(mob).__name__}({text!r})"
+
+
+def display_points(camera, mob):
+    """Points of the mobject as the camera will draw them (projected for 3D scenes)"""
+    points = camera.transform_points_pre_display(mob, mob.points)
+    if not isinstance(camera, ThreeDCamera):
+        # ThreeDCamera already projects relative to its frame center
+        points = points - camera.frame_center
+    return points
+
+
+def pixel_box(camera, mobs, label, kind):
+    """Bounding box of a set of mobjects in output pixels, None if nothing is drawn"""
+    scale = camera.pixel_height / camera.frame_height
+    points = [display_points(camera, mob) for mob in mobs]
+    points = [p for p in points if len(p)]
+    if not points:
+        return None
+    points = np.vstack(points)
+    xs = points[:, 0] * scale + camera.pixel_width / 2
+    ys = camera.pixel_height / 2 - points[:, 1] * scale
+    box = Box(label, kind, xs.min(), ys.min(), xs.max(), ys.max())
+    if kind == "text":
+        heights = []
+        for mob in mobs:
+            glyph = display_points(camera, mob)[:, 1]
+            heights.append((glyph.max() - glyph.min()) * scale)
+        box.glyph_px = float(np.median(heights))
+    return box
+
+
+def collect_boxes(scene):
+    """Bounding boxes of every visible mobject in the scene, text kept as one box"""
+    camera = scene.renderer.camera
+    if isinstance(camera, ThreeDCamera):
+        camera.reset_rotation_matrix()
+    boxes = []
+    seen = set()
+
+    def visit(mob):
+        if id(mob) in seen:
+            return
+        seen.add(id(mob))
+        if isinstance(mob, TEXT_TYPES):
+            glyphs = [m for m in mob.family_members_with_points() if is_visible(m)]
+            box = glyphs and pixel_box(camera, glyphs, describe(mob), "text")
+            if box:
+                boxes.append(box)
+            return
+        if is_visible(mob):
+            box = pixel_box(camera, [mob], describe(mob), "image" if isinstance(mob, AbstractImageMobject) else "shape")
+            if box:
+                boxes.append(box)
+        for submob in mob.submobjects:
+            visit(submob)
+
+    for mob in list_update(scene.mobjects, scene.foreground_mobjects):
+        visit(mob)
+    return boxes
+
+
+class LayoutRenderer(CairoRenderer):
+    """Cairo renderer that never draws or encodes, it only snapshots the layout"""
+
+    def __init__(self, **kwargs):
+        kwargs["skip_animations"] = True
+        super().__init__(**kwargs)
+        self.snapshots = []
+
+    def play(self, scene, *args, **kwargs):
+        line = runner.construct_line(scene)
+        super().play(scene, *args, **kwargs)
+        self.snapshots.append(Snapshot(
+            index=len(self.snapshots),
+            time=round(self.time, 3),
+            line=line,
+            animations=", ".join(type(anim).__name__ for anim in scene.animations),
+            boxes=collect_boxes(scene),
+        ))
+
+    def update_frame(self, *args, **kwargs):
+        pass
+
+    def get_frame(self):
+        return None
+
+    def add_frame(self, frame, num_frames=1):
+        pass
+
+    def scene_finished(self, scene):
+        pass
+
+
+def find_issues(snapshots, frame_size, min_text_px=10.0, tolerance_px=1.0):
+    """Overlapping text, off-frame boxes and undersized text, each reported once
+    at the first snapshot where it shows up"""
+    width, height = frame_size
+    issues = {}
+
+    def report(key, snapshot, message):
+        if key in issues:
+            issues[key]["count"] += 1
+        else:
+            issues[key] = dict(kind=key[0], snapshot=snapshot.index, time=snapshot.time,
+                               line=snapshot.line, message=message, count=1)
+
+    for snap in snapshots:
+        texts = [box for box in snap.boxes if box.kind == "text"]
+        for i, a in enumerate(texts):
+            for b in texts[i + 1:]:
+                area, w, h = a.overlap(b)
+                if w > tolerance_px and h > tolerance_px:
+                    report(("overlap", a.label, b.label), snap,
+                           f"{a.label} overlaps {b.label} ({w:.0f}x{h:.0f} px)")
+        for box in snap.boxes:
+            outside = max(-box.left, -box.top, box.right - width, box.bottom - height)
+            if outside > tolerance_px:
+                fully = box.right < 0 or box.bottom < 0 or box.left > width or box.top > height
+                where = "entirely outside" if fully else f"{outside:.0f} px outside"
+                report(("off-frame", box.label), snap, f"{box.label} is {where} the frame")
+            if box.kind == "text" and box.glyph_px < min_text_px:
+                report(("small-text", box.label), snap,
+                       f"{box.label} glyphs are {box.glyph_px:.1f} px tall (< {min_text_px:g})")
+    return list(issues.values())
+
+
+def check_scene(scene_cls, min_text_px=10.0, tolerance_px=1.0):
+    start = time.perf_counter()
+    scene = runner.run_scene(scene_cls, LayoutRenderer)
+    camera = scene.renderer.camera
+    snapshots = scene.renderer.snapshots
+    issues = find_issues(snapshots, (camera.pixel_width, camera.pixel_height), min_text_px, tolerance_px)
+    return dict(
+        scene=scene_cls.__name__,
+        seconds=round(time.perf_counter() - start, 2),
+        snapshots=[asdict(snap) for snap in snapshots],
+        issues=issues,
+    )
+
+
+def print_report(result):
+    print(f"{result['scene']}: {len(result['snapshots'])} snapshots, "
+          f"{len(result['issues'])} issues ({result['seconds']:.2f}s)")
+    for issue in result["issues"]:
+        repeat = f" [x{issue['count']}]" if issue["count"] > 1 else ""
+        print(f"  line {issue['line']:>4}  t={issue['time']:6.2f}s  {issue['kind']:<10} {issue['message']}{repeat}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--min-text-px", type=float, default=10.0, help="smallest acceptable median glyph height")
+    parser.add_argument("--tolerance-px", type=float, default=1.0, help="ignore overlaps/overhangs up to this size")
+    parser.add_argument("--json", help="also write snapshots and issues to this file")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if any issue is found")
+    args = parser.parse_args(argv)
+
+    config.write_to_movie = False
+    config.save_last_frame = False
+    config.disable_caching = True
+    config.progress_bar = "none"
+
+    results = []
+    for scene_cls in runner.get_scenes(args.scenes):
+        result = check_scene(scene_cls, args.min_text_px, args.tolerance_px)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.strict and any(result["issues"] for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
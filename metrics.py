@@ -0,0 +1,289 @@
+"""OpenMetrics export of render throughput and cache effectiveness
+
+Renders scenes while keeping an OpenMetrics text file up to date (atomically
+replaced, suitable for node_exporter's textfile collector) and/or serving
+the same text on a local /metrics endpoint for Prometheus to scrape.
+
+Exported: frames and frames per second per scene, encoder queue depth (with
+--ring, the frames waiting in the shared-memory ring), Tex cache lookups and
+hit ratio, a LaTeX compile latency histogram, decoded-image cache hits, peak
+RSS, and the scene and animation index currently rendering.
+
+    python metrics.py --file media/metrics.prom --port 9464
+"""
+
+import argparse
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from manim import config, logger
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils import tex_file_writing
+
+import framering
+import preview
+import runner
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Seconds, for the LaTeX compile latency histogram
+LATEX_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def labels(**values):
+    if not values:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(values, escaped)) + "}"
+
+
+class RenderMetrics:
+    """Everything the exporter reports, updated by the renderer and the Tex hooks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames = {}
+        self.render_seconds = {}
+        self.scene = None
+        self.scene_started = None
+        self.animation_index = 0
+        self.encoder_queue = None
+        self.tex_lookups = 0
+        self.tex_misses = 0
+        self.latex_buckets = [0] * (len(LATEX_BUCKETS) + 1)
+        self.latex_sum = 0.0
+        self.caches = None
+
+    def start_scene(self, name):
+        with self.lock:
+            self.finish_scene()
+            self.scene = name
+            self.scene_started = time.perf_counter()
+            self.animation_index = 0
+            self.frames.setdefault(name, 0)
+            self.render_seconds.setdefault(name, 0.0)
+
+    def finish_scene(self):
+        if self.scene is not None and self.scene_started is not None:
+            self.render_seconds[self.scene] += time.perf_counter() - self.scene_started
+            self.scene_started = None
+
+    def add_frames(self, count):
+        with self.lock:
+            self.frames[self.scene] += count
+
+    def observe_latex(self, seconds):
+        with self.lock:
+            self.tex_misses += 1
+            self.latex_buckets[bisect.bisect_left(LATEX_BUCKETS, seconds)] += 1
+            self.latex_sum += seconds
+
+    def seconds_for(self, scene):
+        seconds = self.render_seconds.get(scene, 0.0)
+        if scene == self.scene and self.scene_started is not None:
+            seconds += time.perf_counter() - self.scene_started
+        return seconds
+
+    def exposition(self):
+        """The current values in OpenMetrics text format"""
+        with self.lock:
+            lines = []
+
+            def family(name, kind, help_text, samples):
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"# HELP {name} {help_text}")
+                lines.extend(f"{sample_name}{sample_labels} {value}" for sample_name, sample_labels, value in samples)
+
+            family("manim_frames", "counter", "Frames rendered.",
+                   [("manim_frames_total", labels(scene=scene), count) for scene, count in self.frames.items()])
+            family("manim_frames_per_second", "gauge", "Frames rendered per wall-clock second of the scene's render.",
+                   [("manim_frames_per_second", labels(scene=scene),
+                     round(count / max(self.seconds_for(scene), 1e-9), 3)) for scene, count in self.frames.items()])
+            if self.encoder_queue is not None:
+                family("manim_encoder_queue_depth", "gauge", "Frames handed to the encoder and not yet written.",
+                       [("manim_encoder_queue_depth", "", self.encoder_queue())])
+            family("manim_tex_lookups", "counter", "Tex strings looked up in the SVG cache.",
+                   [("manim_tex_lookups_total", "", self.tex_lookups)])
+            family("manim_tex_cache_misses", "counter", "Tex strings that had to be compiled.",
+                   [("manim_tex_cache_misses_total", "", self.tex_misses)])
+            ratio = (self.tex_lookups - self.tex_misses) / self.tex_lookups if self.tex_lookups else 1.0
+            family("manim_tex_cache_hit_ratio", "gauge", "Share of Tex lookups served from the cache.",
+                   [("manim_tex_cache_hit_ratio", "", round(ratio, 4))])
+            cumulative = 0
+            buckets = []
+            for bound, count in zip((*LATEX_BUCKETS, "+Inf"), self.latex_buckets):
+                cumulative += count
+                buckets.append(("manim_latex_compile_seconds_bucket", labels(le=bound), cumulative))
+            family("manim_latex_compile_seconds", "histogram", "LaTeX plus dvisvgm time per uncached Tex string.",
+                   buckets + [("manim_latex_compile_seconds_count", "", cumulative),
+                              ("manim_latex_compile_seconds_sum", "", round(self.latex_sum, 6))])
+            if self.caches is not None:
+                family("manim_image_cache_hits", "counter", "ImageMobjects served from the decoded-image cache.",
+                       [("manim_image_cache_hits_total", "", self.caches.image_hits)])
+                family("manim_image_cache_misses", "counter", "ImageMobjects decoded from disk.",
+                       [("manim_image_cache_misses_total", "", self.caches.image_misses)])
+            family("manim_peak_rss_bytes", "gauge", "Peak resident set size of the render process.",
+                   [("manim_peak_rss_bytes", "", int(runner.peak_rss_mb() * 2**20))])
+            if self.scene is not None:
+                family("manim_current_scene", "info", "Scene currently rendering.",
+                       [("manim_current_scene_info", labels(scene=self.scene), 1)])
+                family("manim_current_animation_index", "gauge", "Index of the play currently rendering.",
+                       [("manim_current_animation_index", labels(scene=self.scene), self.animation_index)])
+            lines.append("# EOF")
+            return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        path = Path(path)
+        partial = path.with_name(path.name + ".partial")
+        partial.write_text(self.exposition())
+        partial.replace(path)
+
+
+class MetricsMixin:
+    """Renderer mixin feeding a RenderMetrics; works over CairoRenderer and StreamingRenderer"""
+
+    def __init__(self, metrics=None, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics or RenderMetrics()
+        stream = getattr(self, "stream", None)
+        if stream is not None:
+            self.metrics.encoder_queue = lambda: stream.slots - stream.free.get_value()
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        self.metrics.start_scene(type(scene).__name__)
+
+    def play(self, scene, *args, **kwargs):
+        self.metrics.animation_index = self.num_plays
+        super().play(scene, *args, **kwargs)
+
+    def render(self, scene, time, moving_mobjects):
+        super().render(scene, time, moving_mobjects)
+        if not self.skip_animations:
+            self.metrics.add_frames(1)
+
+    def freeze_current_frame(self, duration):
+        super().freeze_current_frame(duration)
+        if not self.skip_animations:
+            self.metrics.add_frames(int(duration / (1 / self.camera.frame_rate)))
+
+    def scene_finished(self, scene):
+        super().scene_finished(scene)
+        with self.metrics.lock:
+            self.metrics.finish_scene()
+
+
+class MetricsCairoRenderer(MetricsMixin, CairoRenderer):
+    pass
+
+
+class MetricsStreamingRenderer(MetricsMixin, framering.StreamingRenderer):
+    pass
+
+
+@contextmanager
+def tex_metrics(metrics):
+    """Count Tex lookups (generate_tex_file) and time each miss from compile_tex to the end of convert_to_svg"""
+    originals = tex_file_writing.generate_tex_file, tex_file_writing.compile_tex, tex_file_writing.convert_to_svg
+    generate_tex_file, compile_tex, convert_to_svg = originals
+    started = []
+
+    @functools.wraps(generate_tex_file)
+    def counting_generate(*args, **kwargs):
+        with metrics.lock:
+            metrics.tex_lookups += 1
+        return generate_tex_file(*args, **kwargs)
+
+    @functools.wraps(compile_tex)
+    def timed_compile(*args, **kwargs):
+        started.append(time.perf_counter())
+        return compile_tex(*args, **kwargs)
+
+    @functools.wraps(convert_to_svg)
+    def timed_convert(*args, **kwargs):
+        try:
+            return convert_to_svg(*args, **kwargs)
+        finally:
+            if started:
+                metrics.observe_latex(time.perf_counter() - started.pop())
+
+    # tex_to_svg_file looks these up as module globals on every call
+    tex_file_writing.generate_tex_file = counting_generate
+    tex_file_writing.compile_tex = timed_compile
+    tex_file_writing.convert_to_svg = timed_convert
+    try:
+        yield
+    finally:
+        tex_file_writing.generate_tex_file, tex_file_writing.compile_tex, tex_file_writing.convert_to_svg = originals
+
+
+def serve(metrics, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Metrics on http://localhost:{port}/metrics")
+    return server
+
+
+def keep_writing(metrics, path, interval, stop):
+    while not stop.wait(interval):
+        metrics.write(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--file", help="keep this OpenMetrics text file up to date")
+    parser.add_argument("--port", type=int, help="serve /metrics on this local port")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between file updates")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    parser.add_argument("--ring", action="store_true", help="render through framering's encoder process")
+    args = parser.parse_args(argv)
+    if not args.file and not args.port:
+        parser.error("give --file and/or --port")
+
+    runner.apply_profile(args.profile)
+    config.progress_bar = "none"
+    metrics = RenderMetrics()
+    metrics.caches = preview.WarmCaches()
+    # Only the image cache: memoized title_text/body_text would bypass the
+    # Tex lookups this is meant to measure
+    metrics.caches.install_images()
+    if args.port:
+        serve(metrics, args.port)
+    stop = threading.Event()
+    if args.file:
+        threading.Thread(target=keep_writing, args=(metrics, args.file, args.interval, stop), daemon=True).start()
+    renderer_cls = MetricsStreamingRenderer if args.ring else MetricsCairoRenderer
+    try:
+        with tex_metrics(metrics):
+            for scene_cls in runner.get_scenes(args.scenes):
+                runner.run_scene(scene_cls, renderer_cls, metrics=metrics)
+    finally:
+        stop.set()
+        if args.file:
+            metrics.write(args.file)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+"""Per-animation phase profiling with flamegraph output
+
+Wraps Scene.play/wait, the scene's interpolation and animation setup, the
+camera capture, frame copies and the file writer, and records the exclusive
+wall time of each phase for every play, tagged with the scene, the line of
+the self.play(...) call and the animation types. Time spent in construct()
+between two plays (layout, mobject creation, Tex) is charged to the play
+that follows it.
+
+    python phases.py Scene02 --top 15 --sort raster
+    python phases.py --folded media/phases.folded   # flamegraph.pl / speedscope input
+"""
+
+import argparse
+import functools
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from manim import config
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils import tex_file_writing
+
+import runner
+
+PHASES = ("construct", "tex", "setup", "interpolate", "raster", "copy", "static", "encode", "play")
+
+
+class PhaseProfiler:
+    """Exclusive wall time per (scene, play tag, phase path)
+
+    Phases nest; a phase's time excludes the phases opened inside it. Records
+    made while no play is running get the tag of the next play.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.stack = []
+        self.scene = None
+        self.tag = None
+        self.untagged = 0
+
+    @contextmanager
+    def phase(self, name):
+        entry = [name, 0.0, time.perf_counter()]
+        self.stack.append(entry)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            path = tuple(name for name, *_ in self.stack)
+            self.stack.pop()
+            self.records.append([self.scene, self.tag, path, now - entry[2] - entry[1]])
+            if self.stack:
+                self.stack[-1][1] += now - entry[2]
+
+    def checkpoint(self):
+        """Record what the open phases have spent so far and restart their clocks"""
+        now = time.perf_counter()
+        path = ()
+        for depth, entry in enumerate(self.stack):
+            path += (entry[0],)
+            inner = now - self.stack[depth + 1][2] if depth + 1 < len(self.stack) else 0.0
+            self.records.append([self.scene, self.tag, path, now - entry[2] - entry[1] - inner])
+            entry[1] = 0.0
+            entry[2] = now
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def set_tag(self, tag):
+        """Start tagging with ``tag`` and hand it to the records waiting for one"""
+        for record in self.records[self.untagged:]:
+            if record[1] is None:
+                record[1] = tag
+        self.untagged = len(self.records)
+        self.tag = tag
+
+    def collapsed(self):
+        """Collapsed stacks (one "frame;frame;... microseconds" line per stack) for flamegraphs"""
+        totals = defaultdict(float)
+        for scene, tag, path, seconds in self.records:
+            totals[(scene, tag or "after last play", *path)] += seconds
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in sorted(totals.items())
+                if seconds > 0]
+
+    def table(self):
+        """One row per (scene, play tag) with seconds per phase and in total"""
+        rows = {}
+        for scene, tag, path, seconds in self.records:
+            row = rows.setdefault((scene, tag), dict(dict.fromkeys(PHASES, 0.0), scene=scene,
+                                                    play=tag or "after last play", total=0.0))
+            row[path[-1]] += seconds
+            row["total"] += seconds
+        return list(rows.values())
+
+
+class ProfilingRenderer(CairoRenderer):
+    """Cairo renderer that records every phase of every play in a PhaseProfiler"""
+
+    def __init__(self, profiler=None, **kwargs):
+        super().__init__(**kwargs)
+        self.profiler = profiler or PhaseProfiler()
+        self.camera.capture_mobjects = self.profiler.wrap("raster", self.camera.capture_mobjects)
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        profiler = self.profiler
+        profiler.scene = type(scene).__name__
+        profiler.tag = None
+        scene.construct = profiler.wrap("construct", scene.construct)
+        scene.compile_animation_data = profiler.wrap("setup", scene.compile_animation_data)
+        scene.begin_animations = profiler.wrap("setup", scene.begin_animations)
+        scene.update_to_time = profiler.wrap("interpolate", scene.update_to_time)
+        self.file_writer.write_frame = profiler.wrap("encode", self.file_writer.write_frame)
+
+    def play(self, scene, *args, **kwargs):
+        profiler = self.profiler
+        # The construct() time since the last play is charged to this one
+        profiler.checkpoint()
+        profiler.set_tag(runner.play_tag(scene, args))
+        outer = profiler.stack[:]
+        profiler.stack.clear()
+        started = time.perf_counter()
+        try:
+            with profiler.phase("play"):
+                super().play(scene, *args, **kwargs)
+        finally:
+            profiler.stack[:] = outer
+            if outer:
+                outer[-1][1] += time.perf_counter() - started
+            profiler.set_tag(None)
+
+    def get_frame(self):
+        with self.profiler.phase("copy"):
+            return super().get_frame()
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        with self.profiler.phase("static"):
+            return super().save_static_frame_data(scene, static_mobjects)
+
+
+@contextmanager
+def profiling_tex(profiler):
+    """Charge LaTeX and dvisvgm runs to a "tex" phase"""
+    originals = tex_file_writing.compile_tex, tex_file_writing.convert_to_svg
+    tex_file_writing.compile_tex = profiler.wrap("tex", originals[0])
+    tex_file_writing.convert_to_svg = profiler.wrap("tex", originals[1])
+    try:
+        yield
+    finally:
+        tex_file_writing.compile_tex, tex_file_writing.convert_to_svg = originals
+
+
+def profile_scenes(scene_classes, profiler=None):
+    profiler = profiler or PhaseProfiler()
+    with profiling_tex(profiler):
+        for scene_cls in scene_classes:
+            runner.run_scene(scene_cls, ProfilingRenderer, profiler=profiler)
+    return profiler
+
+
+def print_table(rows, sort="total", top=20):
+    rows = sorted(rows, key=lambda row: -row[sort])[:top]
+    columns = ("total", *PHASES)
+    print(f"{'scene':<32} {'play':<40} " + " ".join(f"{name:>11}" for name in columns))
+    for row in rows:
+        print(f"{row['scene']:<32} {row['play'][:40]:<40} "
+              + " ".join(f"{row[name]:11.3f}" for name in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    parser.add_argument("--top", type=int, default=20, help="rows in the table")
+    parser.add_argument("--sort", choices=("total", *PHASES), default="total")
+    parser.add_argument("--folded", help="write collapsed stacks here")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    # Cached partial movies would hide the raster and encode phases
+    config.disable_caching = True
+    config.progress_bar = "none"
+    profiler = profile_scenes(runner.get_scenes(args.scenes))
+    print_table(profiler.table(), args.sort, args.top)
+    if args.folded:
+        with open(args.folded, "w") as f:
+            f.write("\n".join(profiler.collapsed()) + "\n")
+        print(f"collapsed stacks: {args.folded}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,340 @@
+"""Hot-reload preview daemon for finalvideo.py
+
+Keeps manim imported and its Tex/SVG, image and mobject caches warm, watches
+finalvideo.py and, on every save, re-executes only the scene classes that
+changed and re-renders only the section of construct() around the edit at a
+draft profile. The latest section is served to a browser viewer.
+
+    python preview.py Scene05 --port 8765
+    # open http://localhost:8765 and edit finalvideo.py
+"""
+
+import argparse
+import ast
+import difflib
+import functools
+import importlib
+import json
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import PurePath
+
+import numpy as np
+from manim import ImageMobject, Wait, config, logger
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils.images import get_full_raster_image_path
+from PIL import Image
+
+import finalvideo
+import runner
+
+VIEWER_HTML = b"""<!doctype html>
+<html><head><title>finalvideo preview</title>
+<style>body{background:#111;color:#ddd;font-family:sans-serif;margin:16px}
+video{width:100%;max-width:1280px;background:#000}pre{color:#e74c3c}</style></head>
+<body><div id="status">waiting for the first edit...</div><video id="video" controls autoplay loop></video>
+<pre id="error"></pre>
+<script>
+let version = -1;
+async function poll() {
+  const status = await (await fetch("/status")).json();
+  if (status.version !== version) {
+    version = status.version;
+    document.getElementById("status").textContent = status.message;
+    document.getElementById("error").textContent = status.error || "";
+    if (status.video) document.getElementById("video").src = "/video?v=" + version;
+  }
+}
+setInterval(poll, 300);
+</script></body></html>
+"""
+
+
+class PreviewRenderer(CairoRenderer):
+    """Cairo renderer that only renders the plays whose index is in ``section``
+
+    Everything else in construct() still runs with animations skipped, and the
+    source line and kind of every play() is recorded in ``outline`` so the next
+    edit can be mapped back to a section.
+    """
+
+    def __init__(self, section=None, **kwargs):
+        super().__init__(**kwargs)
+        self.section = section
+        self.outline = []
+
+    def update_skipping_status(self):
+        if self.section is None:
+            super().update_skipping_status()
+        else:
+            self.skip_animations = self.num_plays not in self.section
+
+    def play(self, scene, *args, **kwargs):
+        line = runner.construct_line(scene)
+        super().play(scene, *args, **kwargs)
+        self.outline.append((line, all(isinstance(anim, Wait) for anim in scene.animations)))
+
+    def scene_finished(self, scene):
+        # An outline-only pass has no partial movies to combine
+        if any(path is not None for path in self.file_writer.partial_movie_files):
+            super().scene_finished(scene)
+
+
+def section_for_line(outline, line):
+    """Plays to re-render after an edit at ``line``: from the first play at or
+    after the edit up to and including the next wait"""
+    if not outline:
+        return range(0)
+    start = next((i for i, (play_line, _) in enumerate(outline) if play_line >= line), len(outline) - 1)
+    end = next((i for i in range(start, len(outline)) if outline[i][1]), len(outline) - 1)
+    return range(start, end + 1)
+
+
+def top_level_segments(source):
+    """{name: (first line, source text)} for every top-level class, plus the
+    remaining top-level code under the key None"""
+    tree = ast.parse(source)
+    segments = {}
+    rest = []
+    for node in tree.body:
+        text = ast.get_source_segment(source, node)
+        if isinstance(node, ast.ClassDef) and node.name.startswith("Scene"):
+            segments[node.name] = (node.lineno, text)
+        else:
+            rest.append(text)
+    segments[None] = (1, "\n".join(rest))
+    return segments, tree
+
+
+def first_changed_line(old_source, new_source):
+    """1-based line in the old source where the first difference starts"""
+    matcher = difflib.SequenceMatcher(None, old_source.splitlines(), new_source.splitlines(), autojunk=False)
+    for tag, i1, _, _, _ in matcher.get_opcodes():
+        if tag != "equal":
+            return i1 + 1
+    return None
+
+
+class WarmCaches:
+    """In-memory caches that survive reloads of finalvideo.py
+
+    Tex/SVG parses are already kept by manim in SVG_HASH_TO_MOB_MAP for the
+    lifetime of the process; on top of that this keeps decoded images and the
+    mobjects built by the NdLinearBranding text helpers.
+    """
+
+    def __init__(self):
+        self.images = {}
+        self.mobjects = {}
+        self.hits = 0
+        self.misses = 0
+        self.image_hits = 0
+        self.image_misses = 0
+
+    def install(self):
+        self.install_images()
+        self.wrap_branding()
+
+    def install_images(self):
+        """Serve ImageMobject files from the decoded-image cache; frames are unchanged"""
+        original_init = ImageMobject.__init__
+        images = self.images
+        caches = self
+
+        @functools.wraps(original_init)
+        def __init__(mob, filename_or_array, *args, **kwargs):
+            path = None
+            if isinstance(filename_or_array, (str, PurePath)):
+                path = get_full_raster_image_path(filename_or_array)
+                key = (str(path), path.stat().st_mtime, kwargs.get("image_mode", "RGBA"))
+                if key in images:
+                    caches.image_hits += 1
+                else:
+                    caches.image_misses += 1
+                    images[key] = np.array(Image.open(path).convert(key[2]))
+                filename_or_array = images[key]
+            original_init(mob, filename_or_array, *args, **kwargs)
+            if path is not None:
+                # Set by ImageMobject itself only when it opens the file
+                mob.path = path
+
+        ImageMobject.__init__ = __init__
+
+    def wrap_branding(self):
+        """Memoize the text helpers of the currently loaded NdLinearBranding"""
+        branding = finalvideo.NdLinearBranding
+        for name in ("title_text", "body_text"):
+            helper = getattr(branding, name)
+            if hasattr(helper, "__wrapped__"):
+                continue
+            setattr(branding, name, staticmethod(self.memoized(name, helper)))
+
+    def memoized(self, name, helper):
+        @functools.wraps(helper)
+        def wrapper(text, font_size=None, color=None, **kwargs):
+            key = (name, text, font_size, str(color), repr(sorted(kwargs.items())))
+            if key in self.mobjects:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.mobjects[key] = helper(text, font_size=font_size, color=color, **kwargs)
+            return self.mobjects[key].copy()
+        return wrapper
+
+    def reset_mobjects(self):
+        self.mobjects.clear()
+
+
+class PreviewDaemon:
+    def __init__(self, scene_names, profile="draft", poll_interval=0.2):
+        self.scene_names = [cls.__name__ for cls in runner.get_scenes(scene_names)]
+        self.profile = profile
+        self.poll_interval = poll_interval
+        self.path = runner.ROOT / "finalvideo.py"
+        self.caches = WarmCaches()
+        self.outlines = {}
+        self.source = self.path.read_text()
+        self.segments, _ = top_level_segments(self.source)
+        self.status = dict(version=0, message="warming up", video=None, error=None)
+        self.lock = threading.Lock()
+
+    def publish(self, **status):
+        with self.lock:
+            self.status = dict(self.status, version=self.status["version"] + 1, **status)
+
+    def scene_class(self, name):
+        # Always look classes up again, reloads replace them in the module
+        return getattr(finalvideo, name)
+
+    def render(self, name, section):
+        scene = runner.run_scene(self.scene_class(name), PreviewRenderer, section=section)
+        self.outlines[name] = scene.renderer.outline
+        return scene.renderer.file_writer.movie_file_path
+
+    def warm_up(self):
+        runner.apply_profile(self.profile)
+        self.caches.install()
+        for name in self.scene_names:
+            started = time.perf_counter()
+            self.render(name, range(0))
+            logger.info(f"Warmed {name} in {time.perf_counter() - started:.1f}s")
+        self.publish(message="ready, waiting for an edit")
+
+    def reload(self, new_source):
+        """Apply an edit and return {scene name: first changed line in the old source}"""
+        segments, tree = top_level_segments(new_source)
+        changed = {}
+        if segments[None][1] != self.segments[None][1] or segments.keys() != self.segments.keys():
+            # Imports, config or NdLinearBranding changed: reload everything
+            importlib.reload(finalvideo)
+            runner.apply_profile(self.profile)
+            self.caches.reset_mobjects()
+            self.caches.wrap_branding()
+            line = first_changed_line(self.source, new_source)
+            changed = {name: line for name in self.scene_names}
+        else:
+            nodes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+            for name, (lineno, text) in segments.items():
+                old_lineno, old_text = self.segments[name]
+                if name is None or (text == old_text and lineno == old_lineno):
+                    continue
+                module = ast.Module(body=[nodes[name]], type_ignores=[])
+                exec(compile(module, finalvideo.__file__, "exec"), finalvideo.__dict__)
+                if text != old_text:
+                    changed[name] = old_lineno + first_changed_line(old_text, text) - 1
+                elif name in self.outlines:
+                    # Only shifted by an edit above it: keep the outline in step
+                    shift = lineno - old_lineno
+                    self.outlines[name] = [(line + shift, is_wait) for line, is_wait in self.outlines[name]]
+        self.source = new_source
+        self.segments = segments
+        return {name: line for name, line in changed.items() if name in self.scene_names}
+
+    def on_change(self):
+        new_source = self.path.read_text()
+        if new_source == self.source:
+            return
+        started = time.perf_counter()
+        try:
+            changed = self.reload(new_source)
+            video = None
+            for name, line in changed.items():
+                section = section_for_line(self.outlines.get(name, []), line)
+                video = self.render(name, section)
+                shown = f"plays {section.start}-{section.stop - 1}" if section else "no plays"
+                message = f"{name} line {line}: {shown} in {time.perf_counter() - started:.2f}s"
+                logger.info(message)
+            if video is not None:
+                self.publish(message=message, video=str(video), error=None)
+        except Exception:
+            # A syntax error leaves self.source alone, so the fix is diffed
+            # against the last version that loaded
+            self.publish(message="render failed", error=traceback.format_exc())
+
+    def watch(self):
+        mtime = self.path.stat().st_mtime
+        while True:
+            time.sleep(self.poll_interval)
+            current = self.path.stat().st_mtime
+            if current != mtime:
+                mtime = current
+                self.on_change()
+
+    def handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with daemon.lock:
+                    status = dict(daemon.status)
+                if self.path == "/":
+                    self.reply(200, "text/html", VIEWER_HTML)
+                elif self.path == "/status":
+                    self.reply(200, "application/json", json.dumps(status).encode())
+                elif self.path.startswith("/video") and status["video"]:
+                    with open(status["video"], "rb") as f:
+                        self.reply(200, "video/mp4", f.read())
+                else:
+                    self.reply(404, "text/plain", b"not found")
+
+            def reply(self, code, content_type, body):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def serve(self, port):
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Preview viewer on http://localhost:{port}")
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes to watch (default: all)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    args = parser.parse_args(argv)
+
+    config.progress_bar = "none"
+    daemon = PreviewDaemon(args.scenes, args.profile)
+    daemon.serve(args.port)
+    daemon.warm_up()
+    try:
+        daemon.watch()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
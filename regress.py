@@ -0,0 +1,166 @@
+"""Sampled-frame visual regression check against golden perceptual hashes
+
+Renders only a deterministic sample of frames per scene through the seek
+machinery: the end of every play plus N timestamps drawn from a fixed seed.
+Each sample is compared with the golden data by perceptual hash (Hamming
+distance of a 64-bit DCT hash) and by the mean pixel difference of a small
+thumbnail, so anti-aliasing noise passes and real changes do not.
+
+    python regress.py --update     # record regression/golden.json and thumbnails
+    python regress.py              # check all scenes, diff strips go to media/regression/
+"""
+
+import argparse
+import json
+import random
+
+import numpy as np
+from manim import config
+from PIL import Image
+
+import runner
+import seek
+
+GOLDEN_DIR = runner.ROOT / "regression"
+GOLDEN_FILE = GOLDEN_DIR / "golden.json"
+DIFF_DIR = runner.ROOT / "media" / "regression"
+REGRESS_PROFILE = "draft"
+THUMB_WIDTH = 160
+
+
+def dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_32 = dct_matrix(32)
+
+
+def phash(image):
+    """64-bit perceptual hash: low 8x8 DCT coefficients of a 32x32 grey image against their median"""
+    grey = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (DCT_32 @ grey @ DCT_32.T)[:8, :8].flatten()
+    # The DC term (mean brightness) would skew the median, so it is left out of it but still hashed
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def thumbnail(image):
+    height = round(THUMB_WIDTH * image.height / image.width)
+    return image.convert("RGB").resize((THUMB_WIDTH, height), Image.LANCZOS)
+
+
+def sample_times(scene_cls, count, seed):
+    """``count`` timestamps in the scene, the same for a given seed and scene"""
+    if not count:
+        return []
+    # A seek pass with nothing to capture only measures the scene's duration
+    duration = runner.run_scene(scene_cls, seek.SeekRenderer).renderer.time
+    rng = random.Random(f"{seed}:{scene_cls.__name__}")
+    return sorted(round(rng.uniform(0, duration), 3) for _ in range(count))
+
+
+def sample_key(still):
+    return f"{still.time:.3f} {still.label}"
+
+
+def record(scene_classes, count, seed):
+    golden = dict(profile=REGRESS_PROFILE, seed=seed, scenes={})
+    if GOLDEN_FILE.exists():
+        # Re-recording some scenes keeps the others
+        golden["scenes"] = json.loads(GOLDEN_FILE.read_text())["scenes"]
+    for scene_cls in scene_classes:
+        name = scene_cls.__name__
+        times = sample_times(scene_cls, count, seed)
+        thumbs = GOLDEN_DIR / name
+        thumbs.mkdir(parents=True, exist_ok=True)
+        for old in thumbs.glob("*.png"):
+            old.unlink()
+        samples = {}
+        for index, still in enumerate(seek.seek_scene(scene_cls, times, animation_ends=True)):
+            thumb_name = f"{index:03d}.png"
+            thumbnail(still.image).save(thumbs / thumb_name)
+            samples[sample_key(still)] = dict(phash=f"{phash(still.image):016x}", thumbnail=thumb_name)
+        golden["scenes"][name] = dict(times=times, samples=samples)
+        print(f"{name}: recorded {len(samples)} samples")
+    GOLDEN_FILE.write_text(json.dumps(golden, indent=1) + "\n")
+    return 0
+
+
+def check(scene_classes, golden, max_bits, max_pixel_diff):
+    failures = 0
+    for scene_cls in scene_classes:
+        name = scene_cls.__name__
+        expected = golden["scenes"].get(name)
+        if expected is None:
+            print(f"{name}: no golden samples, run with --update")
+            failures += 1
+            continue
+        stills = {sample_key(still): still
+                  for still in seek.seek_scene(scene_cls, expected["times"], animation_ends=True)}
+        missing = expected["samples"].keys() - stills.keys()
+        extra = stills.keys() - expected["samples"].keys()
+        bad = []
+        for key in sorted(expected["samples"].keys() & stills.keys()):
+            sample = expected["samples"][key]
+            still = stills[key]
+            bits = hamming(phash(still.image), int(sample["phash"], 16))
+            golden_thumb = Image.open(GOLDEN_DIR / name / sample["thumbnail"]).convert("RGB")
+            current_thumb = thumbnail(still.image)
+            if current_thumb.size != golden_thumb.size:
+                current_thumb = current_thumb.resize(golden_thumb.size, Image.LANCZOS)
+            diff = np.abs(np.asarray(current_thumb, dtype=np.int16) - np.asarray(golden_thumb, dtype=np.int16))
+            if bits > max_bits or diff.mean() > max_pixel_diff:
+                bad.append((key, bits, float(diff.mean())))
+                DIFF_DIR.mkdir(parents=True, exist_ok=True)
+                strip = np.hstack([np.asarray(golden_thumb), np.asarray(current_thumb),
+                                   np.minimum(diff * 4, 255).astype(np.uint8)])
+                Image.fromarray(strip).save(DIFF_DIR / f"{name}-{sample['thumbnail']}")
+        status = "ok" if not (bad or missing or extra) else "FAILED"
+        print(f"{name}: {len(stills)} samples, {status}")
+        for key, bits, mean in bad:
+            print(f"  t={key}: {bits} hash bits differ, mean thumbnail diff {mean:.2f}")
+        for key in sorted(missing):
+            print(f"  missing sample t={key} (plays added, removed or retimed?)")
+        for key in sorted(extra):
+            print(f"  new sample t={key}")
+        failures += bool(bad or missing or extra)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--update", action="store_true", help="record new golden samples instead of checking")
+    parser.add_argument("--random", type=int, default=4, help="random timestamps per scene on --update")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-bits", type=int, default=4, help="allowed perceptual hash distance")
+    parser.add_argument("--max-pixel-diff", type=float, default=2.0,
+                        help="allowed mean absolute thumbnail difference (0-255)")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(REGRESS_PROFILE)
+    config.write_to_movie = False
+    config.save_last_frame = False
+    config.disable_caching = True
+    config.progress_bar = "none"
+    scene_classes = runner.get_scenes(args.scenes)
+    if args.update:
+        return record(scene_classes, args.random, args.seed)
+    if not GOLDEN_FILE.exists():
+        raise SystemExit(f"{GOLDEN_FILE} does not exist, run with --update first")
+    golden = json.loads(GOLDEN_FILE.read_text())
+    failures = check(scene_classes, golden, args.max_bits, args.max_pixel_diff)
+    if failures:
+        print(f"{failures} scenes differ from the golden samples, see {DIFF_DIR}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""Helpers for driving the scenes in finalvideo.py outside the manim CLI"""
+
+import resource
+import sys
+from pathlib import Path
+
+from manim import Camera, ThreeDCamera, ThreeDScene, config
+from manim.mobject.mobject import _AnimationBuilder
+from manim.renderer.cairo_renderer import CairoRenderer
+
+import finalvideo
+
+ROOT = Path(__file__).resolve().parent
+
+# ImageMobject("horse_cifar.png") etc. resolve against the repo, not the cwd,
+# and output lands in media/videos/finalvideo/ like a CLI render
+config.assets_dir = str(ROOT)
+config.input_file = str(ROOT / "finalvideo.py")
+
+# Render profiles: (pixel_width, pixel_height, frame_rate). finalvideo.py fixes
+# the frame at 10.67x6.0 units so only the raster changes between profiles.
+PROFILES = {
+    "draft": (854, 480, 15),
+    "preview": (1280, 720, 30),
+    "production": (1920, 1080, 60),
+}
+
+# Render order of the final cut
+SCENES = [
+    finalvideo.Scene01_Introduction,
+    finalvideo.Scene02_FlatteningProblems,
+    finalvideo.Scene03_TraditionalCNNProblem,
+    finalvideo.Scene04_NdLinearSolution,
+    finalvideo.Scene05_NdLinearTransformation,
+]
+
+
+def get_scenes(names=None):
+    """Look up scene classes by name (or by prefix, e.g. "Scene03"), all scenes if empty"""
+    if not names:
+        return list(SCENES)
+    scenes = []
+    for name in names:
+        matches = [cls for cls in SCENES if cls.__name__ == name or cls.__name__.startswith(name)]
+        if not matches:
+            known = ", ".join(cls.__name__ for cls in SCENES)
+            raise SystemExit(f"Unknown scene {name!r} (known: {known})")
+        scenes.extend(matches)
+    return scenes
+
+
+def apply_profile(name):
+    """Switch the global manim config to one of PROFILES"""
+    config.pixel_width, config.pixel_height, config.frame_rate = PROFILES[name]
+
+
+def camera_class_for(scene_cls, *mixins):
+    """The camera manim would pick for this scene class, with camera mixins layered on top"""
+    base = ThreeDCamera if issubclass(scene_cls, ThreeDScene) else Camera
+    if not mixins:
+        return base
+    name = "".join(mixin.__name__.replace("Mixin", "") for mixin in mixins) + base.__name__
+    return type(name, (*mixins, base), {})
+
+
+def make_scene(scene_cls, renderer_cls=CairoRenderer, camera_mixins=(), **renderer_kwargs):
+    """Instantiate a scene on a custom renderer, keeping the scene's own camera type"""
+    renderer_kwargs.setdefault("camera_class", camera_class_for(scene_cls, *camera_mixins))
+    renderer = renderer_cls(**renderer_kwargs)
+    return scene_cls(renderer=renderer)
+
+
+def run_scene(scene_cls, renderer_cls=CairoRenderer, camera_mixins=(), **renderer_kwargs):
+    """Render one scene on the given renderer and return the finished scene"""
+    scene = make_scene(scene_cls, renderer_cls, camera_mixins, **renderer_kwargs)
+    scene.render()
+    return scene
+
+
+def construct_line(scene):
+    """Line number in the scene's construct() that is currently executing, if any"""
+    filename = type(scene).construct.__code__.co_filename
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_filename == filename:
+            return frame.f_lineno
+        frame = frame.f_back
+    return None
+
+
+def play_tag(scene, args):
+    """"L123 Write+FadeIn" for the self.play(...) currently executing"""
+    names = []
+    for arg in args:
+        if isinstance(arg, _AnimationBuilder):
+            names.append("animate")
+        elif isinstance(arg, (list, tuple)):
+            names.extend(type(item).__name__ for item in arg)
+        else:
+            names.append(type(arg).__name__)
+    line = construct_line(scene)
+    return f"L{line} {'+'.join(dict.fromkeys(names)) or 'play'}"
+
+
+def reset_peak_rss():
+    """Restart peak RSS accounting for this process (Linux only, otherwise a no-op)"""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process since start or the last reset_peak_rss()"""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
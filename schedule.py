@@ -0,0 +1,342 @@
+"""Render-cost estimator and longest-job-first scheduler for parallel renders
+
+A dry pass over every construct() (animations skipped, nothing drawn) counts,
+per play, the frames to draw, frozen frames, Bezier points of the moving
+mobjects, 3D faces that get depth-sorted and the Tex strings the render will
+have to compile (the dry pass compiles them into a scratch directory, so the
+render's own Tex cache stays as it was). A linear cost model turns those into seconds. Scenes that would
+hold up the others are split into contiguous sections of plays, the jobs are
+handed to a process pool longest first, and the sections are joined again
+afterwards. Predicted and actual job times are appended to a history file
+and the model is refitted from it on the next run.
+
+    python schedule.py --workers 4
+    python schedule.py --estimate-only --workers 4
+"""
+
+import argparse
+import heapq
+import json
+import math
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from manim import Wait, config, logger, tempconfig
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils import tex_file_writing
+from manim.utils.file_ops import guarantee_existence
+from manim.utils.hashing import get_hash_from_play_call
+
+import delivery
+import runner
+from preview import PreviewRenderer
+
+SCHEDULE_DIR = runner.ROOT / "media" / "schedule"
+CALIBRATION_FILE = SCHEDULE_DIR / "calibration.json"
+
+# Seconds per unit of each feature before any calibration data exists
+DEFAULT_COEFFICIENTS = {
+    "jobs": 2.0,              # process start, imports, scene setup
+    "plays": 0.02,            # every play, rendered or skipped, runs its construct code
+    "frames": 0.004,          # drawn frames
+    "frozen_frames": 0.0005,  # frames repeated from a static image
+    "megapixel_frames": 0.004,  # copying and encoding, per frame and megapixel
+    "kpoint_frames": 0.0015,  # cairo paths, per frame and thousand moving points
+    "face_frames": 0.0002,    # ThreeDCamera projection and depth sort, per frame and face
+    "tex_uncached": 0.8,      # LaTeX + dvisvgm per new Tex string
+}
+FEATURES = tuple(DEFAULT_COEFFICIENTS)
+
+# Keep at most this many calibration rows, newest last
+HISTORY_LIMIT = 500
+
+
+class EstimateRenderer(CairoRenderer):
+    """Cairo renderer that never draws or encodes, it only counts what a real render would do"""
+
+    def __init__(self, **kwargs):
+        kwargs["skip_animations"] = True
+        super().__init__(**kwargs)
+        self.plays = []
+        self.play_hash = None
+
+    def init_scene(self, scene):
+        super().init_scene(scene)
+        add_partial_movie_file = self.file_writer.add_partial_movie_file
+
+        def hash_play(hash_animation):
+            # Called once the play's animations are compiled and before they
+            # begin: the same content hash manim's own play cache uses
+            self.play_hash = get_hash_from_play_call(scene, self.camera, scene.animations, scene.mobjects)
+            add_partial_movie_file(hash_animation)
+
+        self.file_writer.add_partial_movie_file = hash_play
+
+    def play(self, scene, *args, **kwargs):
+        super().play(scene, *args, **kwargs)
+        fps = config.frame_rate
+        frozen = len(scene.animations) == 1 and isinstance(scene.animations[0], Wait) \
+            and scene.animations[0].is_static_wait
+        moving, _ = scene.get_moving_and_static_mobjects(scene.animations)
+        points = sum(mob.get_num_points() for mob in moving)
+        faces = sum(1 for mob in moving if getattr(mob, "shade_in_3d", False))
+        frames = 0 if frozen else math.ceil(scene.duration * fps)
+        self.plays.append(dict(
+            line=runner.construct_line(scene),
+            hash=self.play_hash,
+            frames=frames,
+            frozen_frames=int(scene.duration * fps) if frozen else 0,
+            points=points,
+            faces=faces,
+        ))
+
+    def update_frame(self, *args, **kwargs):
+        pass
+
+    def get_frame(self):
+        return None
+
+    def add_frame(self, frame, num_frames=1):
+        pass
+
+    def scene_finished(self, scene):
+        pass
+
+
+class TexCounter:
+    """Counts and times LaTeX compiles of Tex strings that are not in ``cache_dir`` yet"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.compiles = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.original = tex_file_writing.compile_tex
+
+        def compile_tex(tex_file, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return self.original(tex_file, *args, **kwargs)
+            finally:
+                # Tex file names are content hashes, so the real cache has the same name
+                if not (self.cache_dir / tex_file.with_suffix(".svg").name).exists():
+                    self.compiles += 1
+                    self.seconds += time.perf_counter() - started
+
+        tex_file_writing.compile_tex = compile_tex
+        return self
+
+    def __exit__(self, *exc):
+        tex_file_writing.compile_tex = self.original
+
+
+def dry_pass(scene_cls):
+    """Per-play counts and uncached Tex strings of one scene"""
+    cache_dir = Path(config.get_dir("tex_dir"))
+    # A scratch media dir, so the real render still finds its Tex uncached and pays for it
+    with tempfile.TemporaryDirectory(prefix="schedule-") as scratch:
+        with tempconfig(dict(write_to_movie=False, save_last_frame=False, disable_caching=True, progress_bar="none",
+                             media_dir=scratch, tex_dir=f"{scratch}/Tex")):
+            with TexCounter(cache_dir) as tex:
+                scene = runner.run_scene(scene_cls, EstimateRenderer)
+    return dict(scene=scene_cls.__name__, plays=scene.renderer.plays, tex_uncached=tex.compiles,
+                tex_seconds=tex.seconds)
+
+
+def job_features(estimate, plays, megapixels):
+    """Feature vector of rendering plays[0]:plays[1] of an estimated scene"""
+    features = dict.fromkeys(FEATURES, 0.0)
+    features["jobs"] = 1
+    features["plays"] = len(estimate["plays"])
+    features["tex_uncached"] = estimate["tex_uncached"]
+    for play in estimate["plays"][plays[0]:plays[1]]:
+        features["frames"] += play["frames"]
+        features["frozen_frames"] += play["frozen_frames"]
+        features["megapixel_frames"] += (play["frames"] + play["frozen_frames"]) * megapixels
+        features["kpoint_frames"] += play["frames"] * play["points"] / 1000
+        features["face_frames"] += play["frames"] * play["faces"]
+    return features
+
+
+def predict(features, coefficients):
+    return sum(coefficients[name] * features[name] for name in FEATURES)
+
+
+def load_calibration():
+    if CALIBRATION_FILE.exists():
+        return json.loads(CALIBRATION_FILE.read_text())
+    return dict(coefficients=dict(DEFAULT_COEFFICIENTS), history=[])
+
+
+def save_calibration(calibration):
+    guarantee_existence(SCHEDULE_DIR)
+    calibration["history"] = calibration["history"][-HISTORY_LIMIT:]
+    CALIBRATION_FILE.write_text(json.dumps(calibration, indent=1))
+
+
+def fit(history, strength=1.0):
+    """Least-squares coefficients from measured jobs, pulled towards the defaults
+
+    The pull keeps a handful of runs (fewer rows than features) from producing
+    wild or negative coefficients.
+    """
+    prior = np.array([DEFAULT_COEFFICIENTS[name] for name in FEATURES])
+    if not history:
+        return dict(DEFAULT_COEFFICIENTS)
+    x = np.array([[row["features"][name] for name in FEATURES] for row in history], dtype=float)
+    y = np.array([row["actual"] for row in history], dtype=float)
+    # Work in units of a typical job so one strength fits every feature
+    scale = x.mean(axis=0)
+    scale[scale == 0] = 1.0
+    a = np.vstack([x / scale, math.sqrt(strength) * np.eye(len(FEATURES))])
+    b = np.concatenate([y, math.sqrt(strength) * prior * scale])
+    solution, *_ = np.linalg.lstsq(a, b, rcond=None)
+    return dict(zip(FEATURES, np.clip(solution / scale, 0.0, None).tolist()))
+
+
+def split_points(costs, parts):
+    """Cut a list of per-play costs into ``parts`` contiguous sections of similar cost"""
+    total = sum(costs)
+    bounds = [0]
+    running = 0.0
+    for index, cost in enumerate(costs):
+        running += cost
+        if len(bounds) < parts and running >= total * len(bounds) / parts and index + 1 < len(costs):
+            bounds.append(index + 1)
+    bounds.append(len(costs))
+    return list(zip(bounds, bounds[1:]))
+
+
+def plan_jobs(estimates, coefficients, workers, megapixels, split=True):
+    """Jobs (scene, plays, features, predicted) with oversized scenes split into sections"""
+    whole = {est["scene"]: predict(job_features(est, (0, len(est["plays"])), megapixels), coefficients)
+             for est in estimates}
+    target = sum(whole.values()) / max(workers, 1)
+    jobs = []
+    for est in estimates:
+        parts = 1
+        if split and whole[est["scene"]] > target and len(est["plays"]) > 1:
+            parts = min(math.ceil(whole[est["scene"]] / target), len(est["plays"]))
+        costs = [predict(job_features(est, (i, i + 1), megapixels), coefficients) for i in range(len(est["plays"]))]
+        for plays in split_points(costs, parts):
+            features = job_features(est, plays, megapixels)
+            jobs.append(dict(scene=est["scene"], plays=plays, features=features,
+                             predicted=predict(features, coefficients)))
+    jobs.sort(key=lambda job: -job["predicted"])
+    return jobs
+
+
+def assign(jobs, workers):
+    """Longest-processing-time-first assignment; returns per-worker job lists and the makespan"""
+    heap = [(0.0, worker) for worker in range(workers)]
+    lanes = [[] for _ in range(workers)]
+    for job in jobs:
+        load, worker = heapq.heappop(heap)
+        lanes[worker].append(job)
+        heapq.heappush(heap, (load + job["predicted"], worker))
+    return lanes, max(load for load, _ in heap)
+
+
+class SectionRenderer(PreviewRenderer):
+    """Renders one section of plays and leaves the partial movies for the scheduler to join"""
+
+    def scene_finished(self, scene):
+        pass
+
+
+def render_job(scene_name, plays, profile, only=None):
+    """Render one job in a worker process, returns seconds and the partial movies in play order
+
+    ``only`` renders just those play indices of the section.
+    """
+    runner.apply_profile(profile)
+    # Partial movies are then named after their play index, so sections of
+    # the same scene never collide
+    config.disable_caching = True
+    config.progress_bar = "none"
+    scene_cls = runner.get_scenes([scene_name])[0]
+    started = time.perf_counter()
+    scene = runner.run_scene(scene_cls, SectionRenderer, section=range(*plays) if only is None else set(only))
+    seconds = time.perf_counter() - started
+    return seconds, [str(path) for path in scene.renderer.file_writer.partial_movie_files if path]
+
+
+def run_jobs(jobs, workers, profile):
+    """Submit longest first; the pool hands the next job to whichever worker frees up"""
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        futures = {pool.submit(render_job, job["scene"], job["plays"], profile): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            job["actual"], job["partials"] = future.result()
+            logger.info(f"{job['scene']} plays {job['plays'][0]}-{job['plays'][1] - 1}: "
+                        f"{job['actual']:.1f}s (predicted {job['predicted']:.1f}s)")
+    return jobs
+
+
+def join_scenes(jobs):
+    """Concatenate the sections of each scene into media/schedule/<scene>.mp4"""
+    outputs = {}
+    for scene in dict.fromkeys(job["scene"] for job in jobs):
+        sections = sorted((job for job in jobs if job["scene"] == scene), key=lambda job: job["plays"])
+        partials = [path for job in sections for path in job["partials"]]
+        if partials:
+            outputs[scene] = guarantee_existence(SCHEDULE_DIR) / f"{scene}.mp4"
+            delivery.concat(partials, outputs[scene])
+    return outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--workers", type=int, default=min(len(runner.SCENES), os.cpu_count() or 1))
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    parser.add_argument("--estimate-only", action="store_true", help="print the estimates and the plan, render nothing")
+    parser.add_argument("--no-split", action="store_true", help="one job per scene")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    calibration = load_calibration()
+    coefficients = calibration["coefficients"] = fit(calibration["history"])
+    megapixels = config.pixel_width * config.pixel_height / 1e6
+
+    estimates = [dry_pass(scene_cls) for scene_cls in runner.get_scenes(args.scenes)]
+    jobs = plan_jobs(estimates, coefficients, args.workers, megapixels, split=not args.no_split)
+    lanes, makespan = assign(jobs, args.workers)
+    for est in estimates:
+        frames = sum(play["frames"] + play["frozen_frames"] for play in est["plays"])
+        print(f"{est['scene']}: {len(est['plays'])} plays, {frames} frames, "
+              f"{est['tex_uncached']} uncached Tex ({est['tex_seconds']:.1f}s)")
+    for worker, lane in enumerate(lanes):
+        names = ", ".join(f"{job['scene']}[{job['plays'][0]}:{job['plays'][1]}] {job['predicted']:.0f}s"
+                          for job in lane)
+        print(f"worker {worker}: {names}")
+    print(f"predicted makespan {makespan:.0f}s on {args.workers} workers")
+    if args.estimate_only:
+        return 0
+
+    started = time.perf_counter()
+    run_jobs(jobs, args.workers, args.profile)
+    wall = time.perf_counter() - started
+    for scene, path in join_scenes(jobs).items():
+        print(f"{scene}: {path}")
+    for job in jobs:
+        calibration["history"].append(dict(
+            scene=job["scene"], plays=list(job["plays"]), profile=args.profile,
+            features=job["features"], predicted=job["predicted"], actual=job["actual"],
+        ))
+        error = (job["predicted"] - job["actual"]) / job["actual"] if job["actual"] else 0.0
+        print(f"  {job['scene']}[{job['plays'][0]}:{job['plays'][1]}] predicted {job['predicted']:.1f}s, "
+              f"actual {job['actual']:.1f}s ({error:+.0%})")
+    print(f"wall {wall:.0f}s vs predicted makespan {makespan:.0f}s")
+    save_calibration(calibration)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""Seek-to-timestamp stills and keyframe contact sheets for the scenes in finalvideo.py
+
+Scene state is advanced analytically (each animation is interpolated straight to
+the requested time) and only the requested frames are rasterized.
+
+    python seek.py Scene01 --at 12.5 -o intro.png
+    python seek.py Scene03 --ends -o scene03_keyframes.png
+    python seek.py --ends --stills stills/ -o all_keyframes.png
+"""
+
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+from manim import Wait, config
+from manim.renderer.cairo_renderer import CairoRenderer
+from PIL import Image, ImageDraw, ImageFont
+
+import runner
+
+
+@dataclass
+class Still:
+    """One rasterized frame and where it came from"""
+    scene: str
+    time: float
+    label: str
+    image: Image.Image
+
+
+class SeekRenderer(CairoRenderer):
+    """Cairo renderer that jumps between requested timestamps instead of
+    rendering every frame
+
+    ``times`` are scene timestamps in seconds, ``animation_ends`` additionally
+    captures the state at the end of every play() that isn't a plain wait.
+    """
+
+    def __init__(self, times=(), animation_ends=False, **kwargs):
+        kwargs["skip_animations"] = True
+        super().__init__(**kwargs)
+        self.pending = sorted(times)
+        self.animation_ends = animation_ends
+        self.stills = []
+
+    def play(self, scene, *args, **kwargs):
+        scene.compile_animation_data(*args, **kwargs)
+        scene.begin_animations()
+        names = ", ".join(type(anim).__name__ for anim in scene.animations)
+        start = self.time
+        end = start + scene.duration
+
+        while self.pending and self.pending[0] < end:
+            t = self.pending.pop(0)
+            scene.update_to_time(max(t - start, 0))
+            self.capture(scene, t, names)
+
+        # Jumps straight to the end and finishes/cleans up the animations
+        scene.play_internal(skip_rendering=True)
+        self.time = end
+        self.num_plays += 1
+
+        if self.animation_ends and not all(isinstance(anim, Wait) for anim in scene.animations):
+            self.capture(scene, end, f"end of {names}")
+
+    def capture(self, scene, t, label):
+        self.static_image = None
+        self.update_frame(scene)
+        image = self.camera.get_image().copy()
+        self.stills.append(Still(type(scene).__name__, round(t, 3), label, image))
+
+    def scene_finished(self, scene):
+        # Timestamps past the end of the scene show its final frame
+        for t in self.pending:
+            self.capture(scene, t, "end of scene")
+        self.pending = []
+
+
+def seek_scene(scene_cls, times=(), animation_ends=False):
+    """Stills of one scene at the given timestamps and/or animation ends"""
+    scene = runner.run_scene(scene_cls, SeekRenderer, times=times, animation_ends=animation_ends)
+    return scene.renderer.stills
+
+
+def contact_sheet(stills, thumb_width=480, columns=4, padding=8):
+    """Lay stills out in a grid with a "scene  t=..s  label" caption under each"""
+    font = ImageFont.load_default()
+    caption_height = 2 * (font.getbbox("Ag")[3] + 4)
+    first = stills[0].image
+    thumb_height = round(thumb_width * first.height / first.width)
+    columns = min(columns, len(stills))
+    rows = -(-len(stills) // columns)
+    cell_width = thumb_width + padding
+    cell_height = thumb_height + caption_height + padding
+
+    sheet = Image.new("RGB", (columns * cell_width + padding, rows * cell_height + padding), "#222222")
+    draw = ImageDraw.Draw(sheet)
+    for i, still in enumerate(stills):
+        x = padding + (i % columns) * cell_width
+        y = padding + (i // columns) * cell_height
+        thumb = still.image.convert("RGB").resize((thumb_width, thumb_height), Image.LANCZOS)
+        sheet.paste(thumb, (x, y))
+        draw.text((x, y + thumb_height + 2), f"{still.scene}  t={still.time:.2f}s", fill="white", font=font)
+        draw.text((x, y + thumb_height + 2 + caption_height // 2), still.label[:70], fill="#aaaaaa", font=font)
+    return sheet
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    parser.add_argument("--at", type=float, action="append", default=[], metavar="SECONDS",
+                        help="timestamp within each scene, may be repeated")
+    parser.add_argument("--ends", action="store_true", help="capture the end of every animation")
+    parser.add_argument("-o", "--output", default="contact_sheet.png", help="contact sheet PNG")
+    parser.add_argument("--stills", help="also save each still at full resolution into this directory")
+    parser.add_argument("--thumb-width", type=int, default=480)
+    parser.add_argument("--columns", type=int, default=4)
+    args = parser.parse_args(argv)
+    if not args.at and not args.ends:
+        parser.error("nothing to capture, pass --at and/or --ends")
+
+    config.write_to_movie = False
+    config.save_last_frame = False
+    config.disable_caching = True
+    config.progress_bar = "none"
+
+    stills = []
+    for scene_cls in runner.get_scenes(args.scenes):
+        stills.extend(seek_scene(scene_cls, args.at, args.ends))
+
+    if args.stills:
+        out_dir = Path(args.stills)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for i, still in enumerate(stills):
+            still.image.save(out_dir / f"{still.scene}_{i:03d}_{still.time:07.2f}s.png")
+
+    contact_sheet(stills, args.thumb_width, args.columns).save(args.output)
+    print(f"Wrote {len(stills)} stills to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
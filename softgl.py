@@ -0,0 +1,241 @@
+"""Headless software-OpenGL render path for the ThreeDScene scenes
+
+Renders Scene01 and Scene05 through manim's OpenGL renderer on a GPU-less
+Linux box, using Mesa's llvmpipe rasterizer behind a surfaceless EGL context
+(no X server needed). Fixed-in-frame overlays go through the OpenGL
+fix_in_frame() uniform and ImageMobjects are swapped for textured
+OpenGLImageMobjects of the same size. Each backend runs in its own process,
+the last frame of every play is compared between them and frames per second
+are reported for both.
+
+    python softgl.py                         # Scene01 and Scene05, both backends
+    python softgl.py Scene05 --backend opengl --no-movie
+    python softgl.py --diff-dir media/softgl # also write cairo | opengl | diff strips
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import moderngl
+import numpy as np
+from manim import ThreeDScene, config, logger
+from manim.constants import DEFAULT_QUALITY, QUALITIES, RendererType
+from manim.mobject.opengl.opengl_image_mobject import OpenGLImageMobject
+from manim.renderer.opengl_renderer import OpenGLRenderer
+from manim.scene.scene_file_writer import SceneFileWriter
+from manim.utils.color import ManimColor
+from manim.utils.file_ops import guarantee_existence
+from manim.utils.images import get_full_raster_image_path
+from PIL import Image
+
+import finalvideo
+import runner
+
+BACKENDS = ("cairo", "opengl")
+
+
+def use_software_gl():
+    """Point Mesa at llvmpipe, and at surfaceless EGL when there is no display
+
+    Only sets what the environment does not already say, so a real GPU can
+    still be picked by exporting the variables before running.
+    """
+    os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+    os.environ.setdefault("GALLIUM_DRIVER", "llvmpipe")
+    # manim's shaders are GLSL 330
+    os.environ.setdefault("MESA_GL_VERSION_OVERRIDE", "3.3")
+    if not os.environ.get("DISPLAY"):
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+
+def create_context():
+    """Standalone moderngl context: EGL without a display, GLX (then EGL) with one"""
+    if not os.environ.get("DISPLAY"):
+        return moderngl.create_context(standalone=True, backend="egl")
+    try:
+        return moderngl.create_context(standalone=True)
+    except Exception:
+        return moderngl.create_context(standalone=True, backend="egl")
+
+
+def gl_image_mobject(filename_or_array, scale_to_resolution=QUALITIES[DEFAULT_QUALITY]["pixel_height"], **kwargs):
+    """OpenGLImageMobject sized like the Cairo ImageMobject for the same file"""
+    if isinstance(filename_or_array, np.ndarray):
+        rows = filename_or_array.shape[0]
+    else:
+        filename_or_array = get_full_raster_image_path(filename_or_array)
+        with Image.open(filename_or_array) as image:
+            rows = image.height
+    kwargs.setdefault("height", rows / scale_to_resolution * config.frame_height)
+    return OpenGLImageMobject(filename_or_array, **kwargs)
+
+
+class HeadlessGLRenderer(OpenGLRenderer):
+    """OpenGL renderer that never opens a window and honours scene.camera.background_color
+
+    The Cairo scenes set their background on the camera, which the stock
+    OpenGL renderer ignores in favour of config.background_color.
+    """
+
+    def init_scene(self, scene):
+        if not hasattr(self, "window"):
+            self.window = None
+            self.context = create_context()
+            self.frame_buffer_object = self.get_frame_buffer_object(self.context, 0)
+            self.frame_buffer_object.use()
+            self.context.enable(moderngl.BLEND)
+            self.context.wireframe = config.enable_wireframe
+            self.context.blend_func = (moderngl.SRC_ALPHA, moderngl.ONE_MINUS_SRC_ALPHA, moderngl.ONE, moderngl.ONE)
+            logger.info(f"OpenGL context: {self.context.info['GL_RENDERER']}")
+        super().init_scene(scene)
+        self.background_color = tuple(ManimColor(config.background_color).to_rgba())
+
+    def update_frame(self, scene):
+        color = getattr(scene.camera, "background_color", None)
+        if color is not None:
+            self.background_color = tuple(ManimColor(color).to_rgba())
+        super().update_frame(scene)
+
+
+class SamplingFileWriter(SceneFileWriter):
+    """Scene file writer that counts frames and keeps the last frame of every play
+
+    OpenGL output goes next to the Cairo output with an "_opengl" suffix
+    instead of overwriting it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.frames = 0
+        self.samples = {}
+        self.last = None
+        super().__init__(*args, **kwargs)
+
+    def init_output_directories(self, scene_name):
+        super().init_output_directories(scene_name)
+        if config.renderer == RendererType.OPENGL and hasattr(self, "partial_movie_directory"):
+            self.partial_movie_directory = guarantee_existence(self.partial_movie_directory / "opengl")
+            self.movie_file_path = self.movie_file_path.with_stem(f"{scene_name}_opengl")
+
+    def write_frame(self, frame_or_renderer):
+        super().write_frame(frame_or_renderer)
+        self.frames += 1
+        self.last = frame_or_renderer
+
+    def end_animation(self, allow_write=False):
+        if self.last is not None:
+            # Cairo hands over the frame, OpenGL the renderer whose buffer still holds it
+            frame = self.last if isinstance(self.last, np.ndarray) else self.last.get_frame()
+            self.samples[self.renderer.num_plays] = np.array(frame)
+            self.last = None
+        super().end_animation(allow_write)
+
+
+def render_samples(scene_name, backend, profile, write_movie=True):
+    """Render one scene on one backend (call in a fresh process) and return timing and samples"""
+    runner.apply_profile(profile)
+    config.disable_caching = True
+    config.progress_bar = "none"
+    config.write_to_movie = write_movie
+    scene_cls = runner.get_scenes([scene_name])[0]
+    if backend == "opengl":
+        use_software_gl()
+        # Rebases every manim mobject class onto its OpenGL counterpart
+        config.renderer = "opengl"
+        finalvideo.ImageMobject = gl_image_mobject
+        scene = scene_cls(renderer=HeadlessGLRenderer(file_writer_class=SamplingFileWriter))
+    else:
+        scene = runner.make_scene(scene_cls, file_writer_class=SamplingFileWriter)
+    started = time.perf_counter()
+    scene.render()
+    seconds = time.perf_counter() - started
+    file_writer = scene.renderer.file_writer
+    gl_renderer = scene.renderer.context.info["GL_RENDERER"] if backend == "opengl" else None
+    return dict(
+        scene=scene_name,
+        backend=backend,
+        gl_renderer=gl_renderer,
+        frames=file_writer.frames,
+        seconds=seconds,
+        fps=file_writer.frames / seconds if seconds else 0.0,
+        samples=file_writer.samples,
+    )
+
+
+def run_isolated(scene_name, backend, profile, write_movie=True):
+    # Switching config.renderer mutates manim's class hierarchy, so every
+    # render gets a fresh interpreter, one at a time to keep timings clean
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(render_samples, scene_name, backend, profile, write_movie).result()
+
+
+def frame_diff(a, b, threshold=24):
+    """Mean absolute RGB difference and share of pixels differing by more than ``threshold``"""
+    diff = np.abs(a[..., :3].astype(np.int16) - b[..., :3].astype(np.int16)).max(axis=-1)
+    return float(diff.mean()), float((diff > threshold).mean()), diff
+
+
+def parity(cairo, opengl, threshold=24, tolerance=0.02, diff_dir=None):
+    """Compare the per-play samples of two render_samples() results"""
+    rows = []
+    for index in sorted(cairo["samples"].keys() & opengl["samples"].keys()):
+        a, b = cairo["samples"][index], opengl["samples"][index]
+        mean, share, diff = frame_diff(a, b, threshold)
+        rows.append(dict(play=index, mean_diff=round(mean, 2), pixels_off=round(share, 4), ok=share <= tolerance))
+        if diff_dir is not None:
+            heat = np.zeros_like(a)
+            heat[..., 0] = np.minimum(diff.astype(np.int32) * 4, 255)
+            heat[..., 3] = 255
+            path = guarantee_existence(Path(diff_dir)) / f"{cairo['scene']}-play{index:03d}.png"
+            Image.fromarray(np.hstack([a, b, heat])).save(path)
+    missing = cairo["samples"].keys() ^ opengl["samples"].keys()
+    return rows, sorted(missing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenes", nargs="*", help="scene names or prefixes (default: the ThreeDScenes)")
+    parser.add_argument("--backend", choices=(*BACKENDS, "both"), default="both")
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    parser.add_argument("--no-movie", action="store_true", help="rasterize only, do not encode (fps without ffmpeg)")
+    parser.add_argument("--threshold", type=int, default=24, help="per-channel difference that counts a pixel as off")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="share of off pixels allowed per sample")
+    parser.add_argument("--diff-dir", help="write cairo | opengl | diff strips here")
+    args = parser.parse_args(argv)
+
+    if args.scenes:
+        scenes = runner.get_scenes(args.scenes)
+    else:
+        scenes = [cls for cls in runner.SCENES if issubclass(cls, ThreeDScene)]
+    backends = BACKENDS if args.backend == "both" else (args.backend,)
+    failed = False
+    for scene_cls in scenes:
+        results = {}
+        for backend in backends:
+            result = results[backend] = run_isolated(scene_cls.__name__, backend, args.profile, not args.no_movie)
+            extra = f" on {result['gl_renderer']}" if result["gl_renderer"] else ""
+            print(f"{scene_cls.__name__} {backend:<6} {result['frames']} frames in {result['seconds']:.1f}s "
+                  f"= {result['fps']:.1f} fps{extra}")
+        if len(results) < 2:
+            continue
+        rows, missing = parity(results["cairo"], results["opengl"], args.threshold, args.tolerance, args.diff_dir)
+        for row in rows:
+            if not row["ok"]:
+                failed = True
+                print(f"  play {row['play']:>3}: {row['pixels_off']:.2%} of pixels off "
+                      f"(mean diff {row['mean_diff']})")
+        if missing:
+            failed = True
+            print(f"  plays sampled on one backend only: {missing}")
+        worst = max((row["pixels_off"] for row in rows), default=0.0)
+        print(f"  parity: {sum(row['ok'] for row in rows)}/{len(rows)} plays within tolerance, worst {worst:.2%}")
+        speedup = results["opengl"]["fps"] / results["cairo"]["fps"] if results["cairo"]["fps"] else 0.0
+        print(f"  opengl/cairo fps: {speedup:.2f}x")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
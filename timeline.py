@@ -0,0 +1,422 @@
+"""Record a scene's timeline once, replay it at any resolution and frame rate
+
+Recording runs construct() once at a high frame rate, animations included,
+but draws nothing. For every frame it stores the resolved state of each
+displayed mobject: its points, fill, stroke and background stroke colors,
+widths, z-index, 3D shading and fixed-in-frame flags, or the pixels of an
+image. It also stores the camera state, and per play the frame range, the
+duration and the animations with their run time, rate function and lag
+ratio. Identical states are stored once, so static mobjects cost nothing
+after their first frame. The result is media/timeline/<Scene>/ (timeline.json
+and states.npz).
+
+Replaying never imports the scene's construct(). It rasterizes the stored
+states with the scene's camera type at any profile. Frame rates that do not
+divide the recording rate are interpolated between neighbouring recorded
+frames where their states line up. Contiguous frame ranges are rendered in
+parallel processes and joined with a stream copy.
+
+    python timeline.py record Scene02 --fps 60
+    python timeline.py replay Scene02 --profile draft --workers 4
+    python timeline.py replay Scene02 --size 3840x2160 --fps 24
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from manim import (Camera, CapStyleType, ImageMobject, LineJointType, ManimColor, ThreeDCamera, VMobject, config,
+                   logger, tempconfig)
+from manim.mobject.types.image_mobject import AbstractImageMobject
+from manim.renderer.cairo_renderer import CairoRenderer
+from manim.utils.color import color_to_rgba
+from manim.utils.family import extract_mobject_family_members
+from manim.utils.file_ops import guarantee_existence
+from manim.utils.iterables import list_update
+
+import delivery
+import runner
+
+TIMELINE_DIR = runner.ROOT / "media" / "timeline"
+RECORD_FPS = 60
+
+VECTOR, IMAGE = 0, 1
+# One row of per-state scalars
+SCALARS = ("stroke_width", "background_stroke_width", "z_index", "shade_in_3d", "joint_type", "cap_style",
+           "sheen_factor", "sheen_x", "sheen_y", "sheen_z", "fixed", "center_x", "center_y", "center_z",
+           "image", "resampling")
+S = {name: index for index, name in enumerate(SCALARS)}
+COLOR_ARRAYS = ("fill_rgbas", "stroke_rgbas", "background_stroke_rgbas")
+# fixed: 0 moves with the 3D camera, 1 fixed in frame, 2 fixed orientation around the stored center
+CAMERA_FIELDS = ("phi", "theta", "focal_distance", "gamma", "zoom", "center_x", "center_y", "center_z",
+                 "background_r", "background_g", "background_b", "background_a")
+
+
+class StateStore:
+    """Deduplicated mobject states, addressed by an integer id"""
+
+    def __init__(self):
+        self.ids = {}
+        self.kinds = []
+        self.scalars = []
+        self.arrays = {name: [] for name in ("points", *COLOR_ARRAYS)}
+        self.images = []
+        self.image_ids = {}
+
+    def add(self, mob, camera):
+        """Id of ``mob``'s current state, or None for mobjects Cairo does not draw"""
+        row = np.zeros(len(SCALARS))
+        if isinstance(camera, ThreeDCamera):
+            if mob in camera.fixed_in_frame_mobjects:
+                row[S["fixed"]] = 1
+            elif mob in camera.fixed_orientation_mobjects:
+                row[S["fixed"]] = 2
+                row[S["center_x"]:S["center_z"] + 1] = camera.fixed_orientation_mobjects[mob]()
+        row[S["z_index"]] = mob.z_index
+        if isinstance(mob, VMobject):
+            kind = VECTOR
+            row[S["stroke_width"]] = mob.get_stroke_width()
+            row[S["background_stroke_width"]] = mob.get_stroke_width(background=True)
+            row[S["shade_in_3d"]] = bool(mob.shade_in_3d)
+            row[S["joint_type"]] = mob.joint_type.value
+            row[S["cap_style"]] = mob.cap_style.value
+            row[S["sheen_factor"]] = mob.sheen_factor
+            row[S["sheen_x"]:S["sheen_z"] + 1] = mob.get_sheen_direction()
+            arrays = dict(points=mob.points, fill_rgbas=mob.get_fill_rgbas(), stroke_rgbas=mob.get_stroke_rgbas(),
+                          background_stroke_rgbas=mob.get_stroke_rgbas(background=True))
+        elif isinstance(mob, AbstractImageMobject):
+            kind = IMAGE
+            pixels = mob.get_pixel_array()
+            row[S["image"]] = self.add_image(pixels)
+            row[S["resampling"]] = mob.resampling_algorithm
+            arrays = dict(points=mob.points)
+        else:
+            return None
+        arrays = {name: np.asarray(value, np.float32) for name, value in arrays.items()}
+        digest = hashlib.blake2b(bytes([kind]) + row.tobytes(), digest_size=16)
+        for name, value in arrays.items():
+            digest.update(name.encode() + str(value.shape).encode() + value.tobytes())
+        key = digest.digest()
+        if key not in self.ids:
+            self.ids[key] = len(self.kinds)
+            self.kinds.append(kind)
+            self.scalars.append(row)
+            for name, values in self.arrays.items():
+                values.append(arrays.get(name, np.zeros((0, 3 if name == "points" else 4), np.float32)))
+        return self.ids[key]
+
+    def add_image(self, pixels):
+        key = hashlib.blake2b(str(pixels.shape).encode() + pixels.tobytes(), digest_size=16).digest()
+        if key not in self.image_ids:
+            self.image_ids[key] = len(self.images)
+            self.images.append(np.array(pixels, np.uint8))
+        return self.image_ids[key]
+
+    def arrays_for_saving(self):
+        saved = dict(kinds=np.array(self.kinds, np.int8), scalars=np.array(self.scalars).reshape(-1, len(SCALARS)))
+        for name, values in self.arrays.items():
+            saved[name] = np.concatenate(values) if values else np.zeros((0, 3 if name == "points" else 4), np.float32)
+            saved[f"{name}_offsets"] = np.cumsum([0] + [len(value) for value in values])
+        for index, pixels in enumerate(self.images):
+            saved[f"image_{index}"] = pixels
+        return saved
+
+
+def camera_state(camera):
+    state = np.zeros(len(CAMERA_FIELDS))
+    if isinstance(camera, ThreeDCamera):
+        state[:5] = [tracker.get_value() for tracker in camera.get_value_trackers()]
+        state[5:8] = camera.frame_center
+    state[8:] = color_to_rgba(camera.background_color, camera.background_opacity)
+    return state
+
+
+def describe(animation):
+    return dict(type=type(animation).__name__, run_time=animation.run_time,
+                rate_func=getattr(animation.rate_func, "__name__", repr(animation.rate_func)),
+                lag_ratio=animation.lag_ratio)
+
+
+class RecordingRenderer(CairoRenderer):
+    """Cairo renderer that stores every frame's mobject states instead of drawing it"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.store = StateStore()
+        self.frame_states = []
+        self.frame_counts = []
+        self.cameras = []
+        self.segments = []
+        self.current = None
+
+    def play(self, scene, *args, **kwargs):
+        first = sum(self.frame_counts)
+        tag = runner.play_tag(scene, args)
+        super().play(scene, *args, **kwargs)
+        self.segments.append(dict(
+            play=self.num_plays - 1, tag=tag, first_frame=first, frames=sum(self.frame_counts) - first,
+            duration=scene.duration, animations=[describe(animation) for animation in scene.animations],
+        ))
+
+    def update_frame(self, scene, mobjects=None, *args, **kwargs):
+        # Everything on screen, not just the moving mobjects: there is no static image to draw over
+        family = extract_mobject_family_members(list_update(scene.mobjects, scene.foreground_mobjects),
+                                                use_z_index=self.camera.use_z_index, only_those_with_points=True)
+        ids = (self.store.add(mob, self.camera) for mob in family)
+        self.current = (np.array([state for state in ids if state is not None], np.int32), camera_state(self.camera))
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        self.static_image = None
+        return None
+
+    def get_frame(self):
+        return None
+
+    def add_frame(self, frame, num_frames=1):
+        if self.skip_animations or not num_frames:
+            return
+        self.time += num_frames / self.camera.frame_rate
+        states, camera = self.current
+        self.frame_states.append(states)
+        self.frame_counts.append(num_frames)
+        self.cameras.append(camera)
+
+    def scene_finished(self, scene):
+        pass
+
+    def save(self, scene, directory):
+        guarantee_existence(directory)
+        offsets = np.cumsum([0] + [len(states) for states in self.frame_states])
+        arrays = self.store.arrays_for_saving()
+        arrays.update(
+            frame_states=np.concatenate(self.frame_states) if self.frame_states else np.zeros(0, np.int32),
+            frame_offsets=offsets, frame_counts=np.array(self.frame_counts, np.int32),
+            cameras=np.array(self.cameras).reshape(-1, len(CAMERA_FIELDS)),
+        )
+        np.savez(directory / "states.npz", **arrays)
+        meta = dict(
+            scene=type(scene).__name__, camera=type(self.camera).__name__, fps=self.camera.frame_rate,
+            frame_width=config.frame_width, frame_height=config.frame_height,
+            frames=int(sum(self.frame_counts)), states=len(self.store.kinds), images=len(self.store.images),
+            segments=self.segments,
+        )
+        (directory / "timeline.json").write_text(json.dumps(meta, indent=1) + "\n")
+        return meta
+
+
+def record(scene_cls, fps=RECORD_FPS):
+    """Run construct() once and write media/timeline/<Scene>/"""
+    with tempconfig(dict(frame_rate=fps, write_to_movie=False, save_last_frame=False, disable_caching=True)):
+        scene = runner.run_scene(scene_cls, RecordingRenderer)
+    return scene.renderer.save(scene, TIMELINE_DIR / scene_cls.__name__)
+
+
+class Timeline:
+    """A recorded timeline, turned back into drawable mobjects frame by frame"""
+
+    def __init__(self, directory):
+        self.meta = json.loads((directory / "timeline.json").read_text())
+        with np.load(directory / "states.npz") as saved:
+            self.arrays = {name: saved[name] for name in saved.files}
+        # Recorded frame index -> entry in the frame arrays (entries can hold several frames)
+        self.entry_of_frame = np.repeat(np.arange(len(self.arrays["frame_counts"])), self.arrays["frame_counts"])
+        self.cache = {}
+
+    def duration(self):
+        return len(self.entry_of_frame) / self.meta["fps"]
+
+    def states(self, entry):
+        offsets = self.arrays["frame_offsets"]
+        return self.arrays["frame_states"][offsets[entry]:offsets[entry + 1]]
+
+    def state_arrays(self, state):
+        return {name: self.arrays[name][self.arrays[f"{name}_offsets"][state]:self.arrays[f"{name}_offsets"][state + 1]]
+                for name in ("points", *COLOR_ARRAYS)}
+
+    def build(self, state, arrays=None):
+        row = self.arrays["scalars"][state]
+        arrays = arrays or self.state_arrays(state)
+        if self.arrays["kinds"][state] == IMAGE:
+            mob = ImageMobject(self.arrays[f"image_{int(row[S['image']])}"])
+            mob.resampling_algorithm = int(row[S["resampling"]])
+        else:
+            mob = VMobject()
+            mob.fill_rgbas, mob.stroke_rgbas, mob.background_stroke_rgbas = (
+                np.array(arrays[name], np.float64) for name in COLOR_ARRAYS)
+            mob.stroke_width = row[S["stroke_width"]]
+            mob.background_stroke_width = row[S["background_stroke_width"]]
+            mob.shade_in_3d = bool(row[S["shade_in_3d"]])
+            mob.joint_type = LineJointType(int(row[S["joint_type"]]))
+            mob.cap_style = CapStyleType(int(row[S["cap_style"]]))
+            mob.sheen_factor = row[S["sheen_factor"]]
+            mob.sheen_direction = row[S["sheen_x"]:S["sheen_z"] + 1].copy()
+        mob.points = np.array(arrays["points"], np.float64)
+        mob.z_index = row[S["z_index"]]
+        return mob
+
+    def blend(self, state, other, alpha):
+        """A mobject between two states, or None when they cannot be interpolated"""
+        if self.arrays["kinds"][state] != self.arrays["kinds"][other]:
+            return None
+        start, end = self.state_arrays(state), self.state_arrays(other)
+        if any(start[name].shape != end[name].shape for name in start):
+            return None
+        mob = self.build(state, {name: start[name] + alpha * (end[name] - start[name]) for name in start})
+        if isinstance(mob, VMobject):
+            widths = self.arrays["scalars"][[state, other], S["stroke_width"]]
+            mob.stroke_width = widths[0] + alpha * (widths[1] - widths[0])
+        return mob
+
+    def mobjects_at(self, time):
+        """Drawable mobjects and camera state at ``time`` seconds"""
+        position = min(time * self.meta["fps"], len(self.entry_of_frame) - 1)
+        frame = int(position)
+        entry = self.entry_of_frame[frame]
+        after = self.entry_of_frame[min(frame + 1, len(self.entry_of_frame) - 1)]
+        alpha = position - frame
+        states = self.states(entry)
+        camera = self.arrays["cameras"][entry]
+        cache = {}
+        mobjects = []
+        blend_with = self.states(after) if after != entry and alpha > 1e-6 else None
+        if blend_with is not None and len(blend_with) != len(states):
+            blend_with = None
+        for index, state in enumerate(states):
+            state = int(state)
+            if blend_with is not None and blend_with[index] != state:
+                mob = self.blend(state, int(blend_with[index]), alpha)
+                if mob is not None:
+                    mobjects.append((state, mob))
+                    continue
+            mob = self.cache[state] if state in self.cache else self.build(state)
+            cache[state] = mob
+            mobjects.append((state, mob))
+        if blend_with is not None:
+            camera = camera + alpha * (self.arrays["cameras"][after] - camera)
+        # Only keep what this frame used, so memory does not grow with the timeline
+        self.cache = cache
+        return mobjects, camera
+
+
+def apply_camera_state(camera, state, mobjects, scalars):
+    if isinstance(camera, ThreeDCamera):
+        for tracker, value in zip(camera.get_value_trackers(), state[:5]):
+            tracker.set_value(value)
+        camera.frame_center = state[5:8]
+        camera.fixed_in_frame_mobjects = set()
+        camera.fixed_orientation_mobjects = {}
+        for state_id, mob in mobjects:
+            row = scalars[state_id]
+            if row[S["fixed"]] == 1:
+                camera.fixed_in_frame_mobjects.add(mob)
+            elif row[S["fixed"]] == 2:
+                center = row[S["center_x"]:S["center_z"] + 1].copy()
+                camera.fixed_orientation_mobjects[mob] = lambda center=center: center
+    background = tuple(state[8:])
+    if background != getattr(camera, "replayed_background", None):
+        camera.replayed_background = background
+        camera._background_opacity = background[3]
+        camera.background_color = ManimColor(np.array(background[:3]))
+
+
+def replay_chunk(scene_name, size, fps, first, last, output):
+    """Render output frames [first, last) of a recorded timeline into one movie file (run in a worker)"""
+    width, height = size
+    timeline = Timeline(TIMELINE_DIR / scene_name)
+    config.frame_width = timeline.meta["frame_width"]
+    config.frame_height = timeline.meta["frame_height"]
+    config.pixel_width, config.pixel_height, config.frame_rate = width, height, fps
+    camera = (ThreeDCamera if timeline.meta["camera"] == "ThreeDCamera" else Camera)()
+    process = subprocess.Popen([
+        config.ffmpeg_executable, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-s", f"{width}x{height}", "-pix_fmt", "rgba", "-r", str(fps), "-i", "-",
+        "-an", "-vcodec", "libx264", "-pix_fmt", "yuv420p", str(output),
+    ], stdin=subprocess.PIPE)
+    try:
+        for index in range(first, last):
+            mobjects, state = timeline.mobjects_at(index / fps)
+            apply_camera_state(camera, state, mobjects, timeline.arrays["scalars"])
+            camera.reset()
+            camera.capture_mobjects([mob for _, mob in mobjects])
+            process.stdin.write(camera.pixel_array.tobytes())
+    finally:
+        process.stdin.close()
+        process.wait()
+    return output
+
+
+def replay(scene_name, size, fps, workers=4):
+    """Render a recorded timeline at ``size`` and ``fps``, ``workers`` frame ranges at a time"""
+    meta = json.loads((TIMELINE_DIR / scene_name / "timeline.json").read_text())
+    frames = round(meta["frames"] / meta["fps"] * fps)
+    directory = guarantee_existence(TIMELINE_DIR / scene_name / f"{size[0]}x{size[1]}@{fps}")
+    # A few ranges per worker so one slow stretch does not hold up the others
+    bounds = np.linspace(0, frames, min(frames, workers * 3) + 1).astype(int)
+    chunks = [directory / f"chunk_{index:04d}.mp4" for index in range(len(bounds) - 1)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        for future in [pool.submit(replay_chunk, scene_name, size, fps, int(first), int(last), chunk)
+                       for first, last, chunk in zip(bounds[:-1], bounds[1:], chunks)]:
+            future.result()
+    output = directory.with_suffix(".mp4")
+    delivery.concat(chunks, output)
+    for chunk in chunks:
+        chunk.unlink()
+    directory.rmdir()
+    return output, frames
+
+
+def record_command(args):
+    config.progress_bar = "none"
+    for scene_cls in runner.get_scenes(args.scenes):
+        started = time.perf_counter()
+        meta = record(scene_cls, args.fps)
+        logger.info(f"Recorded {scene_cls.__name__}")
+        print(f"{meta['scene']}: {meta['frames']} frames at {meta['fps']} fps, {len(meta['segments'])} plays, "
+              f"{meta['states']} distinct states, {meta['images']} images ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+def replay_command(args):
+    width, height, fps = runner.PROFILES[args.profile]
+    if args.size:
+        width, height = (int(n) for n in args.size.split("x"))
+    fps = args.fps or fps
+    for scene_cls in runner.get_scenes(args.scenes):
+        if not (TIMELINE_DIR / scene_cls.__name__ / "timeline.json").exists():
+            raise SystemExit(f"No timeline for {scene_cls.__name__}, run: python timeline.py record {scene_cls.__name__}")
+        started = time.perf_counter()
+        output, frames = replay(scene_cls.__name__, (width, height), fps, args.workers)
+        elapsed = time.perf_counter() - started
+        print(f"{scene_cls.__name__}: {frames} frames at {width}x{height}@{fps} in {elapsed:.1f}s "
+              f"({frames / elapsed:.1f} fps) -> {output}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recorder = commands.add_parser("record", help="run construct() once and store the timeline")
+    recorder.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    recorder.add_argument("--fps", type=int, default=RECORD_FPS, help="recording frame rate")
+    recorder.set_defaults(func=record_command)
+
+    player = commands.add_parser("replay", help="rasterize stored timelines")
+    player.add_argument("scenes", nargs="*", help="scene names or prefixes (default: all)")
+    player.add_argument("--profile", choices=sorted(runner.PROFILES), default="production")
+    player.add_argument("--size", help="WxH overriding the profile's resolution, e.g. 3840x2160")
+    player.add_argument("--fps", type=int, help="frame rate overriding the profile's")
+    player.add_argument("--workers", type=int, default=4)
+    player.set_defaults(func=replay_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
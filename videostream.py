@@ -0,0 +1,219 @@
+"""Stream a video of any length through an NdLinear in constant memory
+
+The layer is NdLinear((window, H, W, C), (t, h, w, c)) applied to every
+clip of ``window`` frames, advancing by ``stride`` frames. Because its
+per-axis maps commute once the biases are folded (see ndlinear.py), each
+frame is reduced from (H, W, C) to (h, w, c) as soon as it is read. Only
+the last ``window`` reduced frames are kept, in a ring buffer, and the time
+axis is one small matmul per clip against that buffer. Raw frames are read
+in chunks of (T, H, W, C), either from a memory-mapped raw file or an
+ffmpeg pipe, on a prefetch thread with a bounded queue. The spatial and
+channel contractions of a chunk are split across a thread pool; NumPy's
+matmul releases the GIL. Memory is one chunk in flight plus the ring,
+whatever the video length.
+
+    python videostream.py media/videos/finalvideo/480p15/Scene01_Introduction.mp4 --resize 64x36
+    python videostream.py frames.raw --raw-shape 36,64,3 --out-shape 2,8,8,4 --output clips.f32
+"""
+
+import argparse
+import copy
+import math
+import queue
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import ndlinear
+
+
+def memmap_chunks(path, frame_shape, chunk, dtype=np.uint8):
+    """(T, H, W, C) chunks of a raw frame file, without reading the rest of it"""
+    frames = np.memmap(path, dtype=dtype, mode="r")
+    frames = frames[:len(frames) - len(frames) % math.prod(frame_shape)].reshape(-1, *frame_shape)
+    for start in range(0, len(frames), chunk):
+        yield frames[start:start + chunk]
+
+
+def probe_size(path, ffprobe="ffprobe"):
+    output = subprocess.run([ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries",
+                             "stream=width,height", "-of", "csv=p=0", str(path)],
+                            check=True, capture_output=True, text=True).stdout
+    width, height = output.strip().split(",")[:2]
+    return int(width), int(height)
+
+
+def ffmpeg_chunks(path, chunk, resize=None, ffmpeg="ffmpeg", ffprobe="ffprobe"):
+    """(T, H, W, 3) uint8 chunks decoded by ffmpeg, optionally scaled to ``resize`` (width, height)"""
+    width, height = resize or probe_size(path, ffprobe)
+    command = [ffmpeg, "-v", "error", "-i", str(path)]
+    if resize:
+        command += ["-vf", f"scale={width}:{height}"]
+    command += ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    frame_bytes = width * height * 3
+    # stderr goes to a file, not a pipe nobody reads while stdout is drained
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            while True:
+                data = process.stdout.read(frame_bytes * chunk)
+                if len(data) < frame_bytes:
+                    break
+                yield np.frombuffer(data[:len(data) - len(data) % frame_bytes], np.uint8).reshape(-1, height, width, 3)
+            if process.wait():
+                errors.seek(0)
+                raise RuntimeError(f"ffmpeg exited with {process.returncode} reading {path}: "
+                                   f"{errors.read().decode(errors='replace').strip()}")
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+
+def anon_rss_mb():
+    """Resident memory not backed by files, so memory-mapped input frames do not count"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prefetch(chunks, depth=2):
+    """Read the next chunks on a thread while the current one is transformed"""
+    done = object()
+    pending = queue.Queue(maxsize=depth)
+
+    failed = []
+
+    def reader():
+        try:
+            for item in chunks:
+                pending.put(item)
+        except Exception as error:
+            failed.append(error)
+        finally:
+            pending.put(done)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while (item := pending.get()) is not done:
+        yield item
+    if failed:
+        # Reader errors (a failed ffmpeg, say) surface here instead of dying with the thread
+        raise failed[0]
+
+
+class StreamingNdLinear:
+    """NdLinear((window, *frame_shape), out_shape) applied to every window of a frame stream"""
+
+    def __init__(self, window, frame_shape, out_shape, stride=1, workers=4, seed=0):
+        self.window, self.stride = window, stride
+        self.layer = ndlinear.NdLinear((window, *frame_shape), out_shape, seed=seed)
+        # The same spatial and channel weights without biases; the full
+        # layer's folded bias is added once per clip
+        self.frame_layer = ndlinear.NdLinear(frame_shape, out_shape[1:])
+        self.frame_layer.weights = self.layer.weights[1:]
+        self.frame_layer.biases = [np.zeros_like(bias) for bias in self.layer.biases[1:]]
+        self.frame_layer.refresh()
+        # NdLinear buffers are per layer object, so every thread gets a shallow copy
+        self.frame_layers = [copy.copy(self.frame_layer) for _ in range(workers)]
+        for layer in self.frame_layers:
+            layer._buffers = {}
+        self.reduced_size = math.prod(out_shape[1:])
+        self.ring = np.zeros((window, self.reduced_size), np.float32)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="videostream")
+        self.frames_read = 0
+
+    def reduce(self, chunk):
+        """Spatial and channel transforms of one chunk, split across the pool"""
+        out = np.empty((len(chunk), self.reduced_size), np.float32)
+        bounds = np.linspace(0, len(chunk), len(self.frame_layers) + 1).astype(int)
+        jobs = [self.pool.submit(self.reduce_slice, layer, chunk[start:stop], out[start:stop])
+                for layer, start, stop in zip(self.frame_layers, bounds[:-1], bounds[1:]) if stop > start]
+        for job in jobs:
+            job.result()
+        return out
+
+    @staticmethod
+    def reduce_slice(layer, frames, out):
+        # uint8 frames are scaled to [0, 1] here so the conversion is spread over the pool too
+        scale = np.float32(1 / 255 if frames.dtype == np.uint8 else 1)
+        layer(np.multiply(frames, scale, dtype=np.float32), out.reshape(len(frames), *layer.hidden_dims))
+
+    def run(self, chunks):
+        """Yield (first frame index, (t, h, w, c) output) for every window of the stream"""
+        weight = self.layer.weights[0]
+        bias = self.layer.bias.reshape(weight.shape[0], -1)
+        for chunk in chunks:
+            reduced = self.reduce(chunk)
+            for frame in reduced:
+                self.ring[self.frames_read % self.window] = frame
+                self.frames_read += 1
+                start = self.frames_read - self.window
+                if start < 0 or start % self.stride:
+                    continue
+                # Ring slot s holds time position (s - start) % window of this clip
+                rolled = np.roll(weight, start % self.window, axis=1)
+                clip = rolled @ self.ring + bias
+                yield start, clip.reshape(self.layer.hidden_dims)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file (read through ffmpeg) or raw uint8 frames with --raw-shape")
+    parser.add_argument("--raw-shape", type=ndlinear.parse_shape, help='H,W,C of a raw frame file, e.g. "36,64,3"')
+    parser.add_argument("--resize", help="WxH to scale decoded video to, e.g. 64x36")
+    parser.add_argument("--window", type=int, default=8, help="frames per clip (the layer's time axis)")
+    parser.add_argument("--stride", type=int, default=4, help="frames between clips")
+    parser.add_argument("--out-shape", type=ndlinear.parse_shape, default=(2, 8, 8, 4), help="t,h,w,c per clip")
+    parser.add_argument("--chunk", type=int, default=32, help="frames read and reduced at a time")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="append every clip's float32 output to this raw file")
+    args = parser.parse_args(argv)
+
+    if args.raw_shape:
+        frame_shape = args.raw_shape
+        chunks = memmap_chunks(args.source, frame_shape, args.chunk)
+    else:
+        resize = tuple(int(n) for n in args.resize.split("x")) if args.resize else None
+        width, height = resize or probe_size(args.source)
+        frame_shape = (height, width, 3)
+        chunks = ffmpeg_chunks(args.source, args.chunk, resize)
+    stream = StreamingNdLinear(args.window, frame_shape, args.out_shape, args.stride, args.workers)
+    print(f"NdLinear({(args.window, *frame_shape)}, {args.out_shape}) every {args.stride} frames, "
+          f"{stream.layer.parameters:,} parameters")
+
+    started = time.perf_counter()
+    clips, peak_mb = 0, anon_rss_mb()
+    output = open(args.output, "wb") if args.output else None
+    try:
+        for _, clip in stream.run(prefetch(chunks)):
+            clips += 1
+            if clips % 16 == 0:
+                peak_mb = max(peak_mb, anon_rss_mb())
+            if output:
+                output.write(clip.tobytes())
+    finally:
+        stream.close()
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    frames = stream.frames_read
+    print(f"{clips} clips over {frames} frames in {elapsed:.2f}s ({frames / elapsed if elapsed else 0:.1f} frames/s), "
+          f"peak anonymous RSS {peak_mb:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""Create and Write from precomputed partial-curve tables
+
+Every frame, stock Create/Write call pointwise_become_partial on each glyph:
+the outline is split into cubic tuples again, the visible curves are copied
+over one np.append at a time and the cut curve goes through
+partial_bezier_points. Write also re-runs match_style per glyph and frame.
+
+TableCreate and TableWrite do that work once, at begin:
+
+- every glyph's curves go into one flat (curves, 4, 3) source table and a
+  frame buffer initialised from it; glyph points become views into the
+  buffer, so the visible prefix of a glyph is just a slice;
+- a per-curve table maps each glyph's progress to (curve, residue), by
+  curve count as manim does, or by arc length with ``arc_length = True``;
+- the lag schedule (each glyph's offset and the stretched run length) and,
+  for Write, the outline and final style arrays are laid out per glyph.
+
+A frame then looks up all glyphs' cut curves with one searchsorted, puts
+back the curves cut on the previous frame, writes the new cut curves with
+one einsum of de Casteljau weights and lerps the style buffers. If any
+glyph ends in a partial curve, the whole animation keeps the stock code
+path. install() makes finalvideo use both classes, like asynctex.install().
+
+    python writetables.py                # interpolation fps of Scene01's bullet-list Write, stock vs tables
+    python writetables.py --raster       # including Cairo rasterization of every frame
+"""
+
+import argparse
+import time
+
+import numpy as np
+from manim import Animation, Camera, Create, VGroup, Write, config
+from manim.utils.iterables import stretch_array_to_length
+
+import animdelta
+import finalvideo
+import runner
+
+
+def partial_weights(residues):
+    """(n, 4, 4) weights of partial_bezier_points(quad, 0, r) for every residue r"""
+    r = np.asarray(residues, dtype=float)[:, None]
+    s = 1 - r
+    zero, one = np.zeros_like(r), np.ones_like(r)
+    return np.stack([
+        np.hstack([one, zero, zero, zero]),
+        np.hstack([s, r, zero, zero]),
+        np.hstack([s ** 2, 2 * r * s, r ** 2, zero]),
+        np.hstack([s ** 3, 3 * r * s ** 2, 3 * r ** 2 * s, r ** 3]),
+    ], axis=1)
+
+
+class PartialCurveTables:
+    """Flat curve tables and lag schedule shared by TableCreate and TableWrite"""
+
+    arc_length = False
+    arc_samples = 9
+
+    def build_tables(self):
+        """False if some glyph cannot be cut curve by curve; the stock path handles that animation"""
+        members = self.mobject.family_members_with_points()
+        sizes = np.array([len(member.points) for member in members])
+        if not len(members) or (sizes % 4).any():
+            return False
+        self.members = members
+        self.curves = sizes // 4
+        self.first_curve = np.concatenate([[0], np.cumsum(self.curves)[:-1]])
+        self.source = np.concatenate([member.points for member in members]).reshape(-1, 4, 3)
+        self.buffer = self.source.copy()
+        owner = np.repeat(np.arange(len(members)), self.curves)
+        lengths = np.ones(len(self.source))
+        if self.arc_length:
+            t = np.linspace(0, 1, self.arc_samples)[:, None]
+            bernstein = np.hstack([(1 - t) ** 3, 3 * t * (1 - t) ** 2, 3 * t ** 2 * (1 - t), t ** 3])
+            sampled = np.einsum("sk,qkd->qsd", bernstein, self.source)
+            measured = np.linalg.norm(np.diff(sampled, axis=1), axis=2).sum(axis=1)
+            # Glyphs of zero length fall back to equal shares per curve
+            lengths = np.where(np.bincount(owner, measured)[owner] > 0, measured, 1)
+        totals = np.bincount(owner, lengths)
+        before = np.concatenate([[0], np.cumsum(totals)[:-1]])
+        self.curve_span = lengths / totals[owner]
+        self.curve_end = (np.cumsum(lengths) - before[owner]) / totals[owner]
+        self.curve_start = self.curve_end - self.curve_span
+        # Increasing over all glyphs: glyph index + fraction of the glyph drawn
+        self.keys = owner + self.curve_end
+        self.shown = self.first_curve + self.curves - 1
+        for member, first, count in zip(members, self.first_curve, self.curves):
+            member.points = self.buffer[first:first + count].reshape(-1, 3)
+        # Lag schedule, as Animation.get_sub_alpha spreads it
+        self.lag_offsets = np.arange(len(members)) * self.lag_ratio
+        self.full_length = (len(members) - 1) * self.lag_ratio + 1
+        return True
+
+    def start_tables(self):
+        if self.run_time <= 0:
+            raise ValueError(f"{self} has a run_time of <= 0 seconds, this cannot be rendered correctly.")
+        if self.suspend_mobject_updating:
+            self.mobject.suspend_updating()
+        self.interpolate(0)
+
+    def sub_alphas(self, alpha):
+        values = alpha * self.full_length - self.lag_offsets
+        if self.reverse_rate_function:
+            values = 1 - values
+        return np.fromiter(map(self.rate_func, values), float, len(values))
+
+    def show_partial(self, progress):
+        """Cut every glyph at its progress in [0, 1]: full curves before, de Casteljau on the cut one"""
+        progress = np.clip(progress, 0, 1)
+        last = self.first_curve + self.curves - 1
+        curve = np.clip(np.searchsorted(self.keys, np.arange(len(progress)) + progress, side="right"),
+                        self.first_curve, last)
+        residue = np.clip((progress - self.curve_start[curve]) / self.curve_span[curve], 0, 1)
+        moved = np.flatnonzero(curve != self.shown)
+        self.buffer[self.shown[moved]] = self.source[self.shown[moved]]
+        for index in moved:
+            first = self.first_curve[index]
+            self.members[index].points = self.buffer[first:curve[index] + 1].reshape(-1, 3)
+        self.shown = curve
+        self.buffer[curve] = np.einsum("nij,njd->nid", partial_weights(residue), self.source[curve])
+
+
+class TableCreate(PartialCurveTables, Create):
+    """Create with the curve tables"""
+
+    _real_cls = Create
+
+    def begin(self):
+        self.tables = self.build_tables()
+        if not self.tables:
+            return super().begin()
+        self.start_tables()
+
+    def interpolate_mobject(self, alpha):
+        if not self.tables:
+            return super().interpolate_mobject(alpha)
+        self.show_partial(self.sub_alphas(alpha))
+
+
+class TableWrite(PartialCurveTables, Write):
+    """Write with the curve tables; the outline is a style-only ghost of the mobject"""
+
+    _real_cls = Write
+
+    def get_outline(self):
+        outline = animdelta.style_ghost(self.mobject)
+        outline.set_fill(opacity=0)
+        for submobject in outline.family_members_with_points():
+            submobject.set_stroke(color=self.get_stroke_color(submobject), width=self.stroke_width)
+        return outline
+
+    def begin(self):
+        if self.reverse:
+            self.reverse_submobjects()
+        self.outline = self.get_outline()
+        self.tables = self.build_tables()
+        if not self.tables:
+            # What DrawBorderThenFill.begin does after the outline
+            return Animation.begin(self)
+        self.build_styles(self.outline.family_members_with_points())
+        self.start_tables()
+
+    def build_styles(self, outlines):
+        """Style buffers lerped from the outline's style (weight 0) to the glyph's own (weight 1)"""
+        self.style_arrays, self.style_scalars = [], []
+        for name in animdelta.STYLE_ARRAYS:
+            starts, ends = [], []
+            for member, outline in zip(self.members, outlines):
+                start, end = getattr(outline, name), getattr(member, name)
+                length = max(len(start), len(end))
+                starts.append(stretch_array_to_length(start, length))
+                ends.append(stretch_array_to_length(end, length))
+            rows = np.repeat(np.arange(len(starts)), [len(array) for array in starts])
+            start, end = np.concatenate(starts), np.concatenate(ends)
+            buffer = animdelta.consolidate(self.members, name, starts)
+            self.style_arrays.append((buffer, start, end - start, rows))
+        for name in animdelta.STYLE_SCALARS:
+            start = np.array([getattr(outline, name) for outline in outlines], dtype=float)
+            end = np.array([getattr(member, name) for member in self.members], dtype=float)
+            self.style_scalars.append((name, start, end - start))
+        self.style_weights = np.full(len(self.members), np.nan)
+
+    def show_style(self, weights):
+        for buffer, start, delta, rows in self.style_arrays:
+            np.multiply(delta, weights[rows, None], out=buffer)
+            buffer += start
+        changed = np.flatnonzero(weights != self.style_weights)
+        for name, start, delta in self.style_scalars:
+            values = start + weights * delta
+            for index in changed:
+                setattr(self.members[index], name, float(values[index]))
+        self.style_weights = weights
+
+    def interpolate_mobject(self, alpha):
+        if not self.tables:
+            return super().interpolate_mobject(alpha)
+        # integer_interpolate(0, 2, alpha) per glyph: first half draws the
+        # outline, second half fades from the outline style to the fill
+        doubled = 2 * np.clip(self.sub_alphas(alpha), 0, 1)
+        phase = np.minimum(doubled.astype(int), 1)
+        residue = np.where(doubled >= 2, 1.0, doubled - phase)
+        self.show_partial(np.where(phase == 0, residue, 1.0))
+        self.show_style(np.where(phase == 1, residue, 0.0))
+
+
+PATCHED = dict(Create=TableCreate, Write=TableWrite)
+
+
+def install():
+    """Make finalvideo's Create and Write use the curve tables"""
+    for name, cls in PATCHED.items():
+        setattr(finalvideo, name, cls)
+
+
+def uninstall():
+    for name, cls in PATCHED.items():
+        setattr(finalvideo, name, cls._real_cls)
+
+
+def bullet_lists():
+    """Scene01's problem and solution bullet lists, as the scene builds them"""
+    branding = finalvideo.NdLinearBranding
+    problem_items = branding.bullet_list(
+        items=["Spatial relationships must be relearned", "Parameter inefficient"],
+        font_size=branding.FONT_CONTENT, color=finalvideo.WHITE)
+    solution_items = branding.bullet_list(
+        items=["Spatial structures are preserved", "Parameter efficiency reduces overhead", "Open-source",
+               "A drop-in replacement for nn.linear layers"],
+        font_size=branding.FONT_CONTENT, color=finalvideo.WHITE)
+    return problem_items, solution_items
+
+
+def play(groups, write_cls, frames, camera=None, trace=None):
+    """Write every group over ``frames`` frames as Scene01's self.play does; returns (setup, per frame) seconds"""
+    groups = [group.copy() for group in groups]
+    started = time.perf_counter()
+    animations = [write_cls(group, run_time=2) for group in groups]
+    for animation in animations:
+        animation.begin()
+    setup = time.perf_counter() - started
+    started = time.perf_counter()
+    for frame in range(1, frames + 1):
+        for animation in animations:
+            animation.interpolate(frame / frames)
+        if camera is not None:
+            camera.reset()
+            camera.capture_mobjects(groups)
+        if trace is not None:
+            trace.append(animdelta.final_state(VGroup(*groups)))
+    per_frame = (time.perf_counter() - started) / frames
+    for animation in animations:
+        animation.finish()
+    return setup, per_frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(runner.PROFILES), default="draft")
+    parser.add_argument("--raster", action="store_true", help="rasterize every frame with the Cairo camera too")
+    parser.add_argument("--arc-length", action="store_true", help="advance along arc length instead of per curve")
+    args = parser.parse_args(argv)
+
+    runner.apply_profile(args.profile)
+    TableWrite.arc_length = args.arc_length
+    frames = int(2 * config.frame_rate)
+    groups = bullet_lists()
+    glyphs = sum(len(group.family_members_with_points()) for group in groups)
+    camera = Camera() if args.raster else None
+    print(f"Write(problem_items), Write(solution_items): {glyphs} glyphs, {frames} frames at {args.profile}"
+          f"{' with rasterization' if args.raster else ''}")
+
+    results = {}
+    for write_cls in (Write, TableWrite):
+        play(groups, write_cls, frames, camera)  # warm-up
+        results[write_cls] = play(groups, write_cls, frames, camera)
+        setup, per_frame = results[write_cls]
+        print(f"{write_cls.__name__:<12} setup {setup * 1e3:7.1f} ms, {per_frame * 1e3:7.2f} ms per frame, "
+              f"{1 / per_frame:8.1f} fps")
+    speedup = results[Write][1] / results[TableWrite][1]
+    stock, tables = [], []
+    play(groups, Write, frames, trace=stock)
+    play(groups, TableWrite, frames, trace=tables)
+    error = max(np.abs(a - b).max() if a.shape == b.shape else np.inf
+                for frame_a, frame_b in zip(stock, tables) for a, b in zip(frame_a, frame_b))
+    print(f"{speedup:.1f}x the stock frame rate, max difference over all frames {error:.1e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())